@@ -101,6 +101,7 @@ class BaseAgent:
             if context and "project_id" in context:
                 session_id = await self._store_session(
                     context["project_id"],
+                    context.get("user_id"),
                     message,
                     response_text,
                     session_id,
@@ -122,6 +123,7 @@ class BaseAgent:
     async def _store_session(
         self,
         project_id: str,
+        user_id: Optional[str],
         user_message: str,
         agent_response: str,
         session_id: Optional[str] = None,
@@ -129,55 +131,49 @@ class BaseAgent:
         """Store agent session in Firestore"""
         try:
             from firebase_admin import firestore
-            from datetime import datetime
+            from datetime import datetime, timezone
+            from api.lib.firestore import get_async_db
 
-            db = firestore.client()
+            db = get_async_db()
             sessions_ref = (
                 db.collection("projects")
                 .document(project_id)
                 .collection("agent_sessions")
             )
 
+            # Server timestamps are not allowed inside arrays, so messages carry the client time
+            now = datetime.now(timezone.utc)
+            messages = [
+                {"role": "user", "content": user_message, "timestamp": now},
+                {"role": "agent", "content": agent_response, "timestamp": now},
+            ]
+
             if session_id:
-                # Update existing session
-                session_ref = sessions_ref.document(session_id)
-                session_data = session_ref.get().to_dict() if session_ref.get().exists else {}
-                messages = session_data.get("messages", [])
-                messages.append({
-                    "role": "user",
-                    "content": user_message,
-                    "timestamp": firestore.SERVER_TIMESTAMP,
-                })
-                messages.append({
-                    "role": "agent",
-                    "content": agent_response,
-                    "timestamp": firestore.SERVER_TIMESTAMP,
-                })
-                session_ref.set({
-                    "messages": messages,
+                # Append to the existing session without reading it first
+                await sessions_ref.document(session_id).set({
+                    "messages": firestore.ArrayUnion(messages),
                     "updated_at": firestore.SERVER_TIMESTAMP,
                     "stage": self._get_stage(),
                 }, merge=True)
                 return session_id
             else:
+                if not user_id:
+                    # Sessions are listed by owner, so an ownerless one would never be seen
+                    project_doc = await db.collection("projects").document(project_id).get()
+                    user_id = project_doc.to_dict().get("userId") if project_doc.exists else None
+                    if not user_id:
+                        logger.warning(f"Not storing session for project {project_id}: no owner")
+                        return ""
+
                 # Create new session
                 new_session_ref = sessions_ref.document()
-                new_session_ref.set({
+                await new_session_ref.set({
                     "project_id": project_id,
+                    # Lets a user's sessions be listed with one collection group query
+                    "userId": user_id,
                     "stage": self._get_stage(),
                     "agent": self.agent_name,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": user_message,
-                            "timestamp": firestore.SERVER_TIMESTAMP,
-                        },
-                        {
-                            "role": "agent",
-                            "content": agent_response,
-                            "timestamp": firestore.SERVER_TIMESTAMP,
-                        },
-                    ],
+                    "messages": messages,
                     "created_at": firestore.SERVER_TIMESTAMP,
                     "updated_at": firestore.SERVER_TIMESTAMP,
                 })
@@ -241,6 +237,7 @@ class BaseAgent:
         self,
         task: str,
         parameters: Optional[Dict[str, Any]] = None,
+        user_id: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Execute a specific task.
@@ -248,10 +245,11 @@ class BaseAgent:
         Args:
             task: Task description
             parameters: Task parameters
+            user_id: Caller's user ID (owner of any session created)
 
         Returns:
             Task result
         """
         # Override in subclasses for specific tasks
-        return await self.chat(f"Execute task: {task}", parameters)
+        return await self.chat(f"Execute task: {task}", {**(parameters or {}), "user_id": user_id})
 
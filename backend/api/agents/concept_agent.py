@@ -32,24 +32,26 @@ Be creative, encouraging, and provide actionable suggestions."""
         """Chat with concept agent"""
         # Load project context if available
         if context and "project_id" in context:
-            project_data = get_project_data(context["project_id"])
+            project_data = await get_project_data(context["project_id"])
             if project_data:
                 context["project"] = project_data
 
         return await super().chat(message, context, session_id)
 
-    async def suggest_logline(self, project_id: str, concept: str) -> Dict[str, Any]:
+    async def suggest_logline(
+        self, project_id: str, concept: str, user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Suggest loglines for a concept"""
         prompt = f"""Based on this concept: {concept}
 
 Generate 3-5 compelling loglines (one sentence each) that capture the essence of the story.
 Make them engaging, clear, and marketable."""
 
-        response = await self.chat(prompt, {"project_id": project_id})
+        response = await self.chat(prompt, {"project_id": project_id, "user_id": user_id})
 
         # Save as artifact
         if "response" in response:
-            artifact_id = create_project_artifact(
+            artifact_id = await create_project_artifact(
                 project_id,
                 "logline_suggestions",
                 {"concept": concept, "loglines": response["response"]},
@@ -58,7 +60,9 @@ Make them engaging, clear, and marketable."""
 
         return response
 
-    async def brainstorm_themes(self, project_id: str, genre: Optional[str] = None) -> Dict[str, Any]:
+    async def brainstorm_themes(
+        self, project_id: str, genre: Optional[str] = None, user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Brainstorm themes for a project"""
         prompt = f"""Generate thematic ideas for a film project"""
         if genre:
@@ -73,10 +77,10 @@ Consider:
 
 Provide 5-7 theme suggestions with brief explanations."""
 
-        response = await self.chat(prompt, {"project_id": project_id})
+        response = await self.chat(prompt, {"project_id": project_id, "user_id": user_id})
 
         if "response" in response:
-            artifact_id = create_project_artifact(
+            artifact_id = await create_project_artifact(
                 project_id,
                 "theme_brainstorm",
                 {"genre": genre, "themes": response["response"]},
@@ -24,7 +24,9 @@ Your role is to help filmmakers:
 
 Be practical, detailed, and production-focused."""
 
-    async def generate_shot_list(self, project_id: str, script_content: str) -> Dict[str, Any]:
+    async def generate_shot_list(
+        self, project_id: str, script_content: str, user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Generate shot list from script"""
         prompt = f"""Based on this script content:
 
@@ -38,10 +40,10 @@ Generate a detailed shot list with:
 - Props/equipment needed
 - Estimated duration"""
 
-        response = await self.chat(prompt, {"project_id": project_id})
+        response = await self.chat(prompt, {"project_id": project_id, "user_id": user_id})
 
         if "response" in response:
-            artifact_id = create_project_artifact(
+            artifact_id = await create_project_artifact(
                 project_id,
                 "shot_list",
                 {"script_preview": script_content[:500], "shot_list": response["response"]},
@@ -50,7 +52,9 @@ Generate a detailed shot list with:
 
         return response
 
-    async def suggest_storyboard(self, project_id: str, scene_description: str) -> Dict[str, Any]:
+    async def suggest_storyboard(
+        self, project_id: str, scene_description: str, user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Suggest storyboard ideas for a scene"""
         prompt = f"""For this scene:
 {scene_description}
@@ -61,10 +65,10 @@ Suggest storyboard frames with:
 - Composition notes
 - Visual style suggestions"""
 
-        response = await self.chat(prompt, {"project_id": project_id})
+        response = await self.chat(prompt, {"project_id": project_id, "user_id": user_id})
 
         if "response" in response:
-            artifact_id = create_project_artifact(
+            artifact_id = await create_project_artifact(
                 project_id,
                 "storyboard_suggestion",
                 {"scene": scene_description, "storyboard": response["response"]},
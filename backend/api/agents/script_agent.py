@@ -24,7 +24,9 @@ Your role is to help filmmakers:
 
 Be constructive, specific, and provide actionable feedback."""
 
-    async def analyze_script(self, project_id: str, script_content: str) -> Dict[str, Any]:
+    async def analyze_script(
+        self, project_id: str, script_content: str, user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Analyze a script"""
         prompt = f"""Analyze this script:
 
@@ -37,10 +39,10 @@ Provide analysis on:
 4. Pacing
 5. Strengths and areas for improvement"""
 
-        response = await self.chat(prompt, {"project_id": project_id})
+        response = await self.chat(prompt, {"project_id": project_id, "user_id": user_id})
 
         if "response" in response:
-            artifact_id = create_project_artifact(
+            artifact_id = await create_project_artifact(
                 project_id,
                 "script_analysis",
                 {"script_content": script_content[:500], "analysis": response["response"]},
@@ -49,7 +51,9 @@ Provide analysis on:
 
         return response
 
-    async def suggest_dialogue(self, project_id: str, scene_context: str, character: str) -> Dict[str, Any]:
+    async def suggest_dialogue(
+        self, project_id: str, scene_context: str, character: str, user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Suggest dialogue for a scene"""
         prompt = f"""Based on this scene context:
 {scene_context}
@@ -58,10 +62,10 @@ Suggest dialogue for the character: {character}
 
 Make it natural, character-appropriate, and serve the story."""
 
-        response = await self.chat(prompt, {"project_id": project_id})
+        response = await self.chat(prompt, {"project_id": project_id, "user_id": user_id})
 
         if "response" in response:
-            artifact_id = create_project_artifact(
+            artifact_id = await create_project_artifact(
                 project_id,
                 "dialogue_suggestion",
                 {"scene": scene_context, "character": character, "dialogue": response["response"]},
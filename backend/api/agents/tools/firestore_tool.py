@@ -2,11 +2,12 @@
 from firebase_admin import firestore
 from typing import Dict, Any, List, Optional
 import logging
+from api.lib.firestore import get_async_db, fetch_all, snapshot_to_dict
 
 logger = logging.getLogger(__name__)
 
 
-def search_firestore(collection: str, filters: Dict[str, Any], limit: int = 10) -> List[Dict[str, Any]]:
+async def search_firestore(collection: str, filters: Dict[str, Any], limit: int = 10) -> List[Dict[str, Any]]:
     """
     Search Firestore collection with filters.
 
@@ -19,7 +20,7 @@ def search_firestore(collection: str, filters: Dict[str, Any], limit: int = 10)
         List of documents
     """
     try:
-        db = firestore.client()
+        db = get_async_db()
         query = db.collection(collection)
 
         # Apply filters
@@ -27,34 +28,23 @@ def search_firestore(collection: str, filters: Dict[str, Any], limit: int = 10)
             query = query.where(field, "==", value)
 
         # Execute query
-        results = []
-        for doc in query.limit(limit).stream():
-            doc_data = doc.to_dict()
-            doc_data["id"] = doc.id
-            results.append(doc_data)
-
-        return results
+        return await fetch_all(query.limit(limit))
     except Exception as e:
         logger.error(f"Firestore search error: {e}")
         return []
 
 
-def get_project_data(project_id: str) -> Optional[Dict[str, Any]]:
+async def get_project_data(project_id: str) -> Optional[Dict[str, Any]]:
     """Get project data by ID"""
     try:
-        db = firestore.client()
-        doc = db.collection("projects").document(project_id).get()
-        if doc.exists:
-            data = doc.to_dict()
-            data["id"] = doc.id
-            return data
-        return None
+        db = get_async_db()
+        return snapshot_to_dict(await db.collection("projects").document(project_id).get())
     except Exception as e:
         logger.error(f"Error getting project data: {e}")
         return None
 
 
-def create_project_artifact(
+async def create_project_artifact(
     project_id: str, artifact_type: str, content: Dict[str, Any]
 ) -> str:
     """
@@ -69,14 +59,14 @@ def create_project_artifact(
         Artifact ID
     """
     try:
-        db = firestore.client()
+        db = get_async_db()
         artifact_data = {
             "project_id": project_id,
             "type": artifact_type,
             "content": content,
             "created_at": firestore.SERVER_TIMESTAMP,
         }
-        doc_ref = db.collection("projects").document(project_id).collection("artifacts").add(
+        doc_ref = await db.collection("projects").document(project_id).collection("artifacts").add(
             artifact_data
         )
         return doc_ref[1].id
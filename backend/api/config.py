@@ -44,10 +44,69 @@ class Settings(BaseSettings):
     # Redis
     redis_url: str = "redis://localhost:6379/0"
     redis_ttl_default: int = 3600  # Default TTL in seconds (1 hour)
+    redis_breaker_failure_threshold: int = 3  # Consecutive connection failures before opening
+    redis_breaker_backoff_base: float = 1.0  # First open period in seconds, doubled per reopen
+    redis_breaker_backoff_max: float = 30.0  # Cap on the open period
+
+    # Response cache
+    cache_local_max_bytes: int = 0  # In-process L1 budget per worker (0 disables)
+    cache_local_ttl: int = 30  # L1 TTL in seconds
+    cache_coalesce: bool = True  # Single-flight recomputation of missing entries
+    cache_stale_while_revalidate: int = 60  # Seconds an expired entry may be served while refreshing
+    cache_compression: str = "gzip"  # Codec for stored bodies: gzip or zstd
+    cache_compress_min_bytes: int = 1024  # Smaller bodies are stored uncompressed
+
+    # Auth
+    auth_token_cache_max_bytes: int = 8 * 1024 * 1024  # Verified ID tokens cached per worker until exp (0 disables)
+    admin_role_cache_ttl: int = 300  # Seconds a Firestore-derived admin flag is cached in Redis
+
+    # Rate limiting
+    rate_limit_mode: str = "redis"  # "redis" checks every request, "hybrid" decides locally and syncs
+    rate_limit_local_share: float = 0.25  # Fraction of a budget a worker may spend between syncs
+    rate_limit_sync_interval_ms: int = 200  # How often hybrid mode charges local consumption to Redis
+    rate_limit_local_max_keys: int = 10000  # Local buckets kept per worker (LRU)
 
     # n8n
     n8n_url: str = "http://n8n:5678"
     n8n_api_key: str = ""
+    n8n_max_connections: int = 20  # Pooled connections per worker
+    n8n_max_keepalive_connections: int = 10  # Idle connections kept open for reuse
+    n8n_keepalive_expiry: float = 30.0  # Seconds an idle connection is kept
+    n8n_max_concurrency_per_host: int = 10  # In-flight requests per n8n host
+    n8n_http2: bool = True  # Use HTTP/2 for https:// URLs when h2 is installed
+    n8n_connect_timeout: float = 5.0
+    n8n_read_timeout: float = 30.0
+    n8n_write_timeout: float = 10.0
+    n8n_pool_timeout: float = 5.0  # Wait for a free pooled connection
+    n8n_workflow_index_ttl: int = 300  # Seconds before the event-to-workflow index is rebuilt
+    n8n_event_workflows: str = ""  # Explicit overrides: "project_created=<workflow id>,..."
+
+    # Workflow outbox (Redis Stream delivered by a background dispatcher)
+    outbox_batch_size: int = 50  # Events read and delivered per batch
+    outbox_block_ms: int = 1000  # XREADGROUP block; must stay below the Redis socket timeout
+    outbox_max_attempts: int = 8  # Deliveries before an event is dead-lettered
+    outbox_backoff_base: float = 2.0  # Seconds before the first retry, doubled per attempt
+    outbox_backoff_max: float = 300.0  # Cap on the retry delay
+    outbox_claim_idle_ms: int = 60000  # Pending entries idle this long are reclaimed from dead workers
+    outbox_maxlen: int = 100000  # Approximate cap on stream length
+
+    # n8n callback ingestion
+    webhook_ingest_mode: str = "queue"  # "queue" accepts with 202 and batches writes, "sync" writes inline
+    webhook_queue_size: int = 10000  # Webhooks waiting in the ingest stream before new ones get 503
+    webhook_flush_interval_ms: int = 50  # XREADGROUP block while the ingest stream is empty
+    webhook_claim_idle_ms: int = 30000  # Unacked webhooks idle this long are reclaimed from dead workers
+    webhook_stop_timeout: float = 10.0  # Seconds shutdown waits for the batch in progress
+    webhook_dedup_ttl: int = 86400  # Seconds a (event_type, execution_id) delivery is remembered
+    webhook_dedup_bloom_capacity: int = 1000000  # Keys per generation of the local fallback filter
+    webhook_dedup_bloom_error_rate: float = 0.001  # Fallback filter false positive rate
+
+    # Firestore
+    stats_counter_shards: int = 10  # Shard documents per dashboard counter (spreads write contention)
+    usage_buffer_size: int = 10000  # Usage events buffered per worker before new ones are dropped
+    usage_flush_interval_ms: int = 1000  # Longest time an event waits before it is written
+    quota_enforcement: bool = True  # Refuse metered agent calls over the monthly quota (429)
+    quota_reconcile_interval: float = 300.0  # Seconds between Redis quota syncs from Firestore
+    quota_fail_open: bool = False  # Let metered calls through when no store can check quotas (else 503)
 
     # ADK / Vertex AI
     vertex_ai_project_id: str = "cinefilm-platform"
@@ -0,0 +1,124 @@
+"""Circuit breaker with exponential backoff and half-open probing"""
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Tracks failures of a remote dependency and short-circuits calls while it is down.
+
+    closed    -> calls flow; consecutive failures are counted
+    open      -> calls are refused instantly until the backoff elapses
+    half_open -> a single probe call is let through; success closes the
+                 circuit, failure reopens it with a doubled backoff
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        probe_timeout: float = 5.0,
+    ):
+        """
+        Args:
+            name: Dependency name used in logs and metrics
+            failure_threshold: Consecutive failures that open the circuit
+            backoff_base: First open period in seconds
+            backoff_max: Cap on the open period
+            probe_timeout: Seconds after which an unanswered probe is abandoned
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.probe_timeout = probe_timeout
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._open_count = 0
+        self._open_until = 0.0
+        self._probe_started_at: Optional[float] = None
+        self.transitions: Dict[str, int] = {}
+        self.last_transition_at: Optional[float] = None
+        self.rejected = 0
+
+    def allow_request(self) -> bool:
+        """Whether a call may be attempted right now"""
+        if self.state == self.CLOSED:
+            return True
+
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now < self._open_until:
+                self.rejected += 1
+                return False
+            self._transition(self.HALF_OPEN)
+            self._probe_started_at = now
+            return True
+
+        # Half-open: only one probe at a time, unless the last one went unanswered
+        if self._probe_started_at is not None and now - self._probe_started_at < self.probe_timeout:
+            self.rejected += 1
+            return False
+        self._probe_started_at = now
+        return True
+
+    def record_success(self):
+        """A call reached the dependency"""
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            self._open_count = 0
+            self._probe_started_at = None
+            self._transition(self.CLOSED)
+
+    def record_failure(self, error: Optional[Exception] = None):
+        """A call failed because the dependency was unreachable"""
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self._open(error)
+
+    def stats(self) -> Dict[str, Any]:
+        """State and transition counters for metrics endpoints"""
+        retry_in = max(0.0, self._open_until - time.monotonic()) if self.state == self.OPEN else 0.0
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in_seconds": round(retry_in, 2),
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+        }
+
+    def _open(self, error: Optional[Exception]):
+        """Open the circuit for an exponentially growing, jittered period"""
+        self._open_count += 1
+        backoff = min(self.backoff_max, self.backoff_base * 2 ** (self._open_count - 1))
+        backoff *= random.uniform(0.8, 1.2)
+        self._open_until = time.monotonic() + backoff
+        self._probe_started_at = None
+        logger.warning(
+            f"{self.name} circuit open for {backoff:.1f}s after "
+            f"{self.consecutive_failures} failure(s): {error}"
+        )
+        self._transition(self.OPEN)
+
+    def _transition(self, state: str):
+        """Move to a new state and count the edge"""
+        if state == self.state:
+            return
+        edge = f"{self.state}->{state}"
+        self.transitions[edge] = self.transitions.get(edge, 0) + 1
+        self.last_transition_at = time.time()
+        logger.info(f"{self.name} circuit {edge}")
+        self.state = state
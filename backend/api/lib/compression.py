@@ -0,0 +1,87 @@
+"""Body compression helpers for cached and revalidated responses"""
+import gzip
+import logging
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# zstd is optional: install the "compression" extra to enable it
+try:
+    import zstandard
+
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+IDENTITY = "identity"
+GZIP = "gzip"
+ZSTD = "zstd"
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def resolve_codec(preferred: str) -> str:
+    """Pick the configured codec, falling back to gzip when zstd is not installed"""
+    if preferred == ZSTD and not ZSTD_AVAILABLE:
+        logger.warning("zstandard not installed; compressing cached bodies with gzip")
+        return GZIP
+    if preferred not in (GZIP, ZSTD):
+        return GZIP
+    return preferred
+
+
+def compress_body(body: bytes, codec: str, min_size: int) -> Tuple[bytes, str]:
+    """
+    Compress a body when it is large enough to be worth it.
+    Returns the stored bytes and their content coding.
+    """
+    if len(body) < min_size:
+        return body, IDENTITY
+
+    if codec == ZSTD and ZSTD_AVAILABLE:
+        compressed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    else:
+        codec = GZIP
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+    # Incompressible payloads are kept as-is
+    if len(compressed) >= len(body):
+        return body, IDENTITY
+    return compressed, codec
+
+
+def decompress_body(data: bytes, encoding: Optional[str]) -> bytes:
+    """Restore the identity body from stored bytes"""
+    if not encoding or encoding == IDENTITY:
+        return data
+    if encoding == GZIP:
+        return gzip.decompress(data)
+    if encoding == ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstd-encoded body but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown content coding: {encoding}")
+
+
+def accepts_encoding(accept_encoding: Optional[str], encoding: str) -> bool:
+    """Check an Accept-Encoding header for a coding with non-zero quality"""
+    if not accept_encoding:
+        return False
+
+    for item in accept_encoding.split(","):
+        parts = [part.strip() for part in item.split(";")]
+        coding = parts[0].lower()
+        if coding not in (encoding, "*"):
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            return True
+    return False
@@ -0,0 +1,74 @@
+"""Sharded Firestore counters"""
+import asyncio
+import random
+from typing import Awaitable, Callable
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists
+from google.cloud.firestore_v1 import Increment
+
+from api.lib.firestore import get_async_db
+
+COUNTERS_COLLECTION = "stats"
+
+
+class ShardedCounter:
+    """
+    A running total kept in stats/{name}/shards/{0..num_shards-1}.
+
+    Each change increments one random shard with an Increment transform, so
+    concurrent writers rarely touch the same document. Changes are staged on
+    the caller's write batch and commit atomically with the write they count.
+    Reading the total is the counter document's offset plus one sum()
+    aggregation over the shards, whatever the size of the counted collection.
+
+    A counter starts out unseeded: its first read takes the total from a
+    recount (e.g. a count() aggregation) and stores the difference from the
+    shard sum as the offset. Changes committed between the two reads may be
+    counted once too many or too few; later changes are always kept.
+    """
+
+    def __init__(self, name: str, num_shards: int):
+        """
+        Args:
+            name: Counter document ID under stats/
+            num_shards: Shard documents to spread increments over
+        """
+        self.name = name
+        self.num_shards = max(1, num_shards)
+
+    def _doc(self, db):
+        return db.collection(COUNTERS_COLLECTION).document(self.name)
+
+    def stage_increment(self, db, batch, amount: int = 1):
+        """Add an increment (or decrement) of the total to a write batch"""
+        shard = self._doc(db).collection("shards").document(str(random.randrange(self.num_shards)))
+        batch.set(shard, {"count": Increment(amount)}, merge=True)
+
+    async def _shard_sum(self, db) -> int:
+        result = await self._doc(db).collection("shards").sum("count", alias="total").get()
+        return int(result[0][0].value or 0)
+
+    async def _seed(self, db, recount: Callable[[], Awaitable[int]], shard_sum: int) -> int:
+        """
+        Store the offset that makes the shards add up to `recount`. Shards are
+        never overwritten, so increments staged meanwhile are kept; create()
+        lets only the first of several concurrent seeders write.
+        """
+        value = await recount()
+        try:
+            await self._doc(db).create(
+                {"offset": value - shard_sum, "seeded_at": firestore.SERVER_TIMESTAMP}
+            )
+        except AlreadyExists:
+            counter_doc, shard_sum = await asyncio.gather(self._doc(db).get(), self._shard_sum(db))
+            return int(counter_doc.to_dict().get("offset") or 0) + shard_sum
+        return value
+
+    async def total(self, recount: Callable[[], Awaitable[int]]) -> int:
+        """Current total; seeds the counter from `recount` on first use"""
+        db = get_async_db()
+        counter_doc, shard_sum = await asyncio.gather(self._doc(db).get(), self._shard_sum(db))
+        if not counter_doc.exists:
+            return await self._seed(db, recount, shard_sum)
+        return int(counter_doc.to_dict().get("offset") or 0) + shard_sum
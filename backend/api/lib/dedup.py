@@ -0,0 +1,144 @@
+"""Idempotency keys with a Redis TTL set and a local rotating Bloom filter fallback"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from typing import Any, Dict, Set
+
+from api.lib.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+class RotatingBloomFilter:
+    """
+    Two-generation Bloom filter covering at least the last `window` seconds.
+
+    Lookups check both generations; inserts go to the current one. When the
+    current generation is older than the window or holds `capacity` keys, it
+    becomes the previous generation and the old previous one is discarded.
+    False positives (a new key reported as seen) occur at about `error_rate`;
+    keys cannot be removed.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, window: float):
+        """
+        Args:
+            capacity: Keys per generation before it is rotated early
+            error_rate: Target false positive rate at capacity
+            window: Seconds a key is remembered for (at least)
+        """
+        self.capacity = capacity
+        self.window = window
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._current = bytearray((self.num_bits + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._count = 0
+        self._started_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _positions(self, key: str):
+        # Kirsch-Mitzenmacher double hashing from one 128-bit digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    @staticmethod
+    def _contains(bits: bytearray, positions) -> bool:
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def _rotate_if_due(self):
+        if self._count >= self.capacity or time.monotonic() - self._started_at >= self.window:
+            self._previous = self._current
+            self._current = bytearray(len(self._previous))
+            self._count = 0
+            self._started_at = time.monotonic()
+
+    def contains(self, key: str) -> bool:
+        """Whether a key was (probably) inserted within the window"""
+        positions = self._positions(key)
+        with self._lock:
+            self._rotate_if_due()
+            return self._contains(self._current, positions) or self._contains(self._previous, positions)
+
+    def add(self, key: str) -> bool:
+        """Insert a key; returns False if it was (probably) already present"""
+        positions = self._positions(key)
+        with self._lock:
+            self._rotate_if_due()
+            if self._contains(self._current, positions) or self._contains(self._previous, positions):
+                return False
+            for p in positions:
+                self._current[p >> 3] |= 1 << (p & 7)
+            self._count += 1
+            return True
+
+
+class Deduplicator:
+    """
+    Drops repeated deliveries of the same idempotency key within a TTL.
+
+    Keys are claimed with SET NX EX in Redis, which is exact and shared by all
+    workers. When Redis is unavailable this worker's rotating Bloom filter
+    decides instead; a key claimed that way is held in a pending set and only
+    enters the filter on complete(), so release() can still undo the claim.
+    """
+
+    def __init__(self, prefix: str, ttl: int, bloom_capacity: int, bloom_error_rate: float):
+        self.prefix = prefix
+        self.ttl = ttl
+        self._bloom = RotatingBloomFilter(bloom_capacity, bloom_error_rate, ttl)
+        self._pending: Set[str] = set()  # Fallback claims not yet completed or released
+        self._stats = {"checks": 0, "duplicates": 0, "local_checks": 0, "released": 0}
+
+    async def claim(self, key: str) -> bool:
+        """True if this is the first delivery of `key` within the TTL"""
+        self._stats["checks"] += 1
+        first = None
+        redis_client = get_async_redis()
+        if redis_client:
+            try:
+                first = bool(await redis_client.set(f"{self.prefix}{key}", 1, nx=True, ex=self.ttl))
+            except Exception as e:
+                logger.warning(f"Dedup check error: {e}. Using local filter.")
+        if first is None:
+            self._stats["local_checks"] += 1
+            first = key not in self._pending and not self._bloom.contains(key)
+            if first:
+                self._pending.add(key)
+
+        if not first:
+            self._stats["duplicates"] += 1
+        return first
+
+    def complete(self, key: str):
+        """Mark a claim's delivery as applied (or durably queued)"""
+        if key in self._pending:
+            self._pending.discard(key)
+            self._bloom.add(key)
+
+    async def release(self, key: str):
+        """Forget a claim whose processing failed so the retry is accepted"""
+        if key in self._pending:
+            # Claimed locally while Redis was unavailable; nothing was set there
+            self._pending.discard(key)
+            self._stats["released"] += 1
+            return
+        redis_client = get_async_redis()
+        if not redis_client:
+            return
+        try:
+            await redis_client.delete(f"{self.prefix}{key}")
+            self._stats["released"] += 1
+        except Exception as e:
+            logger.warning(f"Dedup release error for {key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        checks = self._stats["checks"]
+        return {
+            **self._stats,
+            "hit_rate": round(self._stats["duplicates"] / checks, 4) if checks else 0.0,
+        }
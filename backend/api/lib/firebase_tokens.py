@@ -0,0 +1,183 @@
+"""Firebase ID token verification with prefetched signing certs and a verified-token cache"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, Optional
+
+import httpx
+from firebase_admin import auth
+from google.auth import jwt
+
+from api.config import settings
+from api.lib.local_cache import LocalCache
+
+logger = logging.getLogger(__name__)
+
+CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+ISSUER_PREFIX = "https://securetoken.google.com/"
+CERT_REFRESH_MARGIN = 300  # Refresh this many seconds before the published max-age runs out
+CERT_RETRY_SECONDS = 60  # Backoff after a failed fetch, and minimum gap between unknown-kid refreshes
+DEFAULT_CERT_MAX_AGE = 3600
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+def _token_header(token: str) -> dict:
+    """Decode the unverified JOSE header of a JWT"""
+    segment = token.split(".", 1)[0]
+    segment += "=" * (-len(segment) % 4)
+    return json.loads(base64.urlsafe_b64decode(segment))
+
+
+class TokenVerifier:
+    """
+    Verifies Firebase ID tokens without blocking the event loop.
+
+    Google's signing certs are fetched once and refreshed in the background before
+    their max-age expires, so verification is a local RS256 check. Verified claims
+    are cached by token hash until the token's `exp`, so repeat requests with the
+    same token skip verification entirely. Against the Auth Emulator, or before any
+    certs have been fetched, tokens go through the Admin SDK on a worker thread.
+    """
+
+    def __init__(self, project_id: str, cache_max_bytes: int):
+        """
+        Args:
+            project_id: Firebase project the tokens must be issued for
+            cache_max_bytes: Budget for cached verified tokens (0 disables the cache)
+        """
+        self.project_id = project_id
+        self._cache = LocalCache(cache_max_bytes) if cache_max_bytes > 0 else None
+        self._certs: Dict[str, str] = {}
+        self._certs_expire_at = 0.0
+        self._last_refresh_attempt = 0.0
+        self._http: Optional[httpx.AsyncClient] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._stats = {
+            "cache_hits": 0,
+            "verified_local": 0,
+            "verified_sdk": 0,
+            "failures": 0,
+            "cert_refreshes": 0,
+        }
+
+    @property
+    def emulated(self) -> bool:
+        return bool(os.getenv("FIREBASE_AUTH_EMULATOR_HOST"))
+
+    async def start(self) -> None:
+        """Prefetch signing certs and keep them fresh in the background"""
+        if self.emulated or self._refresh_task is not None:
+            return
+        self._http = httpx.AsyncClient(timeout=5.0)
+        try:
+            await self.refresh_certs()
+        except Exception as e:
+            logger.warning(f"Initial signing cert fetch failed: {e}. Falling back to the Admin SDK.")
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def refresh_certs(self) -> None:
+        """Fetch the current signing certs and honour their Cache-Control max-age"""
+        if self._http is None:
+            return
+        self._last_refresh_attempt = time.monotonic()
+        response = await self._http.get(CERTS_URL)
+        response.raise_for_status()
+        match = _MAX_AGE_RE.search(response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else DEFAULT_CERT_MAX_AGE
+        self._certs = response.json()
+        self._certs_expire_at = time.monotonic() + max_age
+        self._stats["cert_refreshes"] += 1
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            delay = self._certs_expire_at - time.monotonic() - CERT_REFRESH_MARGIN
+            await asyncio.sleep(max(CERT_RETRY_SECONDS, delay))
+            try:
+                await self.refresh_certs()
+            except Exception as e:
+                logger.warning(f"Signing cert refresh failed: {e}")
+
+    async def verify(self, token: str) -> dict:
+        """
+        Return the decoded claims of a valid ID token, with `uid` set.
+        Raises on invalid or expired tokens.
+        """
+        key = hashlib.sha256(token.encode()).hexdigest()
+        if self._cache is not None:
+            claims = self._cache.get(key)
+            if claims is not None and claims["exp"] > time.time():
+                self._stats["cache_hits"] += 1
+                return claims
+
+        try:
+            claims = await self._verify_uncached(token)
+        except Exception:
+            self._stats["failures"] += 1
+            raise
+
+        if self._cache is not None:
+            ttl = claims["exp"] - time.time()
+            if ttl > 0:
+                self._cache.set(key, claims, len(token) + len(json.dumps(claims)), ttl=ttl)
+        return claims
+
+    async def _verify_uncached(self, token: str) -> dict:
+        if self.emulated or not self._certs:
+            claims = await asyncio.to_thread(auth.verify_id_token, token)
+            self._stats["verified_sdk"] += 1
+            return claims
+
+        header = _token_header(token)
+        if header.get("alg") != "RS256":
+            raise ValueError(f'ID token has incorrect algorithm "{header.get("alg")}"; expected RS256')
+        if (
+            header.get("kid") not in self._certs
+            and time.monotonic() - self._last_refresh_attempt > CERT_RETRY_SECONDS
+        ):
+            # Google rotated its keys ahead of our scheduled refresh
+            await self.refresh_certs()
+
+        # Checks the signature, exp/iat and the audience
+        claims = jwt.decode(token, certs=self._certs, audience=self.project_id)
+        if claims.get("iss") != ISSUER_PREFIX + self.project_id:
+            raise ValueError(f'ID token has incorrect "iss" claim: {claims.get("iss")}')
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise ValueError('ID token has an invalid "sub" claim')
+        if claims.get("auth_time", 0) > time.time():
+            raise ValueError('ID token has an "auth_time" in the future')
+
+        claims["uid"] = subject
+        self._stats["verified_local"] += 1
+        return claims
+
+    def stats(self) -> dict:
+        cache_stats = self._cache.stats() if self._cache is not None else None
+        return {
+            **self._stats,
+            "certs_loaded": len(self._certs),
+            "cache": cache_stats,
+        }
+
+
+token_verifier = TokenVerifier(
+    project_id=settings.firebase_project_id,
+    cache_max_bytes=settings.auth_token_cache_max_bytes,
+)
@@ -0,0 +1,50 @@
+"""Firestore client accessors and small query helpers
+
+Request handlers, middleware and services use the AsyncClient from
+get_async_db() so a Firestore RPC suspends the coroutine instead of blocking
+the event loop. The synchronous client from get_db() is kept for scripts and
+code that already runs on a worker thread.
+
+Both clients are created lazily by firebase_admin (one per app) and pick up
+the Firestore emulator from FIRESTORE_EMULATOR_HOST (host:port, e.g.
+firebase-emulators:8080).
+"""
+from typing import Any, Dict, List, Optional
+
+from firebase_admin import firestore, firestore_async
+from google.cloud.firestore_v1.async_client import AsyncClient
+
+
+def get_db():
+    """Get the synchronous Firestore client (lazy initialization)"""
+    return firestore.client()
+
+
+def get_async_db() -> AsyncClient:
+    """Get the asyncio Firestore client (lazy initialization)"""
+    return firestore_async.client()
+
+
+def snapshot_to_dict(doc) -> Optional[Dict[str, Any]]:
+    """Document data with its ID under "id", or None if it does not exist"""
+    if not doc.exists:
+        return None
+    data = doc.to_dict()
+    data["id"] = doc.id
+    return data
+
+
+async def get_document(path: str) -> Optional[Dict[str, Any]]:
+    """Read one document by path (e.g. "projects/abc")"""
+    return snapshot_to_dict(await get_async_db().document(path).get())
+
+
+async def fetch_all(query) -> List[Dict[str, Any]]:
+    """Run a query (or stream a collection) and return its documents with their IDs"""
+    return [snapshot_to_dict(doc) async for doc in query.stream()]
+
+
+async def count(query) -> int:
+    """Server-side count() aggregation (billed per 1000 index entries, not per document)"""
+    result = await query.count(alias="count").get()
+    return int(result[0][0].value)
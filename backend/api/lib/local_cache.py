@@ -0,0 +1,100 @@
+"""In-process LRU cache with TTL expiry and a bounded byte budget"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+class LocalCache:
+    """
+    Thread-safe LRU/TTL cache sized by bytes rather than entry count.
+    Used as the L1 tier in front of Redis; each worker process owns one.
+    """
+
+    def __init__(self, max_bytes: int, default_ttl: float = 30.0):
+        """
+        Args:
+            max_bytes: Upper bound on the summed size of stored values
+            default_ttl: Seconds an entry stays valid when no TTL is given
+        """
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a live entry and mark it most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None):
+        """Store a value, evicting least recently used entries to stay within budget"""
+        if size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            while self._entries and self._bytes + size > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        """Drop the given keys; returns how many were present"""
+        removed = 0
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+                    removed += 1
+            self.invalidations += removed
+        return removed
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit ratio and occupancy for sizing the cache"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: str):
+        """Remove an entry (caller holds the lock)"""
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
@@ -1,14 +1,30 @@
 """n8n client wrapper for API communication"""
+import asyncio
 import httpx
 from typing import Optional, Dict, Any, List
+from urllib.parse import urlsplit
 import logging
 from api.config import settings
 
 logger = logging.getLogger(__name__)
 
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 
 class N8nClient:
-    """Client for interacting with n8n API"""
+    """
+    Client for interacting with n8n API.
+
+    Holds one pooled httpx.AsyncClient for the life of the process so webhook
+    triggers reuse keep-alive connections instead of paying TCP/TLS setup per
+    call. Concurrency is bounded per host, and a httpcore trace hook counts new
+    connections against requests to report the pool's reuse rate.
+    """
 
     def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None):
         """
@@ -20,7 +36,72 @@ class N8nClient:
         """
         self.base_url = base_url or getattr(settings, "n8n_url", "http://n8n:5678")
         self.api_key = api_key or getattr(settings, "n8n_api_key", None)
-        self.timeout = 30.0
+        self.timeout = httpx.Timeout(
+            connect=settings.n8n_connect_timeout,
+            read=settings.n8n_read_timeout,
+            write=settings.n8n_write_timeout,
+            pool=settings.n8n_pool_timeout,
+        )
+        self.limits = httpx.Limits(
+            max_connections=settings.n8n_max_connections,
+            max_keepalive_connections=settings.n8n_max_keepalive_connections,
+            keepalive_expiry=settings.n8n_keepalive_expiry,
+        )
+        # HTTP/2 is negotiated via ALPN, so it only applies to https:// n8n URLs
+        self.http2 = settings.n8n_http2 and HTTP2_AVAILABLE
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats = {
+            "requests": 0,
+            "connections_opened": 0,
+            "tls_handshakes": 0,
+            "errors": 0,
+        }
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared pooled client, created on first use if the lifespan has not opened it"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+            )
+        return self._client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.n8n_max_concurrency_per_host)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        """httpcore trace hook: count connection setup work"""
+        if event_name == "connection.connect_tcp.complete":
+            self._stats["connections_opened"] += 1
+        elif event_name == "connection.start_tls.complete":
+            self._stats["tls_handshakes"] += 1
+
+    async def open(self):
+        """Open the pooled client (called from the app lifespan)"""
+        self._get_client()
+
+    async def aclose(self):
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection reuse for this worker's pool"""
+        requests = self._stats["requests"]
+        opened = self._stats["connections_opened"]
+        return {
+            **self._stats,
+            "connection_reuse_rate": round(1 - opened / requests, 4) if requests else None,
+            "http2": self.http2,
+        }
 
     def _get_headers(self) -> Dict[str, str]:
         """Get request headers with authentication"""
@@ -29,22 +110,38 @@ class N8nClient:
             headers["X-N8N-API-KEY"] = self.api_key
         return headers
 
+    @staticmethod
+    def _parse_body(response: httpx.Response) -> Any:
+        """JSON body of a successful response; other bodies (e.g. webhook text replies) as text"""
+        if not response.content:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return response.text
+
     async def _request(
         self, method: str, endpoint: str, **kwargs
     ) -> Optional[Dict[str, Any]]:
         """Make HTTP request to n8n API"""
         url = f"{self.base_url}{endpoint}"
         headers = {**self._get_headers(), **kwargs.pop("headers", {})}
+        extensions = {**kwargs.pop("extensions", {}), "trace": self._trace}
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.request(method, url, headers=headers, **kwargs)
+            async with self._host_semaphore(url):
+                self._stats["requests"] += 1
+                response = await self._get_client().request(
+                    method, url, headers=headers, extensions=extensions, **kwargs
+                )
                 response.raise_for_status()
-                return response.json() if response.content else None
+                return self._parse_body(response)
         except httpx.HTTPError as e:
+            self._stats["errors"] += 1
             logger.error(f"n8n API error: {e}")
             raise
         except Exception as e:
+            self._stats["errors"] += 1
             logger.error(f"Unexpected error calling n8n: {e}")
             raise
 
@@ -118,7 +215,11 @@ class N8nClient:
         """Check if n8n is available"""
         try:
             # Try to access n8n health endpoint or workflows list
-            await self._request("GET", "/api/v1/workflows", timeout=5.0)
+            await self._request(
+                "GET",
+                "/api/v1/workflows",
+                timeout=httpx.Timeout(5.0, pool=settings.n8n_pool_timeout),
+            )
             return True
         except Exception:
             return False
@@ -135,3 +236,11 @@ def get_n8n_client() -> N8nClient:
         _n8n_client = N8nClient()
     return _n8n_client
 
+
+async def close_n8n_client():
+    """Close the shared client's connection pool"""
+    global _n8n_client
+    if _n8n_client is not None:
+        await _n8n_client.aclose()
+        _n8n_client = None
+
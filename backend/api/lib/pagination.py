@@ -0,0 +1,103 @@
+"""Cursor pagination for Firestore listings
+
+A cursor is an opaque token holding the order-by values and the document path
+of the last item on a page. The next page resumes with start_after, so
+Firestore reads only the documents it returns; offset() reads (and bills)
+every skipped document, making page N cost N pages of reads.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from google.cloud.firestore_v1 import Query
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from api.lib.firestore import get_async_db, snapshot_to_dict
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorError(ValueError):
+    """A cursor that was not produced by encode_cursor for this listing"""
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, DatetimeWithNanoseconds):
+        return {"ts": value.rfc3339()}
+    if isinstance(value, datetime):
+        value = value.replace(tzinfo=value.tzinfo or timezone.utc).astimezone(timezone.utc)
+        return {"ts": value.strftime("%Y-%m-%dT%H:%M:%S.%fZ")}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return DatetimeWithNanoseconds.from_rfc3339(value["ts"])
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque token for a list of order-by values (JSON types and datetimes)"""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Values of a token from encode_cursor; raises InvalidCursorError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list):
+            raise ValueError("cursor is not a list")
+        return [_decode_value(v) for v in values]
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {e}") from e
+
+
+async def fetch_page(
+    query,
+    limit: int,
+    cursor: Optional[str] = None,
+    order_by: Sequence[Tuple[str, str]] = (),
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Read one page of a query.
+
+    Args:
+        query: Filtered query (or collection / collection group) without ordering
+        limit: Page size
+        cursor: Token from the previous page, or None for the first page
+        order_by: (field, direction) pairs; the document path is appended as a tiebreaker
+
+    Returns:
+        The page's documents (with "id") and the cursor for the next page, or None
+        when this is the last page
+    """
+    direction = order_by[-1][1] if order_by else Query.ASCENDING
+    for field, field_direction in order_by:
+        query = query.order_by(field, direction=field_direction)
+    query = query.order_by(FieldPath.document_id(), direction=direction)
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(order_by) + 1 or not isinstance(values[-1], str):
+            raise InvalidCursorError("Cursor does not match this listing")
+        try:
+            values[-1] = get_async_db().document(values[-1])
+        except ValueError as e:
+            raise InvalidCursorError(f"Invalid cursor: {e}") from e
+        query = query.start_after(values)
+
+    # One extra document tells whether another page exists without a second query
+    docs = [doc async for doc in query.limit(limit + 1).stream()]
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(
+            [last.get(field) for field, _ in order_by] + [last.reference.path]
+        )
+    return [snapshot_to_dict(doc) for doc in docs], next_cursor
@@ -1,20 +1,165 @@
-"""Redis client singleton with connection pooling"""
+"""Redis client singletons with connection pooling
+
+The asyncio client is what request handlers and middleware use; it is created
+and closed by the application lifespan and guarded by a circuit breaker, so
+an outage costs one connect timeout per backoff period instead of one per
+request. The synchronous client is kept for scripts and other code that runs
+outside the event loop.
+"""
+import asyncio
 import redis
+import redis.asyncio as aioredis
 from redis import ConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 from typing import Optional
 import logging
 from api.config import settings
+from api.lib.circuit_breaker import CircuitBreaker
 
 logger = logging.getLogger(__name__)
 
+# Errors that mean Redis itself is unreachable (as opposed to a bad command)
+_UNAVAILABLE_ERRORS = (RedisConnectionError, RedisTimeoutError, OSError, asyncio.TimeoutError)
+
+redis_breaker = CircuitBreaker(
+    "redis",
+    failure_threshold=settings.redis_breaker_failure_threshold,
+    backoff_base=settings.redis_breaker_backoff_base,
+    backoff_max=settings.redis_breaker_backoff_max,
+)
+
+
+class _GuardedPipeline(Pipeline):
+    """Pipeline that reports connection-level outcomes to the breaker"""
+
+    async def execute(self, raise_on_error: bool = True):
+        try:
+            result = await super().execute(raise_on_error)
+        except _UNAVAILABLE_ERRORS as e:
+            redis_breaker.record_failure(e)
+            raise
+        redis_breaker.record_success()
+        return result
+
+
+class GuardedRedis(aioredis.Redis):
+    """asyncio client that reports connection-level outcomes to the breaker"""
+
+    async def execute_command(self, *args, **options):
+        try:
+            result = await super().execute_command(*args, **options)
+        except _UNAVAILABLE_ERRORS as e:
+            redis_breaker.record_failure(e)
+            raise
+        redis_breaker.record_success()
+        return result
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return _GuardedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
 # Global Redis connection pool
 _redis_pool: Optional[ConnectionPool] = None
 _redis_client: Optional[Redis] = None
 
+# Asyncio pool used inside the event loop; returns raw bytes so binary payloads survive
+_async_redis_pool: Optional[aioredis.ConnectionPool] = None
+_async_redis_client: Optional[GuardedRedis] = None
+
+
+async def init_async_redis() -> Optional[GuardedRedis]:
+    """
+    Create the asyncio Redis client (called from the application lifespan).
+    The client is kept even if Redis is down at startup; connections are
+    established lazily, so it recovers once Redis is reachable.
+    """
+    global _async_redis_client, _async_redis_pool
+
+    if _async_redis_client is not None:
+        return _async_redis_client
+
+    try:
+        _async_redis_pool = aioredis.ConnectionPool.from_url(
+            settings.redis_url,
+            max_connections=50,
+            decode_responses=False,
+            socket_connect_timeout=2,
+            socket_timeout=2,
+            retry_on_timeout=True,
+        )
+        _async_redis_client = GuardedRedis(connection_pool=_async_redis_pool)
+    except Exception as e:
+        logger.warning(f"Redis unavailable: {e}. Continuing without Redis (graceful degradation).")
+        _async_redis_client = None
+        _async_redis_pool = None
+        return None
+
+    try:
+        await _async_redis_client.ping()
+        logger.info(f"Async Redis client initialized successfully: {settings.redis_url}")
+    except Exception as e:
+        logger.warning(f"Redis unavailable at startup: {e}. Will retry on use.")
+
+    return _async_redis_client
+
+
+def get_async_redis() -> Optional[GuardedRedis]:
+    """
+    Get the asyncio Redis client.
+    Returns None before the lifespan has initialized it, or while the circuit
+    breaker is open, so callers skip Redis instantly (graceful degradation).
+    """
+    if _async_redis_client is None:
+        return None
+    if not redis_breaker.allow_request():
+        return None
+    return _async_redis_client
+
+
+def redis_configured() -> bool:
+    """Whether the asyncio client exists, even if the circuit breaker is currently open"""
+    return _async_redis_client is not None
+
+
+async def ping_redis() -> bool:
+    """Check if Redis is reachable without blocking the event loop"""
+    client = get_async_redis()
+    if client is None:
+        return False
+
+    try:
+        await client.ping()
+        return True
+    except Exception:
+        return False
+
+
+async def close_async_redis():
+    """Close the asyncio Redis pool (called from the application lifespan)"""
+    global _async_redis_client, _async_redis_pool
+
+    if _async_redis_client:
+        try:
+            await _async_redis_client.aclose()
+        except Exception as e:
+            logger.error(f"Error closing async Redis client: {e}")
+
+    if _async_redis_pool:
+        try:
+            await _async_redis_pool.disconnect()
+        except Exception as e:
+            logger.error(f"Error closing async Redis pool: {e}")
+
+    _async_redis_client = None
+    _async_redis_pool = None
+
 
 def get_redis_client() -> Optional[Redis]:
     """
-    Get Redis client singleton instance.
+    Get synchronous Redis client singleton instance (for scripts; use
+    get_async_redis inside request handlers).
     Returns None if Redis is unavailable (graceful degradation).
     """
     global _redis_client, _redis_pool
@@ -49,7 +194,7 @@ def get_redis_client() -> Optional[Redis]:
 
 
 def is_redis_available() -> bool:
-    """Check if Redis is available and healthy"""
+    """Check if Redis is available and healthy (synchronous; for scripts)"""
     client = get_redis_client()
     if client is None:
         return False
@@ -79,4 +224,3 @@ def close_redis_connection():
 
     _redis_client = None
     _redis_pool = None
-
@@ -6,12 +6,14 @@ init_firebase()
 
 # Now import everything else
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from api.routers import health, projects
 from api.config import settings
+from api.lib.redis import init_async_redis, close_async_redis
 
 # Configure logging
 logging.basicConfig(
@@ -20,19 +22,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared connections on startup and release them on shutdown"""
+    from api.middleware.cache import ensure_invalidation_listener, stop_invalidation_listener
+    from api.lib.firebase_tokens import token_verifier
+    from api.lib.n8n import get_n8n_client, close_n8n_client
+    from api.services.outbox_service import start_outbox_dispatcher, stop_outbox_dispatcher
+    from api.services.workflow_status import status_hub
+    from api.services.webhook_service import webhook_writer
+    from api.services.usage_service import usage_buffer
+    from api.services.quota_service import quota_service
+    from api.middleware.rate_limit import start_rate_limit_sync, stop_rate_limit_sync
+
+    await init_async_redis()
+    await status_hub.start()
+    await token_verifier.start()
+    await get_n8n_client().open()
+    ensure_invalidation_listener()
+    start_outbox_dispatcher()
+    webhook_writer.start()
+    usage_buffer.start()
+    quota_service.start()
+    start_rate_limit_sync()
+    yield
+    await stop_rate_limit_sync()
+    await quota_service.stop()
+    await usage_buffer.stop()
+    await webhook_writer.stop()
+    await stop_outbox_dispatcher()
+    await status_hub.stop()
+    await stop_invalidation_listener()
+    await token_verifier.close()
+    await close_n8n_client()
+    await close_async_redis()
+
+
 app = FastAPI(
     title="Cinefilm Platform API",
     description="Backend API for Cinefilm Platform",
     version="0.1.0",
-)
-
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.cors_origins_list if settings.environment == "production" else ["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    lifespan=lifespan,
 )
 
 # Rate limiting middleware (before cache middleware)
@@ -40,6 +70,10 @@ from api.middleware.rate_limit import RateLimitMiddleware, DEFAULT_ENDPOINT_LIMI
 app.add_middleware(
     RateLimitMiddleware,
     endpoint_limits=DEFAULT_ENDPOINT_LIMITS,
+    mode=settings.rate_limit_mode,
+    local_share=settings.rate_limit_local_share,
+    sync_interval_ms=settings.rate_limit_sync_interval_ms,
+    local_max_keys=settings.rate_limit_local_max_keys,
 )
 
 # Cache middleware (after rate limiting)
@@ -47,7 +81,40 @@ from api.middleware.cache import CacheMiddleware
 app.add_middleware(
     CacheMiddleware,
     cache_paths=["/api/projects"],  # Cache project endpoints
+    etag_paths=["/api/agents"],  # Revalidate agent sessions/artifacts without caching
     ttl=300,  # 5 minutes for project data
+    local_max_bytes=settings.cache_local_max_bytes,
+    local_ttl=settings.cache_local_ttl,
+    coalesce=settings.cache_coalesce,
+    stale_while_revalidate=settings.cache_stale_while_revalidate,
+    compression=settings.cache_compression,
+    compress_min_bytes=settings.cache_compress_min_bytes,
+)
+
+# Auth middleware (outside cache and rate limiting) so cache scoping and per-user rate limits see the verified user
+from api.middleware.auth import AuthMiddleware
+app.add_middleware(AuthMiddleware)
+
+# CORS middleware, added last so it wraps every response (including cache hits and
+# 429s) and answers preflights before auth and rate limiting
+from api.lib.pagination import NEXT_CURSOR_HEADER
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=settings.cors_origins_list if settings.environment == "production" else ["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    # Response headers the web app reads (cursor pagination, rate limit and quota budgets)
+    expose_headers=[
+        NEXT_CURSOR_HEADER,
+        "X-RateLimit-Limit",
+        "X-RateLimit-Remaining",
+        "X-RateLimit-Reset",
+        "Retry-After",
+        "X-Quota-Used",
+        "X-Quota-Limit",
+        "X-Quota-Remaining",
+    ],
 )
 
 
@@ -87,6 +154,10 @@ app.include_router(projects.router)
 from api.routers import webhooks
 app.include_router(webhooks.router)
 
+# Include workflow status stream router
+from api.routers import workflows
+app.include_router(workflows.router)
+
 # Include agents router
 from api.routers import agents
 app.include_router(agents.router)
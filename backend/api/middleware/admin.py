@@ -1,36 +1,154 @@
 """Admin middleware for protecting admin routes"""
+import asyncio
+from typing import Optional
 from fastapi import Request, HTTPException, status
-from firebase_admin import firestore
+from api.config import settings
+from api.lib.firestore import get_async_db
+from api.lib.redis import get_async_redis, redis_configured
 from api.middleware.auth import get_current_user
 import logging
 
 logger = logging.getLogger(__name__)
 
+ADMIN_FLAG_PREFIX = "auth:admin:"
+# Bumped by every invalidation; cached flags are stored as "<generation>:<flag>"
+ADMIN_GENERATION_PREFIX = "auth:admin-gen:"
+INVALIDATION_ATTEMPTS = 3
+INVALIDATION_RETRY_DELAY = 0.1
+
+# Cached admin flag values
+_ADMIN = b"1"
+_NOT_ADMIN = b"0"
+_NO_USER = b"-"
+
+# Caches a flag only if no invalidation happened since its generation was read,
+# so a Firestore read that predates a role change cannot be written back after it
+_CACHE_FLAG_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1] .. ':' .. ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# The generation outlives every flag cached under an older one
+_INVALIDATE_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+redis.call('DEL', KEYS[1])
+return 1
+"""
+
+
+class AdminCacheError(Exception):
+    """A cached admin flag could not be invalidated"""
+
+
+def _claims_grant_admin(claims: dict) -> bool:
+    """Custom claims set via the Admin SDK (admin: true or role: "admin")"""
+    return claims.get("admin") is True or claims.get("role") == "admin"
+
+
+async def _read_admin_flag(user_id: str) -> bytes:
+    """Resolve the admin flag from the user's Firestore document"""
+    db = get_async_db()
+    user_doc = await db.collection("users").document(user_id).get()
+    if not user_doc.exists:
+        return _NO_USER
+
+    user_data = user_doc.to_dict()
+    is_admin = user_data.get("role") == "admin" or user_data.get("isAdmin") == True
+    return _ADMIN if is_admin else _NOT_ADMIN
+
+
+def _flag_keys(user_id: str) -> list:
+    return [f"{ADMIN_FLAG_PREFIX}{user_id}", f"{ADMIN_GENERATION_PREFIX}{user_id}"]
+
+
+async def _get_admin_flag(user_id: str) -> bytes:
+    """Admin flag from the Redis TTL cache, falling back to Firestore"""
+    keys = _flag_keys(user_id)
+    redis_client = get_async_redis()
+    generation = None
+    if redis_client:
+        try:
+            cached, generation = await redis_client.mget(keys)
+            generation = generation or b"0"
+            if cached is not None:
+                cached_generation, _, flag = cached.rpartition(b":")
+                if cached_generation == generation:
+                    return flag
+        except Exception as e:
+            logger.warning(f"Admin flag cache read error: {e}")
+
+    flag = await _read_admin_flag(user_id)
+
+    # Missing users are not cached so a freshly created profile is seen immediately
+    if redis_client and generation is not None and flag != _NO_USER:
+        try:
+            cache_flag = redis_client.register_script(_CACHE_FLAG_SCRIPT)
+            await cache_flag(
+                keys=keys, args=[generation, flag, settings.admin_role_cache_ttl]
+            )
+        except Exception as e:
+            logger.warning(f"Admin flag cache write error: {e}")
+    return flag
+
+
+async def invalidate_admin_flag(user_id: str):
+    """
+    Make the next request re-read the user's admin flag from Firestore.
+    Retried a few times; raises AdminCacheError when Redis is configured but
+    the flag could not be invalidated, so the caller can fail the role change.
+    """
+    if not redis_configured():
+        return
+
+    last_error: Optional[Exception] = None
+    for attempt in range(INVALIDATION_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(INVALIDATION_RETRY_DELAY * attempt)
+        redis_client = get_async_redis()
+        if redis_client is None:
+            last_error = RuntimeError("Redis circuit breaker is open")
+            continue
+        try:
+            invalidate = redis_client.register_script(_INVALIDATE_SCRIPT)
+            await invalidate(
+                keys=_flag_keys(user_id), args=[2 * settings.admin_role_cache_ttl]
+            )
+            return
+        except Exception as e:
+            last_error = e
+
+    logger.error(f"Admin flag invalidation failed for {user_id}: {last_error}")
+    raise AdminCacheError(f"Could not invalidate the cached admin flag: {last_error}")
+
 
 async def require_admin(request: Request) -> dict:
     """
     Dependency to ensure user is an admin.
-    Checks Firestore user document for 'admin' role.
+    Custom claims on the token are authoritative when present; otherwise the
+    Firestore user document's 'admin' role is checked through a Redis TTL cache.
     """
     # Get current user
     current_user = await get_current_user(request)
+    if _claims_grant_admin(current_user):
+        return current_user
+
     user_id = current_user["uid"]
 
     # Check if user is admin
     try:
-        db = firestore.client()
-        user_doc = db.collection("users").document(user_id).get()
+        flag = await _get_admin_flag(user_id)
 
-        if not user_doc.exists:
+        if flag == _NO_USER:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="User not found",
             )
 
-        user_data = user_doc.to_dict()
-        is_admin = user_data.get("role") == "admin" or user_data.get("isAdmin") == True
-
-        if not is_admin:
+        if flag != _ADMIN:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Admin access required",
@@ -46,4 +164,3 @@ async def require_admin(request: Request) -> dict:
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error verifying admin access",
         )
-
@@ -1,11 +1,14 @@
 """Firebase Authentication middleware"""
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Callable, Optional
 import firebase_admin
-from firebase_admin import auth, credentials
+from firebase_admin import credentials
 import os
 import logging
 from api.config import settings
+from api.lib.firebase_tokens import token_verifier
 
 logger = logging.getLogger(__name__)
 
@@ -71,13 +74,40 @@ init_firebase()
 security = HTTPBearer()
 
 
+def _bearer_token(authorization: Optional[str]) -> Optional[str]:
+    """Extract token from "Bearer <token>" (or a bare token)"""
+    if not authorization:
+        return None
+    return authorization.split(" ")[1] if " " in authorization else authorization
+
+
+class AuthMiddleware(BaseHTTPMiddleware):
+    """
+    Verifies the bearer token once per request and exposes the identity on
+    request.state (user_id, claims) to inner middleware and routes.
+    Requests are never rejected here; get_current_user decides per route.
+    """
+
+    async def dispatch(self, request: Request, call_next: Callable):
+        token = _bearer_token(request.headers.get("Authorization"))
+        if token:
+            try:
+                claims = await token_verifier.verify(token)
+                request.state.user_id = claims["uid"]
+                request.state.claims = claims
+            except Exception as e:
+                logger.debug(f"Token verification failed: {type(e).__name__}: {str(e)}")
+                request.state.auth_error = e
+        return await call_next(request)
+
+
 async def verify_token(credentials: HTTPAuthorizationCredentials) -> dict:
     """
     Verify Firebase ID token and return decoded token
     """
     try:
         token = credentials.credentials
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = await token_verifier.verify(token)
         return decoded_token
     except Exception as e:
         raise HTTPException(
@@ -88,8 +118,13 @@ async def verify_token(credentials: HTTPAuthorizationCredentials) -> dict:
 
 async def get_current_user(request: Request) -> dict:
     """
-    Dependency to get current authenticated user from request
+    Dependency to get current authenticated user from request.
+    Reuses the identity verified by AuthMiddleware when it ran.
     """
+    claims = getattr(request.state, "claims", None)
+    if claims is not None:
+        return claims
+
     authorization = request.headers.get("Authorization")
     if not authorization:
         logger.warning("Authorization header missing")
@@ -99,11 +134,17 @@ async def get_current_user(request: Request) -> dict:
         )
 
     try:
-        # Extract token from "Bearer <token>"
-        token = authorization.split(" ")[1] if " " in authorization else authorization
+        auth_error = getattr(request.state, "auth_error", None)
+        if auth_error is not None:
+            raise auth_error
+
+        # AuthMiddleware not installed for this app: verify here
+        token = _bearer_token(authorization)
         logger.debug(f"Verifying token (first 20 chars): {token[:20]}...")
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = await token_verifier.verify(token)
         logger.debug(f"Token verified successfully for user: {decoded_token.get('uid')}")
+        request.state.user_id = decoded_token.get("uid")
+        request.state.claims = decoded_token
         return decoded_token
     except Exception as e:
         logger.error(f"Token verification failed: {type(e).__name__}: {str(e)}")
@@ -1,21 +1,223 @@
 """Response caching middleware using Redis"""
-import json
+import asyncio
 import hashlib
-from typing import Optional, Callable
+import json
+import re
+import time
+import uuid
+from typing import Optional, Callable, Iterable, Set, Dict, Any, Tuple, NamedTuple
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import StreamingResponse
 import logging
-from api.lib.redis import get_redis_client
+from api.lib.compression import (
+    IDENTITY,
+    GZIP,
+    accepts_encoding,
+    compress_body,
+    decompress_body,
+    resolve_codec,
+)
+from api.lib.local_cache import LocalCache
+from api.lib.redis import get_async_redis
 
 logger = logging.getLogger(__name__)
 
 # Default TTL in seconds
 DEFAULT_TTL = 3600  # 1 hour
 
+# Bodies smaller than this are stored and served uncompressed
+DEFAULT_COMPRESS_MIN_BYTES = 1024
+
+# Headers that describe the route's original body and must not be copied onto a re-encoded one
+_BODY_HEADERS = {"content-length", "content-encoding", "etag"}
+
+# Route headers stored with the body and replayed on hits (e.g. the next-page cursor)
+_PERSISTED_HEADERS = {"x-next-cursor"}
+
+# Tag sets live next to the entries they index: cache:tag:user:<id>, cache:tag:project:<id>
+TAG_PREFIX = "cache:tag:"
+
+_PROJECT_PATH_RE = re.compile(r"^/api/projects/([^/]+)")
+
+# Short-lived lock held by the instance recomputing an entry: cache:lock:<cache key>
+LOCK_PREFIX = "cache:lock:"
+LOCK_POLL_INTERVAL = 0.05
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Channel every worker listens on to evict its in-process (L1) copies
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Deletes every entry referenced by the given tag sets, then the tag sets themselves,
+# and broadcasts the deleted keys so L1 caches on every worker evict them too.
+# Runs server-side so a whole invalidation is one round trip without scanning the keyspace.
+_INVALIDATE_TAGS_SCRIPT = """
+local keys = {}
+for _, tag in ipairs(KEYS) do
+    local members = redis.call('SMEMBERS', tag)
+    for i = 1, #members, 500 do
+        redis.call('DEL', unpack(members, i, math.min(i + 499, #members)))
+    end
+    for _, member in ipairs(members) do
+        keys[#keys + 1] = member
+    end
+    redis.call('DEL', tag)
+end
+if #keys > 0 then
+    redis.call('PUBLISH', ARGV[1], cjson.encode(keys))
+end
+return keys
+"""
+
+# Per-process L1 tier, configured by CacheMiddleware when a byte budget is set
+_local_cache: Optional[LocalCache] = None
+_invalidation_task: Optional[asyncio.Task] = None
+_listener_connected = False
+LISTENER_RETRY_SECONDS = 5
+
+# Redis (L2) tier counters for this process
+_redis_stats = {"hits": 0, "misses": 0, "stale": 0, "coalesced": 0}
+
+
+def user_tag(user_id: str) -> str:
+    """Tag for every cached entry belonging to a user"""
+    return f"user:{user_id}"
+
+
+def project_tag(project_id: str) -> str:
+    """Tag for every cached entry that renders a project"""
+    return f"project:{project_id}"
+
+
+class CacheEntry(NamedTuple):
+    """A cached body as stored: possibly compressed, with its identity ETag"""
+
+    body: bytes
+    encoding: str
+    etag: str
+    headers: Tuple[Tuple[str, str], ...] = ()
+
+
+def _persisted_headers(headers: Iterable[Tuple[str, str]]) -> Tuple[Tuple[str, str], ...]:
+    return tuple((k.lower(), v) for k, v in headers if k.lower() in _PERSISTED_HEADERS)
+
+
+def configure_local_cache(max_bytes: int, ttl: int) -> Optional[LocalCache]:
+    """Create the process-wide L1 cache (max_bytes <= 0 disables it)"""
+    global _local_cache
+    if max_bytes <= 0:
+        _local_cache = None
+    elif _local_cache is None:
+        _local_cache = LocalCache(max_bytes=max_bytes, default_ttl=ttl)
+    return _local_cache
+
+
+def _handle_invalidation_message(message: dict):
+    """Evict keys broadcast by another worker's invalidation"""
+    if _local_cache is None:
+        return
+    try:
+        _local_cache.delete_many(json.loads(message["data"]))
+    except Exception as e:
+        logger.warning(f"Cache invalidation message error: {e}")
+
+
+async def _listen_for_invalidations():
+    """
+    Keep this worker subscribed to cache invalidations.
+    L1 is cleared whenever the subscription is (re)established, since
+    broadcasts sent while disconnected were missed.
+    """
+    global _listener_connected
+
+    while True:
+        redis_client = get_async_redis()
+        if redis_client is not None:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                if _local_cache is not None:
+                    _local_cache.clear()
+                _listener_connected = True
+                logger.info("Subscribed to cache invalidation channel")
+                async for message in pubsub.listen():
+                    _handle_invalidation_message(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener stopped: {e}")
+            finally:
+                _listener_connected = False
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+        await asyncio.sleep(LISTENER_RETRY_SECONDS)
+
+
+def ensure_invalidation_listener():
+    """Start the invalidation listener task if L1 is enabled and it is not running"""
+    global _invalidation_task
+
+    if _local_cache is None:
+        return
+    if _invalidation_task is not None and not _invalidation_task.done():
+        return
+    _invalidation_task = asyncio.create_task(_listen_for_invalidations())
+
+
+async def stop_invalidation_listener():
+    """Cancel the invalidation listener (called from the application lifespan)"""
+    global _invalidation_task
+
+    if _invalidation_task is None:
+        return
+    _invalidation_task.cancel()
+    try:
+        await _invalidation_task
+    except (asyncio.CancelledError, Exception):
+        pass
+    _invalidation_task = None
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Per-tier hit ratios for this worker process"""
+    served = _redis_stats["hits"] + _redis_stats["stale"]
+    lookups = served + _redis_stats["misses"]
+    return {
+        "local": _local_cache.stats() if _local_cache else None,
+        "redis": {
+            **_redis_stats,
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+        },
+    }
+
+
+def get_cache_scope(request: Request) -> str:
+    """
+    Identify whose view of the resource is being cached.
+    Uses the verified user when auth has already run, otherwise a digest of the
+    bearer credential so two users never share an entry.
+    """
+    user_id = getattr(request.state, "user_id", None)
+    if user_id:
+        return f"user:{user_id}"
+
+    authorization = request.headers.get("Authorization")
+    if authorization:
+        return f"cred:{hashlib.sha256(authorization.encode()).hexdigest()[:32]}"
+
+    return "anon"
+
 
 def generate_cache_key(request: Request, include_query: bool = True) -> str:
-    """Generate cache key from request path and query params"""
+    """Generate cache key from caller scope, request path and query params"""
     key_parts = [request.method, request.url.path]
 
     if include_query and request.query_params:
@@ -27,13 +229,92 @@ def generate_cache_key(request: Request, include_query: bool = True) -> str:
     key_string = ":".join(key_parts)
     # Create hash for long keys
     key_hash = hashlib.md5(key_string.encode()).hexdigest()
-    return f"cache:{key_hash}"
+    return f"cache:{get_cache_scope(request)}:{key_hash}"
+
+
+def get_cache_tags(request: Request) -> Set[str]:
+    """Derive the invalidation tags for a cached response"""
+    tags = set()
+
+    user_id = getattr(request.state, "user_id", None)
+    if user_id:
+        tags.add(user_tag(user_id))
+
+    match = _PROJECT_PATH_RE.match(request.url.path)
+    if match:
+        tags.add(project_tag(match.group(1)))
+
+    project_id = request.query_params.get("project_id")
+    if project_id:
+        tags.add(project_tag(project_id))
+
+    return tags
+
+
+def compute_etag(body) -> str:
+    """Strong validator derived from the response bytes"""
+    if isinstance(body, str):
+        body = body.encode()
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """Evaluate If-None-Match against an ETag (weak comparison, as RFC 9110 requires for GET)"""
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def _vary(encoding: str) -> Optional[str]:
+    """Vary header sent with an entry stored in the given coding"""
+    return None if encoding == IDENTITY else "Accept-Encoding"
+
+
+def not_modified(
+    etag: str, cache_status: Optional[str] = None, vary: Optional[str] = None
+) -> Response:
+    """304 response carrying the current validator and the Vary the 200 would have sent"""
+    headers = {"ETag": etag}
+    if vary:
+        headers["Vary"] = vary
+    if cache_status:
+        headers["X-Cache"] = cache_status
+    return Response(status_code=304, headers=headers)
+
+
+async def read_response_body(response: Response) -> bytes:
+    """Drain a downstream response (call_next returns a streaming wrapper)"""
+    if not hasattr(response, "body_iterator"):
+        return response.body
+
+    body = b""
+    async for chunk in response.body_iterator:
+        body += chunk
+    return body
 
 
 class CacheMiddleware(BaseHTTPMiddleware):
     """
     Middleware to cache GET request responses in Redis.
     Only caches successful responses (200 OK).
+    Every entry is indexed in per-user and per-project tag sets so writes can
+    invalidate exactly the entries they affect.
+    With local_max_bytes set, an in-process LRU (L1) sits in front of Redis and
+    is kept coherent across workers through Redis pub/sub.
+    With coalesce set, concurrent misses for one key share a single recomputation
+    (an asyncio future within the process, a short Redis lock across instances),
+    and entries past their TTL are served stale for stale_while_revalidate seconds
+    while a background task refreshes them.
+    Cached entries carry a content hash served as a strong ETag; a matching
+    If-None-Match is answered with 304 without reading the body. GETs under
+    etag_paths are not cached but still get an ETag and 304 revalidation.
+    Bodies above compress_min_bytes are stored compressed (zstd or gzip) and
+    sent without recompression to clients that accept that coding.
+    Pagination headers (X-Next-Cursor) are stored with the body and replayed.
     """
 
     def __init__(
@@ -42,13 +323,34 @@ class CacheMiddleware(BaseHTTPMiddleware):
         ttl: int = DEFAULT_TTL,
         cache_paths: Optional[list] = None,
         exclude_paths: Optional[list] = None,
+        local_max_bytes: int = 0,
+        local_ttl: int = 30,
+        coalesce: bool = False,
+        stale_while_revalidate: int = 0,
+        lock_timeout: float = 10.0,
+        etag_paths: Optional[list] = None,
+        compression: str = GZIP,
+        compress_min_bytes: int = DEFAULT_COMPRESS_MIN_BYTES,
     ):
         super().__init__(app)
         self.ttl = ttl
+        # L1 entries expire sooner than Redis ones to bound staleness if a broadcast is missed
+        self.local_ttl = min(local_ttl, ttl)
+        self.local_cache = configure_local_cache(local_max_bytes, self.local_ttl)
+        self.coalesce = coalesce
+        self.stale_while_revalidate = stale_while_revalidate if coalesce else 0
+        self.lock_timeout = lock_timeout
+        self.codec = resolve_codec(compression)
+        self.compress_min_bytes = compress_min_bytes
+        # Recomputations in flight in this process, keyed by cache key
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background_tasks: Set[asyncio.Task] = set()
         # Paths to cache (if None, cache all GET requests)
         self.cache_paths = cache_paths or []
         # Paths to exclude from caching
         self.exclude_paths = exclude_paths or ["/health", "/docs", "/openapi.json"]
+        # Uncached paths that still get ETag revalidation
+        self.etag_paths = etag_paths or []
 
     async def dispatch(self, request: Request, call_next: Callable):
         # Only cache GET requests
@@ -63,83 +365,415 @@ class CacheMiddleware(BaseHTTPMiddleware):
         if self.cache_paths and not any(
             request.url.path.startswith(path) for path in self.cache_paths
         ):
+            if any(request.url.path.startswith(path) for path in self.etag_paths):
+                return await self._revalidate(request, call_next)
             return await call_next(request)
 
+        # Key is computed before the route runs so lookup and store agree
+        cache_key = generate_cache_key(request)
+
+        # Try the in-process tier first
+        if self.local_cache is not None:
+            entry = self.local_cache.get(cache_key)
+            if entry is not None:
+                logger.debug(f"L1 cache hit: {cache_key}")
+                return self._entry_response(request, entry, "HIT-LOCAL")
+
         # Try to get from cache
-        redis_client = get_redis_client()
+        redis_client = get_async_redis()
         if redis_client:
-            cache_key = generate_cache_key(request)
+            ensure_invalidation_listener()
             try:
-                cached_response = redis_client.get(cache_key)
-                if cached_response:
+                # Conditional requests only need the stored hash, not the body
+                if request.headers.get("If-None-Match"):
+                    etag, encoding, fresh_until = await self._load_etag(redis_client, cache_key)
+                    if etag_matches(request, etag):
+                        if fresh_until > time.time():
+                            _redis_stats["hits"] += 1
+                            return not_modified(etag, "HIT", _vary(encoding))
+                        if self._serves_stale(fresh_until):
+                            _redis_stats["stale"] += 1
+                            await self._refresh_in_background(
+                                redis_client, request.scope, cache_key
+                            )
+                            return not_modified(etag, "STALE", _vary(encoding))
+
+                entry, fresh_until = await self._load(redis_client, cache_key)
+                if entry is not None and fresh_until > time.time():
+                    _redis_stats["hits"] += 1
                     logger.debug(f"Cache hit: {cache_key}")
-                    return Response(
-                        content=cached_response,
-                        media_type="application/json",
-                        headers={"X-Cache": "HIT"},
-                    )
+                    self._store_local(cache_key, entry, fresh_until)
+                    return self._entry_response(request, entry, "HIT")
+
+                if entry is not None and self._serves_stale(fresh_until):
+                    # Past TTL but inside the stale-while-revalidate window
+                    _redis_stats["stale"] += 1
+                    logger.debug(f"Cache stale: {cache_key}")
+                    await self._refresh_in_background(redis_client, request.scope, cache_key)
+                    return self._entry_response(request, entry, "STALE")
+                _redis_stats["misses"] += 1
             except Exception as e:
                 logger.warning(f"Cache read error: {e}")
 
+        if not redis_client or not self.coalesce:
+            response, _ = await self._fetch(redis_client, request, call_next, cache_key)
+            return response
+
+        # Single-flight: join a recomputation already running in this process
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            try:
+                entry = await asyncio.wait_for(asyncio.shield(inflight), self.lock_timeout)
+            except Exception:
+                entry = None
+            if entry is not None:
+                _redis_stats["coalesced"] += 1
+                return self._entry_response(request, entry, "COALESCED")
+            return await call_next(request)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        entry = None
+        try:
+            lock_token = await self._acquire_lock(redis_client, cache_key)
+            if lock_token is None:
+                # Another instance is recomputing; wait for its result
+                entry = await self._wait_for_entry(redis_client, cache_key)
+                if entry is not None:
+                    _redis_stats["coalesced"] += 1
+                    return self._entry_response(request, entry, "COALESCED")
+
+            try:
+                response, entry = await self._fetch(redis_client, request, call_next, cache_key)
+                return response
+            finally:
+                if lock_token is not None:
+                    await self._release_lock(redis_client, cache_key, lock_token)
+        finally:
+            self._inflight.pop(cache_key, None)
+            future.set_result(entry)
+
+    def _serves_stale(self, fresh_until: float) -> bool:
+        """Whether an expired entry is still inside the stale-while-revalidate window"""
+        if self.stale_while_revalidate <= 0:
+            return False
+        return time.time() < fresh_until + self.stale_while_revalidate
+
+    async def _fetch(
+        self, redis_client, request: Request, call_next: Callable, cache_key: str
+    ) -> Tuple[Response, Optional[CacheEntry]]:
+        """Run the route and cache a successful response"""
         # Execute request
         response = await call_next(request)
 
         # Cache successful responses
         if redis_client and response.status_code == 200:
-            cache_key = generate_cache_key(request)
+            entry = self._encode(await read_response_body(response), response.headers.items())
+
             try:
-                # Read response body
-                if isinstance(response, StreamingResponse):
-                    body = b""
-                    async for chunk in response.body_iterator:
-                        body += chunk
-                    response_body = body
-                else:
-                    response_body = response.body
-
-                # Store in cache
-                redis_client.setex(cache_key, self.ttl, response_body)
-                logger.debug(f"Cache set: {cache_key} (TTL: {self.ttl}s)")
-
-                # Return response with cache header
-                return Response(
-                    content=response_body,
-                    status_code=response.status_code,
-                    media_type=response.media_type,
-                    headers={**dict(response.headers), "X-Cache": "MISS"},
-                )
+                # Tags are resolved after the route so the verified user is known
+                await self._store(redis_client, cache_key, entry, get_cache_tags(request))
+                logger.debug(f"Cache set: {cache_key} (TTL: {self.ttl}s, {entry.encoding})")
             except Exception as e:
                 logger.warning(f"Cache write error: {e}")
 
-        return response
+            # Return response with cache header
+            headers = {
+                k: v for k, v in response.headers.items() if k.lower() not in _BODY_HEADERS
+            }
+            return self._entry_response(request, entry, "MISS", headers), entry
+
+        return response, None
+
+    async def _revalidate(self, request: Request, call_next: Callable):
+        """Attach an ETag to an uncached GET and answer If-None-Match with 304 (no compression)"""
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            return response
+        if "content-encoding" in response.headers:
+            return response
+
+        body = await read_response_body(response)
+        etag = compute_etag(body)
+        if etag_matches(request, etag):
+            return not_modified(etag, vary=response.headers.get("vary"))
+
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _BODY_HEADERS}
+        return self._entry_response(request, CacheEntry(body, IDENTITY, etag), None, headers)
+
+    def _encode(self, body: bytes, headers: Iterable[Tuple[str, str]] = ()) -> CacheEntry:
+        """Hash and (above the size threshold) compress a route body for storage"""
+        stored, encoding = compress_body(body, self.codec, self.compress_min_bytes)
+        return CacheEntry(stored, encoding, compute_etag(body), _persisted_headers(headers))
+
+    def _entry_response(
+        self,
+        request: Request,
+        entry: CacheEntry,
+        cache_status: Optional[str],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        """
+        Build a response from a stored entry, or a 304 if the client already has it.
+        Compressed bodies go out as-is when the client accepts their coding.
+        """
+        if etag_matches(request, entry.etag):
+            return not_modified(entry.etag, cache_status, _vary(entry.encoding))
+
+        headers = dict(headers or {})
+        headers.update(entry.headers)
+        if cache_status:
+            headers["X-Cache"] = cache_status
+        headers.setdefault("content-type", "application/json")
+
+        if entry.encoding == IDENTITY:
+            headers["ETag"] = entry.etag
+            return Response(content=entry.body, headers=headers)
+
+        headers["Vary"] = "Accept-Encoding"
+        if accepts_encoding(request.headers.get("Accept-Encoding"), entry.encoding):
+            # Same validator, different bytes: mark it weak for the encoded representation
+            headers["ETag"] = f"W/{entry.etag}"
+            headers["Content-Encoding"] = entry.encoding
+            return Response(content=entry.body, headers=headers)
 
+        headers["ETag"] = entry.etag
+        return Response(content=decompress_body(entry.body, entry.encoding), headers=headers)
 
-def invalidate_cache_pattern(pattern: str):
+    async def _load(self, redis_client, cache_key: str) -> Tuple[Optional[CacheEntry], float]:
+        """Read a stored entry and the time until which it is fresh"""
+        body, encoding, etag, fresh_until, headers = await redis_client.hmget(
+            cache_key, "body", "encoding", "etag", "fresh_until", "headers"
+        )
+        if body is None:
+            return None, 0.0
+        encoding = encoding.decode() if encoding else IDENTITY
+        if etag:
+            etag = etag.decode()
+        else:
+            etag = compute_etag(decompress_body(body, encoding))
+        headers = tuple(tuple(header) for header in json.loads(headers)) if headers else ()
+        return CacheEntry(body, encoding, etag, headers), float(fresh_until or 0)
+
+    async def _load_etag(
+        self, redis_client, cache_key: str
+    ) -> Tuple[Optional[str], str, float]:
+        """Read only an entry's ETag, coding and freshness"""
+        etag, encoding, fresh_until = await redis_client.hmget(
+            cache_key, "etag", "encoding", "fresh_until"
+        )
+        return (
+            etag.decode() if etag else None,
+            encoding.decode() if encoding else IDENTITY,
+            float(fresh_until or 0),
+        )
+
+    async def _store(self, redis_client, cache_key: str, entry: CacheEntry, tags: Iterable[str]):
+        """Store an entry and index it under its tags in one pipelined round trip"""
+        fresh_until = time.time() + self.ttl
+        # Entries outlive their TTL by the stale window so they can be served while refreshing
+        expire = self.ttl + self.stale_while_revalidate
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.delete(cache_key)
+        pipe.hset(
+            cache_key,
+            mapping={
+                "body": entry.body,
+                "encoding": entry.encoding,
+                "etag": entry.etag,
+                "fresh_until": fresh_until,
+            },
+        )
+        if entry.headers:
+            pipe.hset(cache_key, "headers", json.dumps(entry.headers))
+        pipe.expire(cache_key, expire)
+        for tag in tags:
+            tag_key = f"{TAG_PREFIX}{tag}"
+            pipe.sadd(tag_key, cache_key)
+            # Tag set outlives its newest entry; stale members are harmless on DEL
+            pipe.expire(tag_key, expire)
+        await pipe.execute()
+        self._store_local(cache_key, entry, fresh_until)
+
+    def _store_local(self, cache_key: str, entry: CacheEntry, fresh_until: float):
+        """Copy a fresh entry into L1 (only while invalidations are being received)"""
+        if self.local_cache is None:
+            return
+        if not _listener_connected:
+            return
+        ttl = min(self.local_ttl, fresh_until - time.time())
+        if ttl <= 0:
+            return
+        size = len(entry.body) + len(cache_key) + len(entry.etag)
+        self.local_cache.set(cache_key, entry, size=size, ttl=ttl)
+
+    async def _acquire_lock(self, redis_client, cache_key: str) -> Optional[str]:
+        """Take the cross-instance recompute lock; returns its token or None if held elsewhere"""
+        token = uuid.uuid4().hex
+        try:
+            if await redis_client.set(
+                f"{LOCK_PREFIX}{cache_key}", token, nx=True, px=int(self.lock_timeout * 1000)
+            ):
+                return token
+            return None
+        except Exception as e:
+            logger.warning(f"Cache lock error: {e}")
+            # Without Redis coordination, fall back to recomputing locally
+            return ""
+
+    async def _release_lock(self, redis_client, cache_key: str, token: str):
+        """Release the recompute lock if we still own it"""
+        if not token:
+            return
+        try:
+            release = redis_client.register_script(_RELEASE_LOCK_SCRIPT)
+            await release(keys=[f"{LOCK_PREFIX}{cache_key}"], args=[token])
+        except Exception as e:
+            logger.warning(f"Cache lock release error: {e}")
+
+    async def _wait_for_entry(self, redis_client, cache_key: str) -> Optional[CacheEntry]:
+        """Poll for an entry another instance is recomputing, up to the lock timeout"""
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            try:
+                entry, fresh_until = await self._load(redis_client, cache_key)
+            except Exception:
+                return None
+            if entry is not None and fresh_until > time.time():
+                return entry
+            try:
+                if not await redis_client.exists(f"{LOCK_PREFIX}{cache_key}"):
+                    return None
+            except Exception:
+                return None
+        return None
+
+    async def _refresh_in_background(self, redis_client, scope: dict, cache_key: str):
+        """Recompute a stale entry off the request path, once across all instances"""
+        if cache_key in self._inflight:
+            return
+        lock_token = await self._acquire_lock(redis_client, cache_key)
+        if lock_token is None:
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        # The original request is answered before this runs; give the route its own scope
+        refresh_scope = {**scope, "state": dict(scope.get("state", {}))}
+
+        async def refresh():
+            entry = None
+            try:
+                status_code, body, headers = await self._render(refresh_scope)
+                if status_code == 200:
+                    entry = self._encode(body, headers)
+                    tags = get_cache_tags(Request(refresh_scope))
+                    await self._store(redis_client, cache_key, entry, tags)
+                    logger.debug(f"Cache refreshed: {cache_key}")
+            except Exception as e:
+                logger.warning(f"Cache refresh error: {e}")
+                entry = None
+            finally:
+                await self._release_lock(redis_client, cache_key, lock_token)
+                self._inflight.pop(cache_key, None)
+                future.set_result(entry)
+
+        task = asyncio.create_task(refresh())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _render(self, scope: dict) -> Tuple[int, bytes, list]:
+        """Run the downstream app for a bodiless GET and collect its response"""
+        status_code = 500
+        headers = []
+        chunks = []
+        request_sent = False
+        response_done = asyncio.Event()
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await response_done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers.extend(
+                    (k.decode("latin-1"), v.decode("latin-1")) for k, v in message.get("headers", [])
+                )
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response_done.set()
+
+        await self.app(scope, receive, send)
+        return status_code, b"".join(chunks), headers
+
+
+async def invalidate_cache_tags(*tags: str) -> int:
+    """
+    Invalidate every cache entry recorded under any of the given tags.
+    Returns the number of entries deleted.
+    """
+    if not tags:
+        return 0
+
+    redis_client = get_async_redis()
+    if not redis_client:
+        return 0
+
+    try:
+        tag_keys = [f"{TAG_PREFIX}{tag}" for tag in tags]
+        invalidate = redis_client.register_script(_INVALIDATE_TAGS_SCRIPT)
+        deleted_keys = [
+            key.decode()
+            for key in await invalidate(keys=tag_keys, args=[INVALIDATION_CHANNEL])
+        ]
+        if deleted_keys:
+            # Evict locally right away rather than waiting for our own broadcast
+            if _local_cache is not None:
+                _local_cache.delete_many(deleted_keys)
+            logger.info(f"Invalidated {len(deleted_keys)} cache entries for tags: {', '.join(tags)}")
+        return len(deleted_keys)
+    except Exception as e:
+        logger.warning(f"Cache invalidation error: {e}")
+        return 0
+
+
+async def invalidate_cache_pattern(pattern: str):
     """
     Invalidate cache entries matching a pattern.
-    Pattern examples: 'cache:projects:*', 'cache:project:123'
+    Pattern examples: 'cache:user:123:*'
+    Walks the keyspace incrementally with SCAN; prefer invalidate_cache_tags on hot paths.
     """
-    redis_client = get_redis_client()
+    redis_client = get_async_redis()
     if not redis_client:
         return
 
     try:
-        keys = redis_client.keys(pattern)
+        keys = [key.decode() async for key in redis_client.scan_iter(match=pattern, count=500)]
         if keys:
-            redis_client.delete(*keys)
+            await redis_client.delete(*keys)
+            await redis_client.publish(INVALIDATION_CHANNEL, json.dumps(keys))
+            if _local_cache is not None:
+                _local_cache.delete_many(keys)
             logger.info(f"Invalidated {len(keys)} cache entries matching: {pattern}")
     except Exception as e:
         logger.warning(f"Cache invalidation error: {e}")
 
 
-def invalidate_user_cache(user_id: str):
+async def invalidate_user_cache(user_id: str):
     """Invalidate all cache entries for a specific user"""
-    invalidate_cache_pattern(f"cache:*:user:{user_id}*")
-    invalidate_cache_pattern(f"cache:*:userId:{user_id}*")
+    await invalidate_cache_tags(user_tag(user_id))
 
 
-def invalidate_project_cache(project_id: str):
+async def invalidate_project_cache(project_id: str):
     """Invalidate all cache entries for a specific project"""
-    invalidate_cache_pattern(f"cache:*:project:{project_id}*")
-    invalidate_cache_pattern(f"cache:*:projectId:{project_id}*")
-
+    await invalidate_cache_tags(project_tag(project_id))
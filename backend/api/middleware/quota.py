@@ -0,0 +1,96 @@
+"""Monthly quota checks for metered endpoints"""
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from fastapi import Depends, HTTPException, Request, status
+from api.config import settings
+from api.middleware.auth import get_current_user
+from api.services.quota_service import QuotaResult, QuotaUnavailableError, quota_service
+from api.services.usage_service import QUOTA_FIELDS, UsageEvent, usage_buffer
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class QuotaReservation:
+    """Units held for one request; the endpoint releases them if the call produced nothing"""
+
+    def __init__(self, user_id: str, field: str, result: Optional[QuotaResult]):
+        self.user_id = user_id
+        self.field = field
+        self.result = result
+        self.released = False
+
+    async def release(self):
+        if self.released:
+            return
+        self.released = True
+        if self.result is not None and self.result.reserved:
+            await quota_service.release(self.user_id, self.field)
+
+
+def _quota_headers(result: QuotaResult) -> Dict[str, str]:
+    headers = {"X-Quota-Used": str(result.used)}
+    if result.remaining is not None:
+        headers["X-Quota-Limit"] = str(result.limit)
+        headers["X-Quota-Remaining"] = str(result.remaining)
+    return headers
+
+
+def require_quota(action: str, resource_type: Optional[str] = None):
+    """
+    Dependency that takes one unit of the action's monthly quota before the endpoint runs.
+
+    Over quota, the request fails with 429 before any agent work, and with 503 when
+    the quota cannot be checked (unless settings.quota_fail_open). If the endpoint
+    raises, or calls release() on the yielded reservation, the unit is returned;
+    otherwise the call is recorded in the usage buffer, which also counts it in
+    the Firestore quota document.
+
+    Args:
+        action: Tracked action, a key of QUOTA_FIELDS (e.g. "ai_generation")
+        resource_type: Optional resource type for the usage record
+    """
+    field = QUOTA_FIELDS[action]
+
+    async def dependency(request: Request, current_user: dict = Depends(get_current_user)):
+        user_id = current_user["uid"]
+        result = None
+        if settings.quota_enforcement:
+            try:
+                result = await quota_service.reserve(user_id, field)
+            except QuotaUnavailableError:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Quota check unavailable. Please retry later.",
+                    headers={"Retry-After": "5"},
+                )
+            if not result.allowed:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail=f"Monthly {field} quota exceeded",
+                    headers=_quota_headers(result),
+                )
+
+        reservation = QuotaReservation(user_id, field, result)
+        start_time = datetime.now(timezone.utc)
+        try:
+            yield reservation
+        except Exception:
+            await reservation.release()
+            raise
+        if reservation.released:
+            return
+
+        duration_ms = int((datetime.now(timezone.utc) - start_time).total_seconds() * 1000)
+        usage_buffer.record(
+            UsageEvent(
+                user_id=user_id,
+                action=action,
+                resource_type=resource_type,
+                duration_ms=duration_ms,
+                endpoint=request.url.path,
+                timestamp=start_time,
+            )
+        )
+
+    return dependency
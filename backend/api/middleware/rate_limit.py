@@ -1,15 +1,59 @@
-"""Rate limiting middleware using Redis sliding window"""
-import time
-from typing import Optional, Callable
-from fastapi import Request, HTTPException, status
+"""Rate limiting middleware using a Redis GCRA (generic cell rate algorithm)"""
+from collections import OrderedDict
+from typing import Optional, Callable, NamedTuple
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+import asyncio
 import logging
-from api.lib.redis import get_redis_client
-from api.middleware.auth import get_current_user
+import time
+import weakref
+from api.lib.redis import get_async_redis
 
 logger = logging.getLogger(__name__)
 
+# GCRA keeps one key per limited client holding its theoretical arrival time (TAT).
+# Each request advances the TAT by interval * cost; it is allowed while the TAT stays
+# within one window of now. Rejected requests do not move the TAT, so a client that
+# keeps hammering does not extend its own lockout. Times are in milliseconds.
+#
+# KEYS[1] = rate limit key
+# ARGV[1] = emission interval (window / requests), ARGV[2] = requests per window, ARGV[3] = cost
+# ARGV[4] = force: charge even when over budget (used to reconcile consumption already
+#           allowed locally); the TAT is capped at one window ahead so overshoot is bounded
+# Returns {allowed, remaining, reset_after, retry_after}
+_GCRA_SCRIPT = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local window = interval * limit
+
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+
+local new_tat = tat + interval * cost
+local allow_at = new_tat - window
+if now < allow_at and ARGV[4] == '1' then
+    redis.call('SET', KEYS[1], now + window, 'PX', window)
+    return {0, 0, window, interval}
+end
+if now < allow_at then
+    local remaining = math.floor((window - (tat - now)) / interval)
+    return {0, remaining, math.ceil(tat - now), math.ceil(allow_at - now)}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+local remaining = math.floor((window - (new_tat - now)) / interval)
+return {1, remaining, math.ceil(new_tat - now), 0}
+"""
+
 
 class RateLimitConfig:
     """Rate limit configuration for an endpoint"""
@@ -19,25 +63,213 @@ class RateLimitConfig:
         requests: int,
         window_seconds: int,
         key_func: Optional[Callable[[Request], str]] = None,
+        cost: int = 1,
+        bucket: Optional[str] = None,
     ):
         """
         Args:
-            requests: Number of requests allowed
+            requests: Number of budget units allowed per window
             window_seconds: Time window in seconds
             key_func: Function to generate rate limit key from request
+            cost: Units charged per request (e.g. 10 for Gemini-backed endpoints)
+            bucket: Budget name shared by every rule using it; defaults to the rule template
         """
+        if cost > requests:
+            raise ValueError(f"Rate limit cost {cost} exceeds budget of {requests}")
         self.requests = requests
         self.window_seconds = window_seconds
         self.key_func = key_func or self._default_key_func
+        self.cost = cost
+        self.bucket = bucket
+
+    @property
+    def interval_ms(self) -> int:
+        """Milliseconds of budget each request consumes"""
+        return max(1, int(self.window_seconds * 1000 / self.requests))
 
     def _default_key_func(self, request: Request) -> str:
         """Default key function: rate limit by IP address"""
         return f"rate_limit:ip:{request.client.host}"
 
 
+class RateLimitRule(NamedTuple):
+    """A matched rule: its config and the bucket its budget is tracked under"""
+
+    config: RateLimitConfig
+    bucket: str
+
+
+class _RuleNode:
+    __slots__ = ("children", "wildcard", "catch_all", "rule")
+
+    def __init__(self):
+        self.children: dict[str, "_RuleNode"] = {}
+        self.wildcard: Optional["_RuleNode"] = None
+        self.catch_all: Optional[RateLimitRule] = None
+        self.rule: Optional[RateLimitRule] = None
+
+
+class RateLimitRules:
+    """
+    Prefix trie of rate limit rules keyed by route template.
+
+    Templates are matched segment by segment: `*` or `{param}` matches any single
+    segment and a trailing `**` matches the rest of the path. Literal segments take
+    precedence over wildcards, so `/api/projects/stats` beats `/api/projects/{id}`.
+    """
+
+    def __init__(self, rules: Optional[dict[str, RateLimitConfig]] = None):
+        self._root = _RuleNode()
+        for template, config in (rules or {}).items():
+            self.add(template, config)
+
+    @staticmethod
+    def _segments(path: str) -> list[str]:
+        return [segment for segment in path.split("/") if segment]
+
+    def add(self, template: str, config: RateLimitConfig) -> None:
+        """Register a rule for a route template"""
+        rule = RateLimitRule(config, config.bucket or template)
+        segments = self._segments(template)
+        node = self._root
+        for i, segment in enumerate(segments):
+            if segment == "**":
+                if i != len(segments) - 1:
+                    raise ValueError(f"'**' must be the last segment in {template}")
+                node.catch_all = rule
+                return
+            if segment == "*" or (segment.startswith("{") and segment.endswith("}")):
+                if node.wildcard is None:
+                    node.wildcard = _RuleNode()
+                node = node.wildcard
+            else:
+                node = node.children.setdefault(segment, _RuleNode())
+        node.rule = rule
+
+    def match(self, path: str) -> Optional[RateLimitRule]:
+        """Find the most specific rule for a request path"""
+        return self._match(self._root, self._segments(path), 0)
+
+    def _match(
+        self, node: _RuleNode, segments: list[str], index: int
+    ) -> Optional[RateLimitRule]:
+        if index == len(segments):
+            return node.rule or node.catch_all
+
+        child = node.children.get(segments[index])
+        if child is not None:
+            rule = self._match(child, segments, index + 1)
+            if rule is not None:
+                return rule
+        if node.wildcard is not None:
+            rule = self._match(node.wildcard, segments, index + 1)
+            if rule is not None:
+                return rule
+        return node.catch_all
+
+
+class RateLimitResult(NamedTuple):
+    """Outcome of one rate limit check"""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # Seconds until the budget is fully replenished
+    retry_after: float  # Seconds until a rejected request would be allowed
+
+
+class _LocalBucket:
+    """
+    Per-worker token bucket holding a share of a global budget.
+
+    Capacity is `share` of the rule's budget and refills at the global rate.
+    Units spent locally accumulate in `pending` until they are charged to Redis;
+    the reconciled global remaining then caps the local tokens, so concurrent
+    workers converge on the shared limit within one sync interval.
+    """
+
+    __slots__ = ("config", "capacity", "rate", "tokens", "pending", "remote_remaining", "updated_at")
+
+    def __init__(self, config: RateLimitConfig, share: float):
+        self.config = config
+        self.capacity = max(float(config.cost), config.requests * share)
+        self.rate = config.requests / config.window_seconds
+        self.tokens = self.capacity
+        self.pending = 0
+        self.remote_remaining = config.requests
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def consume(self) -> RateLimitResult:
+        """Try to spend one request's cost locally"""
+        now = time.monotonic()
+        self._refill(now)
+        cost = self.config.cost
+        allowed = self.tokens >= cost
+        if allowed:
+            self.tokens -= cost
+            # Cap what is owed so a long Redis outage cannot lock the client out on recovery
+            self.pending = min(self.pending + cost, self.config.requests)
+        remaining = max(0, min(self.remote_remaining - self.pending, int(self.tokens)))
+        return RateLimitResult(
+            allowed=allowed,
+            limit=self.config.requests,
+            remaining=remaining,
+            reset_after=(self.config.requests - remaining) / self.rate,
+            retry_after=0.0 if allowed else (cost - self.tokens) / self.rate,
+        )
+
+    def reconcile(self, remote_remaining: int) -> None:
+        """Apply the global remaining budget reported by Redis"""
+        self._refill(time.monotonic())
+        self.remote_remaining = remote_remaining
+        self.tokens = max(0.0, min(self.capacity, remote_remaining - self.pending))
+
+
+_rate_limit_stats = {
+    "redis_checks": 0,
+    "local_allowed": 0,
+    "local_rejected": 0,
+    "fallbacks": 0,
+    "syncs": 0,
+    "sync_errors": 0,
+}
+
+
+# Hybrid-mode middleware instances, whose sync loops the application lifespan runs
+_hybrid_limiters: "weakref.WeakSet[RateLimitMiddleware]" = weakref.WeakSet()
+
+
+def get_rate_limit_stats() -> dict:
+    """Rate limiter counters for this worker process"""
+    return dict(_rate_limit_stats)
+
+
+def start_rate_limit_sync():
+    """Start the Redis sync loop of every hybrid limiter (called from the application lifespan)"""
+    for limiter in list(_hybrid_limiters):
+        limiter.start_sync()
+
+
+async def stop_rate_limit_sync():
+    """Stop the sync loops and charge what was spent since the last sync"""
+    for limiter in list(_hybrid_limiters):
+        await limiter.stop_sync()
+
+
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
-    Rate limiting middleware using Redis sliding window algorithm.
+    Rate limiting middleware using an atomic Redis GCRA.
+    One key per client, O(1) memory, one EVALSHA per request.
+
+    In "hybrid" mode requests are decided by per-worker token buckets with no
+    network call, and the consumed units are charged to Redis in one pipeline
+    every sync interval (start_rate_limit_sync/stop_rate_limit_sync run the loop
+    from the application lifespan). In either mode, when Redis is unavailable the local
+    buckets keep enforcing instead of failing open.
     """
 
     def __init__(
@@ -45,95 +277,186 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         app,
         default_limit: Optional[RateLimitConfig] = None,
         endpoint_limits: Optional[dict[str, RateLimitConfig]] = None,
+        mode: str = "redis",
+        local_share: float = 0.25,
+        sync_interval_ms: int = 200,
+        local_max_keys: int = 10000,
     ):
+        """
+        Args:
+            mode: "redis" checks every request against Redis, "hybrid" decides locally
+            local_share: Fraction of each budget a worker may spend between syncs
+            sync_interval_ms: How often locally consumed units are charged to Redis
+            local_max_keys: Maximum number of local buckets kept per worker (LRU)
+        """
         super().__init__(app)
+        if mode not in ("redis", "hybrid"):
+            raise ValueError(f"Unknown rate limit mode: {mode}")
         # Default: 100 requests per minute per IP
         self.default_limit = default_limit or RateLimitConfig(
             requests=100, window_seconds=60
         )
-        # Endpoint-specific limits
-        self.endpoint_limits = endpoint_limits or {}
+        # Endpoint-specific limits, matched by route template
+        self.rules = RateLimitRules(endpoint_limits)
+        self._default_rule = RateLimitRule(
+            self.default_limit, self.default_limit.bucket or "default"
+        )
+        self._script = None
+        self.mode = mode
+        self.local_share = local_share
+        self.sync_interval = sync_interval_ms / 1000
+        self.local_max_keys = local_max_keys
+        self._buckets: "OrderedDict[str, _LocalBucket]" = OrderedDict()
+        self._sync_task: Optional[asyncio.Task] = None
+        if mode == "hybrid":
+            _hybrid_limiters.add(self)
 
     async def dispatch(self, request: Request, call_next: Callable):
-        # Get rate limit config for this endpoint
-        limit_config = self.endpoint_limits.get(
-            request.url.path, self.default_limit
-        )
+        # Get rate limit rule for this endpoint
+        rule = self.rules.match(request.url.path) or self._default_rule
+        limit_config = rule.config
 
-        # Generate rate limit key
-        rate_limit_key = limit_config.key_func(request)
+        # Generate rate limit key; each bucket has its own budget
+        rate_limit_key = f"{limit_config.key_func(request)}:{rule.bucket}"
 
         # Check rate limit
-        redis_client = get_redis_client()
-        if redis_client:
-            try:
-                if not self._check_rate_limit(
-                    redis_client, rate_limit_key, limit_config
-                ):
-                    # Rate limit exceeded
-                    retry_after = self._get_retry_after(
+        result = None
+        if self.mode != "hybrid":
+            redis_client = get_async_redis()
+            if redis_client:
+                try:
+                    result = await self._check_rate_limit(
                         redis_client, rate_limit_key, limit_config
                     )
-                    raise HTTPException(
-                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        detail="Rate limit exceeded. Please try again later.",
-                        headers={"Retry-After": str(retry_after)},
-                    )
-            except HTTPException:
-                raise
-            except Exception as e:
-                logger.warning(f"Rate limit check error: {e}. Allowing request.")
-                # On error, allow request (fail open)
+                    _rate_limit_stats["redis_checks"] += 1
+                except Exception as e:
+                    logger.warning(f"Rate limit check error: {e}. Enforcing locally.")
+            if result is None:
+                _rate_limit_stats["fallbacks"] += 1
 
-        return await call_next(request)
+        if result is None:
+            result = self._check_local(rate_limit_key, limit_config)
 
-    def _check_rate_limit(
-        self, redis_client, key: str, config: RateLimitConfig
-    ) -> bool:
-        """
-        Check if request is within rate limit using sliding window.
-        Returns True if allowed, False if rate limit exceeded.
-        """
-        now = time.time()
-        window_start = now - config.window_seconds
+        if not result.allowed:
+            # Rate limit exceeded
+            return JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Rate limit exceeded. Please try again later."},
+                headers={
+                    **self._limit_headers(result),
+                    "Retry-After": str(max(1, int(result.retry_after + 0.999))),
+                },
+            )
+
+        response = await call_next(request)
+        response.headers.update(self._limit_headers(result))
+        return response
+
+    def _check_local(self, key: str, config: RateLimitConfig) -> RateLimitResult:
+        """Decide a request from this worker's bucket for the key"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = _LocalBucket(config, self.local_share)
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.local_max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
 
-        # Use sorted set to track requests in time window
-        # Score is timestamp, value is request ID (unique per request)
-        pipe = redis_client.pipeline()
+        result = bucket.consume()
+        _rate_limit_stats["local_allowed" if result.allowed else "local_rejected"] += 1
+        return result
 
-        # Remove old entries outside window
-        pipe.zremrangebyscore(key, 0, window_start)
+    def start_sync(self) -> None:
+        if self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync_loop())
 
-        # Count current requests in window
-        pipe.zcard(key)
+    async def stop_sync(self) -> None:
+        """Cancel the sync loop, then charge pending units to Redis once more"""
+        if self._sync_task is None:
+            return
+        self._sync_task.cancel()
+        try:
+            await self._sync_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._sync_task = None
+        try:
+            await self._sync_pending()
+        except Exception as e:
+            logger.warning(f"Rate limit final sync error: {e}")
 
-        # Add current request
-        request_id = f"{now}:{time.time_ns()}"
-        pipe.zadd(key, {request_id: now})
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self._sync_pending()
+            except Exception as e:
+                _rate_limit_stats["sync_errors"] += 1
+                logger.warning(f"Rate limit sync error: {e}. Enforcing locally.")
 
-        # Set expiration
-        pipe.expire(key, config.window_seconds + 1)
+    async def _sync_pending(self) -> None:
+        """Charge locally consumed units to Redis and pull back the global remaining"""
+        redis_client = get_async_redis()
+        if not redis_client:
+            return
+        batch = [(key, bucket) for key, bucket in self._buckets.items() if bucket.pending]
+        if not batch:
+            return
+        if self._script is None or self._script.registered_client is not redis_client:
+            self._script = redis_client.register_script(_GCRA_SCRIPT)
 
-        results = pipe.execute()
-        current_count = results[1]
+        # Units spent while the pipeline is in flight stay pending for the next sync
+        charged = [bucket.pending for _, bucket in batch]
+        for _, bucket in batch:
+            bucket.pending = 0
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for (key, bucket), cost in zip(batch, charged):
+                    config = bucket.config
+                    await self._script(
+                        keys=[key],
+                        args=[config.interval_ms, config.requests, cost, 1],
+                        client=pipe,
+                    )
+                results = await pipe.execute()
+        except BaseException:
+            # Including cancellation at shutdown, so the final sync charges these units
+            for (_, bucket), cost in zip(batch, charged):
+                bucket.pending = min(bucket.pending + cost, bucket.config.requests)
+            raise
 
-        return current_count < config.requests
+        for (_, bucket), (_, remaining, _, _) in zip(batch, results):
+            bucket.reconcile(int(remaining))
+        _rate_limit_stats["syncs"] += 1
 
-    def _get_retry_after(
+    async def _check_rate_limit(
         self, redis_client, key: str, config: RateLimitConfig
-    ) -> int:
-        """Get seconds until rate limit window resets"""
-        now = time.time()
-        window_start = now - config.window_seconds
+    ) -> RateLimitResult:
+        """
+        Check and consume the rate limit in a single atomic round trip.
+        """
+        if self._script is None or self._script.registered_client is not redis_client:
+            self._script = redis_client.register_script(_GCRA_SCRIPT)
 
-        # Get oldest request timestamp
-        oldest = redis_client.zrange(key, 0, 0, withscores=True)
-        if oldest:
-            oldest_time = oldest[0][1]
-            retry_after = int(config.window_seconds - (now - oldest_time)) + 1
-            return max(1, retry_after)
+        allowed, remaining, reset_after_ms, retry_after_ms = await self._script(
+            keys=[key], args=[config.interval_ms, config.requests, config.cost, 0]
+        )
+        return RateLimitResult(
+            allowed=bool(allowed),
+            limit=config.requests,
+            remaining=max(0, int(remaining)),
+            reset_after=reset_after_ms / 1000,
+            retry_after=retry_after_ms / 1000,
+        )
 
-        return config.window_seconds
+    def _limit_headers(self, result: RateLimitResult) -> dict:
+        """X-RateLimit-* headers describing the caller's budget"""
+        return {
+            "X-RateLimit-Limit": str(result.limit),
+            "X-RateLimit-Remaining": str(result.remaining),
+            "X-RateLimit-Reset": str(int(result.reset_after + 0.999)),
+        }
 
 
 def user_rate_limit_key(request: Request) -> str:
@@ -154,13 +477,28 @@ RATE_LIMIT_STRICT = RateLimitConfig(requests=10, window_seconds=60, key_func=use
 RATE_LIMIT_MODERATE = RateLimitConfig(requests=50, window_seconds=60, key_func=user_rate_limit_key)
 RATE_LIMIT_LOOSE = RateLimitConfig(requests=200, window_seconds=60, key_func=user_rate_limit_key)
 
-# Endpoint-specific rate limits
+# Project CRUD shares one budget across the collection and item routes
+RATE_LIMIT_PROJECTS = RateLimitConfig(
+    requests=100, window_seconds=60, key_func=user_rate_limit_key, bucket="projects"
+)
+
+
+def ai_rate_limit(cost: int) -> RateLimitConfig:
+    """
+    Per-user AI budget shared by all agent endpoints, so one bucket protects
+    the Vertex AI quota. Costs are weighted by how much model work a call does.
+    """
+    return RateLimitConfig(
+        requests=100, window_seconds=60, key_func=user_rate_limit_key, cost=cost, bucket="ai"
+    )
+
+
+# Endpoint-specific rate limits, keyed by route template
 DEFAULT_ENDPOINT_LIMITS = {
-    "/api/projects": RateLimitConfig(
-        requests=100, window_seconds=60, key_func=user_rate_limit_key
-    ),
-    # AI endpoints will have stricter limits
-    # "/api/agents/*/chat": RATE_LIMIT_STRICT,
-    # "/api/agents/*/execute": RATE_LIMIT_STRICT,
+    "/api/projects": RATE_LIMIT_PROJECTS,
+    "/api/projects/{project_id}": RATE_LIMIT_PROJECTS,
+    "/api/agents/*/chat": ai_rate_limit(cost=2),
+    "/api/agents/*/execute": ai_rate_limit(cost=10),
+    "/api/agents/*/sessions": ai_rate_limit(cost=1),
+    "/api/agents/*/artifacts": ai_rate_limit(cost=1),
 }
-
@@ -1,5 +1,5 @@
 """Workflow models"""
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
 from datetime import datetime
 
@@ -23,3 +23,8 @@ class WorkflowExecutionResponse(BaseModel):
     workflow_id: str
     data: Optional[Dict[str, Any]] = None
 
+
+class N8nWebhookEvent(BaseModel):
+    """Callback sent by an n8n workflow to /api/webhooks/n8n"""
+    event_type: str = Field(..., min_length=1, max_length=100)
+    data: Dict[str, Any] = Field(default_factory=dict)
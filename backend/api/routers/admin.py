@@ -1,11 +1,24 @@
 """Admin API endpoints"""
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List, Optional, Dict, Any
-from api.middleware.admin import require_admin
+from api.middleware.admin import AdminCacheError, require_admin, invalidate_admin_flag
 from api.middleware.auth import get_current_user
-from api.lib.redis import is_redis_available
+from api.lib.redis import ping_redis, redis_breaker
 from api.lib.n8n import get_n8n_client
+from api.middleware.cache import get_cache_stats
+from api.middleware.rate_limit import get_rate_limit_stats
+from api.lib.firebase_tokens import token_verifier
+from api.services.outbox_service import get_outbox_stats
+from api.services.workflow_service import workflow_index
+from api.services.workflow_status import status_hub
+from api.services.quota_service import quota_service
+from api.services.stats_service import get_totals
+from api.services.usage_service import usage_buffer
+from api.services.webhook_service import webhook_deduplicator, webhook_writer
+from api.lib.firestore import count, get_async_db, snapshot_to_dict
+from api.lib.pagination import InvalidCursorError, fetch_page
 from firebase_admin import firestore
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,29 +30,21 @@ router = APIRouter(prefix="/api/admin", tags=["admin"])
 async def get_admin_stats(admin_user: dict = Depends(require_admin)):
     """Get admin dashboard statistics"""
     try:
-        db = firestore.client()
-
-        # Get user statistics
-        users_ref = db.collection("users")
-        total_users = len(list(users_ref.stream()))
+        # Totals come from a count() aggregation and sharded counters, checked
+        # concurrently with system health
+        totals, redis_status, n8n_status = await asyncio.gather(
+            get_totals(),
+            ping_redis(),
+            get_n8n_client().health_check(),
+        )
+        total_users = totals["users"]
+        total_projects = totals["projects"]
+        total_api_calls = totals["api_calls"]
 
         # Count active users (users with recent activity - last 30 days)
         # This is a simplified version - in production, track last_active timestamp
         active_users = total_users  # Placeholder
 
-        # Get project statistics
-        projects_ref = db.collection("projects")
-        total_projects = len(list(projects_ref.stream()))
-
-        # Get usage statistics
-        usage_ref = db.collection_group("usage")
-        total_api_calls = len(list(usage_ref.limit(1000).stream()))  # Approximate
-
-        # System health
-        redis_status = is_redis_available()
-        n8n_client = get_n8n_client()
-        n8n_status = await n8n_client.health_check() if n8n_client else False
-
         return {
             "users": {
                 "total": total_users,
@@ -64,27 +69,44 @@ async def get_admin_stats(admin_user: dict = Depends(require_admin)):
         )
 
 
+@router.get("/metrics")
+async def get_metrics(admin_user: dict = Depends(require_admin)):
+    """Runtime metrics for the worker process that served this request"""
+    return {
+        "cache": get_cache_stats(),
+        "redis_circuit": redis_breaker.stats(),
+        "rate_limit": get_rate_limit_stats(),
+        "auth": token_verifier.stats(),
+        "n8n": get_n8n_client().stats(),
+        "outbox": get_outbox_stats(),
+        "workflow_index": workflow_index.stats(),
+        "workflow_status": status_hub.stats(),
+        "webhook_ingest": webhook_writer.stats(),
+        "webhook_dedup": webhook_deduplicator.stats(),
+        "usage": usage_buffer.stats(),
+        "quota": quota_service.stats(),
+    }
+
+
 @router.get("/users")
 async def list_users(
-    limit: int = Query(50, le=100),
-    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     admin_user: dict = Depends(require_admin),
 ):
-    """List all users"""
+    """List all users (by user ID)"""
     try:
-        db = firestore.client()
+        db = get_async_db()
         users_ref = db.collection("users")
-        users = []
-
         # Get users with pagination
-        for doc in users_ref.limit(limit).offset(offset).stream():
-            user_data = doc.to_dict()
-            user_data["id"] = doc.id
+        users, next_cursor = await fetch_page(users_ref, limit, cursor)
+        for user_data in users:
             # Don't expose sensitive data
             user_data.pop("password", None)
-            users.append(user_data)
 
-        return {"users": users, "total": len(users)}
+        return {"users": users, "total": len(users), "next_cursor": next_cursor}
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing users: {e}")
         raise HTTPException(
@@ -97,22 +119,20 @@ async def list_users(
 async def get_user(user_id: str, admin_user: dict = Depends(require_admin)):
     """Get user details"""
     try:
-        db = firestore.client()
-        user_doc = db.collection("users").document(user_id).get()
+        db = get_async_db()
+        user_data = snapshot_to_dict(await db.collection("users").document(user_id).get())
 
-        if not user_doc.exists:
+        if user_data is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found",
             )
 
-        user_data = user_doc.to_dict()
-        user_data["id"] = user_doc.id
         user_data.pop("password", None)
 
         # Get user's projects count
         projects_ref = db.collection("projects").where("userId", "==", user_id)
-        user_data["project_count"] = len(list(projects_ref.stream()))
+        user_data["project_count"] = await count(projects_ref)
 
         return user_data
     except HTTPException:
@@ -133,8 +153,8 @@ async def update_user(
 ):
     """Update user (admin override)"""
     try:
-        db = firestore.client()
-        user_doc = db.collection("users").document(user_id).get()
+        db = get_async_db()
+        user_doc = await db.collection("users").document(user_id).get()
 
         if not user_doc.exists:
             raise HTTPException(
@@ -146,16 +166,24 @@ async def update_user(
         updates.pop("password", None)
         updates.pop("email", None)  # Email changes should go through auth
 
-        db.collection("users").document(user_id).update(updates)
+        role_change = "role" in updates or "isAdmin" in updates
+        if role_change:
+            # Refuse the change up front if the cached flag cannot be invalidated
+            await invalidate_admin_flag(user_id)
+        await db.collection("users").document(user_id).update(updates)
+        if role_change:
+            # Discards any flag cached from a read that raced the update
+            await invalidate_admin_flag(user_id)
 
         # Get updated user
-        updated_doc = db.collection("users").document(user_id).get()
-        user_data = updated_doc.to_dict()
-        user_data["id"] = updated_doc.id
-
-        return user_data
+        return snapshot_to_dict(await db.collection("users").document(user_id).get())
     except HTTPException:
         raise
+    except AdminCacheError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Role change not confirmed, retry the request: {e}",
+        )
     except Exception as e:
         logger.error(f"Error updating user: {e}")
         raise HTTPException(
@@ -166,22 +194,21 @@ async def update_user(
 
 @router.get("/projects")
 async def list_all_projects(
-    limit: int = Query(50, le=100),
-    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     admin_user: dict = Depends(require_admin),
 ):
-    """List all projects across all users"""
+    """List all projects across all users, newest first"""
     try:
-        db = firestore.client()
+        db = get_async_db()
         projects_ref = db.collection("projects")
-        projects = []
-
-        for doc in projects_ref.limit(limit).offset(offset).order_by("createdAt", direction=firestore.Query.DESCENDING).stream():
-            project_data = doc.to_dict()
-            project_data["id"] = doc.id
-            projects.append(project_data)
+        projects, next_cursor = await fetch_page(
+            projects_ref, limit, cursor, order_by=[("createdAt", firestore.Query.DESCENDING)]
+        )
 
-        return {"projects": projects, "total": len(projects)}
+        return {"projects": projects, "total": len(projects), "next_cursor": next_cursor}
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing projects: {e}")
         raise HTTPException(
@@ -192,10 +219,11 @@ async def list_all_projects(
 
 @router.get("/workflows")
 async def list_workflows(admin_user: dict = Depends(require_admin)):
-    """List n8n workflows"""
+    """List n8n workflows (and rebuild the event-to-workflow index from them)"""
     try:
         n8n_client = get_n8n_client()
         workflows = await n8n_client.get_workflows()
+        workflow_index.rebuild(workflows)
         return {"workflows": workflows}
     except Exception as e:
         logger.error(f"Error listing workflows: {e}")
@@ -209,11 +237,13 @@ async def list_workflows(admin_user: dict = Depends(require_admin)):
 async def list_agent_sessions(
     project_id: Optional[str] = None,
     stage: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     admin_user: dict = Depends(require_admin),
 ):
-    """List agent sessions"""
+    """List agent sessions, newest first"""
     try:
-        db = firestore.client()
+        db = get_async_db()
 
         if project_id:
             # Get sessions for specific project
@@ -226,17 +256,17 @@ async def list_agent_sessions(
             # Get all sessions (this might be expensive - consider pagination)
             sessions_ref = db.collection_group("agent_sessions")
 
-        sessions = []
         query = sessions_ref
         if stage:
             query = query.where("stage", "==", stage)
 
-        for doc in query.limit(100).stream():
-            session_data = doc.to_dict()
-            session_data["id"] = doc.id
-            sessions.append(session_data)
+        sessions, next_cursor = await fetch_page(
+            query, limit, cursor, order_by=[("created_at", firestore.Query.DESCENDING)]
+        )
 
-        return {"sessions": sessions}
+        return {"sessions": sessions, "next_cursor": next_cursor}
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing agent sessions: {e}")
         raise HTTPException(
@@ -1,8 +1,11 @@
 """Agent API endpoints"""
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from typing import Dict, Any, Optional
 from pydantic import BaseModel
 from api.middleware.auth import get_current_user
+from api.lib.firestore import get_async_db
+from api.lib.pagination import InvalidCursorError, fetch_page
+from api.middleware.quota import QuotaReservation, require_quota
 from api.agents.concept_agent import ConceptAgent
 from api.agents.script_agent import ScriptAgent
 from api.agents.preproduction_agent import PreProductionAgent
@@ -68,6 +71,7 @@ def get_preproduction_agent() -> PreProductionAgent:
 async def chat_with_concept_agent(
     request: ChatRequest,
     current_user: dict = Depends(get_current_user),
+    quota: QuotaReservation = Depends(require_quota("ai_generation", "agent_chat")),
 ):
     """Chat with concept stage agent"""
     try:
@@ -78,6 +82,9 @@ async def chat_with_concept_agent(
             context["project_id"] = request.project_id
 
         result = await agent.chat(request.message, context)
+        if "error" in result:
+            # The agent answered with an error message; nothing was generated
+            await quota.release()
         return ChatResponse(**result)
     except Exception as e:
         logger.error(f"Error in concept agent chat: {e}")
@@ -91,6 +98,7 @@ async def chat_with_concept_agent(
 async def chat_with_script_agent(
     request: ChatRequest,
     current_user: dict = Depends(get_current_user),
+    quota: QuotaReservation = Depends(require_quota("ai_generation", "agent_chat")),
 ):
     """Chat with script stage agent"""
     try:
@@ -101,6 +109,9 @@ async def chat_with_script_agent(
             context["project_id"] = request.project_id
 
         result = await agent.chat(request.message, context)
+        if "error" in result:
+            # The agent answered with an error message; nothing was generated
+            await quota.release()
         return ChatResponse(**result)
     except Exception as e:
         logger.error(f"Error in script agent chat: {e}")
@@ -114,6 +125,7 @@ async def chat_with_script_agent(
 async def chat_with_preproduction_agent(
     request: ChatRequest,
     current_user: dict = Depends(get_current_user),
+    quota: QuotaReservation = Depends(require_quota("ai_generation", "agent_chat")),
 ):
     """Chat with pre-production stage agent"""
     try:
@@ -124,6 +136,9 @@ async def chat_with_preproduction_agent(
             context["project_id"] = request.project_id
 
         result = await agent.chat(request.message, context)
+        if "error" in result:
+            # The agent answered with an error message; nothing was generated
+            await quota.release()
         return ChatResponse(**result)
     except Exception as e:
         logger.error(f"Error in pre-production agent chat: {e}")
@@ -137,6 +152,7 @@ async def chat_with_preproduction_agent(
 async def execute_concept_task(
     request: ExecuteTaskRequest,
     current_user: dict = Depends(get_current_user),
+    quota: QuotaReservation = Depends(require_quota("ai_generation", "agent_task")),
 ):
     """Execute a concept agent task"""
     try:
@@ -150,7 +166,7 @@ async def execute_concept_task(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="project_id and concept are required",
                 )
-            return await agent.suggest_logline(project_id, concept)
+            result = await agent.suggest_logline(project_id, concept, user_id=current_user["uid"])
 
         elif request.task == "brainstorm_themes":
             project_id = request.parameters.get("project_id") if request.parameters else None
@@ -160,10 +176,16 @@ async def execute_concept_task(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="project_id is required",
                 )
-            return await agent.brainstorm_themes(project_id, genre)
+            result = await agent.brainstorm_themes(project_id, genre, user_id=current_user["uid"])
 
         else:
-            return await agent.execute_task(request.task, request.parameters)
+            result = await agent.execute_task(
+                request.task, request.parameters, user_id=current_user["uid"]
+            )
+
+        if "error" in result:
+            await quota.release()
+        return result
 
     except HTTPException:
         raise
@@ -179,18 +201,20 @@ async def execute_concept_task(
 async def list_agent_sessions(
     stage: str,
     project_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     current_user: dict = Depends(get_current_user),
 ):
     """List agent sessions for a stage"""
     from firebase_admin import firestore
 
     try:
-        db = firestore.client()
+        db = get_async_db()
         user_id = current_user["uid"]
 
         if project_id:
             # Verify project belongs to user
-            project_doc = db.collection("projects").document(project_id).get()
+            project_doc = await db.collection("projects").document(project_id).get()
             if not project_doc.exists:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
@@ -210,36 +234,22 @@ async def list_agent_sessions(
                 .collection("agent_sessions")
             )
         else:
-            # Get all sessions for user's projects
-            projects_ref = db.collection("projects").where("userId", "==", user_id)
-            sessions = []
-            for project_doc in projects_ref.stream():
-                project_sessions_ref = (
-                    db.collection("projects")
-                    .document(project_doc.id)
-                    .collection("agent_sessions")
-                )
-                for session_doc in project_sessions_ref.where("stage", "==", stage).stream():
-                    session_data = session_doc.to_dict()
-                    session_data["id"] = session_doc.id
-                    session_data["project_id"] = project_doc.id
-                    sessions.append(session_data)
-            return {"sessions": sessions, "stage": stage}
-
-        # Filter by stage if project_id provided
+            # All of the user's sessions in one query; each session records its project_id
+            sessions_ref = db.collection_group("agent_sessions").where("userId", "==", user_id)
+
         query = sessions_ref
         if stage:
             query = query.where("stage", "==", stage)
 
-        sessions = []
-        for doc in query.order_by("created_at", direction=firestore.Query.DESCENDING).limit(50).stream():
-            session_data = doc.to_dict()
-            session_data["id"] = doc.id
-            sessions.append(session_data)
+        sessions, next_cursor = await fetch_page(
+            query, limit, cursor, order_by=[("created_at", firestore.Query.DESCENDING)]
+        )
 
-        return {"sessions": sessions, "stage": stage}
+        return {"sessions": sessions, "stage": stage, "next_cursor": next_cursor}
     except HTTPException:
         raise
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing sessions: {e}")
         raise HTTPException(
@@ -252,26 +262,29 @@ async def list_agent_sessions(
 async def list_agent_artifacts(
     stage: str,
     project_id: str,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     current_user: dict = Depends(get_current_user),
 ):
     """List agent artifacts for a project"""
-    from firebase_admin import firestore
-
     try:
-        db = firestore.client()
+        db = get_async_db()
         artifacts_ref = (
             db.collection("projects")
             .document(project_id)
             .collection("artifacts")
         )
 
-        artifacts = []
-        for doc in artifacts_ref.stream():
-            artifact_data = doc.to_dict()
-            artifact_data["id"] = doc.id
-            artifacts.append(artifact_data)
+        artifacts, next_cursor = await fetch_page(artifacts_ref, limit, cursor)
 
-        return {"artifacts": artifacts, "stage": stage, "project_id": project_id}
+        return {
+            "artifacts": artifacts,
+            "stage": stage,
+            "project_id": project_id,
+            "next_cursor": next_cursor,
+        }
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing artifacts: {e}")
         raise HTTPException(
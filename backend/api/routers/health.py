@@ -1,6 +1,6 @@
 """Health check router"""
 from fastapi import APIRouter
-from api.lib.redis import is_redis_available
+from api.lib.redis import ping_redis, redis_breaker
 
 router = APIRouter()
 
@@ -8,9 +8,10 @@ router = APIRouter()
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
-    redis_status = is_redis_available()
+    redis_status = await ping_redis()
     return {
-        "status": "healthy",
+        "status": "healthy" if redis_breaker.state == redis_breaker.CLOSED else "degraded",
         "redis": "available" if redis_status else "unavailable",
+        "redis_circuit": redis_breaker.state,
     }
 
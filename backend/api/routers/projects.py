@@ -1,8 +1,9 @@
 """Projects router"""
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Optional
+from api.lib.pagination import NEXT_CURSOR_HEADER, InvalidCursorError
 from api.models.project import ProjectCreate, ProjectUpdate, ProjectResponse
-from api.services.project_service import ProjectService
+from api.services.project_service import ProjectConflictError, ProjectService
 from api.services.workflow_service import WorkflowService
 from api.middleware.auth import get_current_user
 
@@ -18,7 +19,7 @@ async def create_project(
     user_id = current_user["uid"]
     project = await ProjectService.create_project(user_id, project_data)
 
-    # Trigger n8n workflow for project creation (async, don't wait)
+    # Queue the project-created event; the outbox dispatcher delivers it to n8n
     try:
         # Convert datetime objects to ISO strings for JSON serialization
         import json
@@ -62,12 +63,23 @@ async def create_project(
 
 @router.get("", response_model=List[ProjectResponse])
 async def list_projects(
-    limit: int = 50,
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
     current_user: dict = Depends(get_current_user),
 ):
-    """List all projects for the current user"""
+    """
+    List the current user's projects, newest first.
+    When more remain, the X-Next-Cursor header holds the cursor for the next page.
+    """
     user_id = current_user["uid"]
-    projects = await ProjectService.list_projects(user_id, limit=limit)
+    try:
+        projects, next_cursor = await ProjectService.list_projects(user_id, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return projects
 
 
@@ -97,7 +109,13 @@ async def update_project(
 ):
     """Update a project"""
     user_id = current_user["uid"]
-    project = await ProjectService.update_project(project_id, user_id, project_data)
+    try:
+        project = await ProjectService.update_project(project_id, user_id, project_data)
+    except ProjectConflictError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Project was modified concurrently. Please retry.",
+        )
 
     if not project:
         raise HTTPException(
@@ -115,7 +133,13 @@ async def delete_project(
 ):
     """Delete a project"""
     user_id = current_user["uid"]
-    deleted = await ProjectService.delete_project(project_id, user_id)
+    try:
+        deleted = await ProjectService.delete_project(project_id, user_id)
+    except ProjectConflictError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Project was modified concurrently. Please retry.",
+        )
 
     if not deleted:
         raise HTTPException(
@@ -1,88 +1,91 @@
 """Webhook handlers for n8n callbacks"""
-from fastapi import APIRouter, Request, HTTPException, status
-from typing import Dict, Any
+from fastapi import APIRouter, Body, HTTPException, Response, status
+from typing import Dict, Any, Optional
 import logging
-from firebase_admin import firestore
+from api.config import settings
+from api.models.workflow import N8nWebhookEvent
+from api.services.webhook_service import (
+    WebhookQueueFullError,
+    build_record_writes,
+    commit_writes,
+    dedup_key,
+    publish_committed,
+    webhook_deduplicator,
+    webhook_writer,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/webhooks", tags=["webhooks"])
 
 
+async def _ingest(
+    record: Dict[str, Any], response: Response, idempotency_key: Optional[str]
+) -> bool:
+    """
+    Apply a webhook record. In queue mode it is appended to the durable ingest
+    stream and the response becomes 202; returns True when queued.
+    If the record cannot be applied or queued, the idempotency claim is released
+    so n8n's retry is processed; queued records carry the key so the writer can
+    release it if their commit fails.
+    """
+    try:
+        queued = await _apply({**record, "idempotency_key": idempotency_key}, response)
+    except Exception:
+        if idempotency_key:
+            await webhook_deduplicator.release(idempotency_key)
+        raise
+    if idempotency_key:
+        webhook_deduplicator.complete(idempotency_key)
+    return queued
+
+
+async def _apply(record: Dict[str, Any], response: Response) -> bool:
+    writes = build_record_writes(record)
+    if not writes:
+        return False
+
+    if settings.webhook_ingest_mode == "queue":
+        try:
+            queued = await webhook_writer.submit(record)
+        except WebhookQueueFullError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Webhook queue is full. Please retry later.",
+                headers={"Retry-After": "1"},
+            )
+        if queued:
+            response.status_code = status.HTTP_202_ACCEPTED
+            return True
+
+    # Sync mode, or Redis is unavailable so nothing could be queued durably
+    await commit_writes(writes)
+    await publish_committed(writes)
+    return False
+
+
 @router.post("/n8n")
-async def n8n_webhook(request: Request):
+async def n8n_webhook(event: N8nWebhookEvent, response: Response):
     """
     Receive webhooks from n8n workflows.
     This endpoint is called by n8n workflows to notify the backend of events.
     """
     try:
-        body = await request.json()
-        event_type = body.get("event_type")
-        data = body.get("data", {})
-
-        logger.info(f"Received n8n webhook: {event_type}")
-
-        db = firestore.client()
-
-        # Handle different event types
-        if event_type == "workflow_completed":
-            workflow_id = data.get("workflow_id")
-            execution_id = data.get("execution_id")
-            result = data.get("result")
-
-            # Store workflow result in Firestore
-            if workflow_id and execution_id:
-                db.collection("workflow_executions").document(execution_id).set({
-                    "workflow_id": workflow_id,
-                    "execution_id": execution_id,
-                    "status": "completed",
-                    "result": result,
-                    "completed_at": firestore.SERVER_TIMESTAMP,
-                })
-
-        elif event_type == "workflow_failed":
-            workflow_id = data.get("workflow_id")
-            execution_id = data.get("execution_id")
-            error = data.get("error")
-
-            # Store workflow error
-            if workflow_id and execution_id:
-                db.collection("workflow_executions").document(execution_id).set({
-                    "workflow_id": workflow_id,
-                    "execution_id": execution_id,
-                    "status": "failed",
-                    "error": error,
-                    "failed_at": firestore.SERVER_TIMESTAMP,
-                }, merge=True)
-
-        elif event_type == "project_created":
-            # Handle project creation workflow completion
-            project_id = data.get("project_id")
-            user_id = data.get("user_id")
-
-            if project_id and user_id:
-                # Update project with workflow metadata
-                db.collection("projects").document(project_id).update({
-                    "workflow_status": "completed",
-                    "workflow_completed_at": firestore.SERVER_TIMESTAMP,
-                })
-
-        elif event_type == "asset_processed":
-            # Handle asset processing workflow completion
-            project_id = data.get("project_id")
-            asset_id = data.get("asset_id")
-            processed_url = data.get("processed_url")
-
-            if project_id and asset_id:
-                # Update asset with processed URL
-                db.collection("projects").document(project_id).collection("assets").document(asset_id).update({
-                    "processed_url": processed_url,
-                    "processing_status": "completed",
-                    "processed_at": firestore.SERVER_TIMESTAMP,
-                })
-
-        return {"status": "ok", "message": "Webhook received"}
+        logger.info(f"Received n8n webhook: {event.event_type}")
+
+        # Drop n8n retries of an event that was already processed, before any I/O
+        idempotency_key = dedup_key(event.event_type, event.data.get("execution_id"))
+        if idempotency_key and not await webhook_deduplicator.claim(idempotency_key):
+            logger.info(f"Duplicate n8n webhook ignored: {idempotency_key}")
+            return {"status": "duplicate", "message": "Webhook already processed"}
 
+        queued = await _ingest(
+            {"event_type": event.event_type, "data": event.data}, response, idempotency_key
+        )
+        return {"status": "accepted" if queued else "ok", "message": "Webhook received"}
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing n8n webhook: {e}")
         raise HTTPException(
@@ -92,29 +95,34 @@ async def n8n_webhook(request: Request):
 
 
 @router.post("/n8n/{workflow_id}")
-async def n8n_workflow_webhook(workflow_id: str, request: Request):
+async def n8n_workflow_webhook(
+    workflow_id: str,
+    response: Response,
+    body: Dict[str, Any] = Body(...),
+):
     """
     Generic webhook endpoint for specific workflows.
     This allows n8n workflows to call back to the backend.
     """
     try:
-        body = await request.json()
         logger.info(f"Received webhook for workflow {workflow_id}")
 
-        # Store webhook data
-        db = firestore.client()
-        db.collection("webhook_logs").add({
-            "workflow_id": workflow_id,
-            "data": body,
-            "received_at": firestore.SERVER_TIMESTAMP,
-        })
+        idempotency_key = dedup_key(f"workflow:{workflow_id}", body.get("execution_id"))
+        if idempotency_key and not await webhook_deduplicator.claim(idempotency_key):
+            logger.info(f"Duplicate workflow webhook ignored: {idempotency_key}")
+            return {"status": "duplicate", "workflow_id": workflow_id}
 
-        return {"status": "ok", "workflow_id": workflow_id}
+        # Store webhook data
+        queued = await _ingest(
+            {"workflow_id": workflow_id, "body": body}, response, idempotency_key
+        )
+        return {"status": "accepted" if queued else "ok", "workflow_id": workflow_id}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing workflow webhook: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing webhook: {str(e)}",
         )
-
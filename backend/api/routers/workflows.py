@@ -0,0 +1,121 @@
+"""Workflow status streaming router"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+import json
+import logging
+from api.lib.firestore import get_async_db
+from api.middleware.auth import get_current_user
+from api.services.workflow_status import execution_channel, project_channel, status_hub
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/workflows", tags=["workflows"])
+
+KEEPALIVE_SECONDS = 15
+
+
+async def _load_snapshot(
+    project_id: str, user_id: str, execution_id: Optional[str]
+) -> Optional[Dict[str, Any]]:
+    """Current status for the stream, or None if the project is not the user's"""
+    db = get_async_db()
+    project_doc = await db.collection("projects").document(project_id).get()
+    if not project_doc.exists or project_doc.to_dict().get("userId") != user_id:
+        return None
+
+    if execution_id:
+        execution_doc = await db.collection("workflow_executions").document(execution_id).get()
+        execution = execution_doc.to_dict() if execution_doc.exists else {}
+        # Executions recorded for another project are not exposed
+        if execution.get("project_id") not in (None, project_id):
+            execution = {}
+        return {
+            "type": "execution",
+            "project_id": project_id,
+            "execution_id": execution_id,
+            "status": execution.get("status", "pending"),
+            "workflow_id": execution.get("workflow_id"),
+        }
+
+    project = project_doc.to_dict()
+    return {
+        "type": "project",
+        "project_id": project_id,
+        "workflow_status": project.get("workflow_status", "pending"),
+    }
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _same_state(update: Dict[str, Any], snapshot: Dict[str, Any]) -> bool:
+    """Whether an update only repeats what the snapshot already reported"""
+    keys = ("type", "execution_id", "status", "workflow_status")
+    return all(update.get(key) == snapshot.get(key) for key in keys)
+
+
+async def _status_events(
+    request: Request,
+    project_id: str,
+    queue: asyncio.Queue,
+    channels: List[str],
+    snapshot: Dict[str, Any],
+) -> AsyncIterator[str]:
+    try:
+        yield _sse("snapshot", snapshot)
+        while True:
+            try:
+                _, data = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+
+            update = json.loads(data)
+            # Execution channels are shared by id; only forward updates for this project
+            if update.get("project_id") not in (None, project_id):
+                continue
+            # Transitions published while the snapshot was read may already be in it
+            if _same_state(update, snapshot):
+                continue
+            yield _sse("status", update)
+    finally:
+        status_hub.unsubscribe(queue, channels)
+
+
+@router.get("/stream")
+async def stream_workflow_status(
+    request: Request,
+    project_id: str = Query(..., description="Project to stream workflow status for"),
+    execution_id: Optional[str] = Query(None, description="Only stream this execution"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Server-sent events stream of workflow status for a project (or one of its
+    executions). Sends a snapshot first, then each transition reported by n8n.
+    """
+    channels = [execution_channel(execution_id)] if execution_id else [project_channel(project_id)]
+
+    # Subscribe before reading the snapshot so no transition falls between the two
+    queue = status_hub.subscribe(channels)
+    try:
+        snapshot = await _load_snapshot(project_id, current_user["uid"], execution_id)
+    except Exception:
+        status_hub.unsubscribe(queue, channels)
+        raise
+    if snapshot is None:
+        status_hub.unsubscribe(queue, channels)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found",
+        )
+
+    return StreamingResponse(
+        _status_events(request, project_id, queue, channels, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
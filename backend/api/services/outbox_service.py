@@ -0,0 +1,302 @@
+"""Durable outbox for n8n workflow events backed by a Redis Stream"""
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from redis.exceptions import ResponseError
+
+from api.config import settings
+from api.lib.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_STREAM = "outbox:n8n"
+OUTBOX_GROUP = "n8n-dispatchers"
+RETRY_QUEUE = "outbox:n8n:retry"  # ZSET of serialized events scored by next attempt time
+DEAD_LETTER_STREAM = "outbox:n8n:dead"
+IDLE_SLEEP_SECONDS = 1.0  # Wait between polls when Redis is unavailable or the retry queue is empty
+
+# Move due retries back onto the stream atomically so two dispatchers never both requeue one
+# KEYS[1] = retry ZSET, KEYS[2] = stream; ARGV[1] = now (ms), ARGV[2] = batch size, ARGV[3] = maxlen
+_REQUEUE_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, member in ipairs(due) do
+    local event = cjson.decode(member)
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*',
+        'event', event['event'], 'payload', event['payload'], 'attempts', event['attempts'])
+    redis.call('ZREM', KEYS[1], member)
+end
+return #due
+"""
+
+_outbox_stats = {
+    "enqueued": 0,
+    "inline_fallbacks": 0,
+    "delivered": 0,
+    "failed_attempts": 0,
+    "retried": 0,
+    "dead_lettered": 0,
+    "reclaimed": 0,
+}
+
+# Strong references to inline fallback deliveries so they are not garbage collected
+_inline_tasks: Set[asyncio.Task] = set()
+
+
+def get_outbox_stats() -> dict:
+    """Outbox counters for this worker process"""
+    return dict(_outbox_stats)
+
+
+async def _deliver(event: str, payload: Dict[str, Any]):
+    from api.services.workflow_service import WorkflowService
+
+    await WorkflowService.deliver(event, payload)
+
+
+async def _deliver_inline(event: str, payload: Dict[str, Any]):
+    try:
+        await _deliver(event, payload)
+        _outbox_stats["delivered"] += 1
+    except Exception as e:
+        logger.warning(f"Inline delivery of {event} failed (Redis unavailable, not retried): {e}")
+
+
+async def enqueue_event(event: str, payload: Dict[str, Any]) -> bool:
+    """
+    Record a workflow event for at-least-once delivery.
+
+    Returns True when the event was appended to the outbox stream. When Redis is
+    unavailable the event is delivered best-effort in a background task instead
+    and False is returned; either way the caller does not wait on n8n.
+    """
+    body = json.dumps(payload, default=str)
+    redis_client = get_async_redis()
+    if redis_client:
+        try:
+            await redis_client.xadd(
+                OUTBOX_STREAM,
+                {"event": event, "payload": body, "attempts": 0},
+                maxlen=settings.outbox_maxlen,
+                approximate=True,
+            )
+            _outbox_stats["enqueued"] += 1
+            return True
+        except Exception as e:
+            logger.warning(f"Outbox enqueue error for {event}: {e}. Delivering inline.")
+
+    _outbox_stats["inline_fallbacks"] += 1
+    task = asyncio.create_task(_deliver_inline(event, json.loads(body)))
+    _inline_tasks.add(task)
+    task.add_done_callback(_inline_tasks.discard)
+    return False
+
+
+class OutboxDispatcher:
+    """
+    Delivers outbox events to n8n from a Redis Stream consumer group.
+
+    Each worker reads batches with XREADGROUP and delivers them concurrently.
+    Failed events are acked and parked in a ZSET delay queue with exponential
+    backoff, then moved back onto the stream when due. After the maximum number
+    of attempts they go to a dead-letter stream. Entries left pending by a
+    crashed worker are taken over with XAUTOCLAIM once they have been idle for
+    the claim timeout.
+    """
+
+    def __init__(self):
+        self.consumer = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._group_ready = False
+        self._requeue_script = None
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._consume_loop()),
+            asyncio.create_task(self._retry_loop()),
+            asyncio.create_task(self._reclaim_loop()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def _ensure_group(self, redis_client):
+        if self._group_ready:
+            return
+        try:
+            await redis_client.xgroup_create(OUTBOX_STREAM, OUTBOX_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def _consume_loop(self):
+        while True:
+            redis_client = get_async_redis()
+            if not redis_client:
+                await asyncio.sleep(IDLE_SLEEP_SECONDS)
+                continue
+            try:
+                await self._ensure_group(redis_client)
+                response = await redis_client.xreadgroup(
+                    OUTBOX_GROUP,
+                    self.consumer,
+                    {OUTBOX_STREAM: ">"},
+                    count=settings.outbox_batch_size,
+                    block=settings.outbox_block_ms,
+                )
+                for _, messages in response or []:
+                    await self._process(redis_client, messages)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The group disappears if the stream key is deleted; recreate it next round
+                self._group_ready = False
+                logger.warning(f"Outbox consume error: {e}")
+                await asyncio.sleep(IDLE_SLEEP_SECONDS)
+
+    async def _reclaim_loop(self):
+        interval = settings.outbox_claim_idle_ms / 1000
+        while True:
+            await asyncio.sleep(interval)
+            redis_client = get_async_redis()
+            if not redis_client or not self._group_ready:
+                continue
+            try:
+                start_id = "0-0"
+                while True:
+                    next_id, messages, *_ = await redis_client.xautoclaim(
+                        OUTBOX_STREAM,
+                        OUTBOX_GROUP,
+                        self.consumer,
+                        min_idle_time=settings.outbox_claim_idle_ms,
+                        start_id=start_id,
+                        count=settings.outbox_batch_size,
+                    )
+                    # Entries trimmed from the stream come back as None
+                    messages = [m for m in messages if m and m[1]]
+                    if messages:
+                        _outbox_stats["reclaimed"] += len(messages)
+                        await self._process(redis_client, messages)
+                    start_id = next_id.decode() if isinstance(next_id, bytes) else next_id
+                    if start_id == "0-0":
+                        break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Outbox reclaim error: {e}")
+
+    async def _retry_loop(self):
+        while True:
+            moved = 0
+            redis_client = get_async_redis()
+            if redis_client:
+                try:
+                    if self._requeue_script is None or self._requeue_script.registered_client is not redis_client:
+                        self._requeue_script = redis_client.register_script(_REQUEUE_DUE_SCRIPT)
+                    moved = await self._requeue_script(
+                        keys=[RETRY_QUEUE, OUTBOX_STREAM],
+                        args=[int(time.time() * 1000), settings.outbox_batch_size, settings.outbox_maxlen],
+                    )
+                    _outbox_stats["retried"] += moved
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Outbox retry queue error: {e}")
+            if not moved:
+                await asyncio.sleep(IDLE_SLEEP_SECONDS)
+
+    async def _process(self, redis_client, messages: List[Tuple[bytes, Dict[bytes, bytes]]]):
+        """Deliver a batch concurrently, then ack, reschedule or dead-letter each entry"""
+        entries = []
+        for message_id, fields in messages:
+            entries.append(
+                (
+                    message_id,
+                    fields[b"event"].decode(),
+                    fields[b"payload"].decode(),
+                    int(fields.get(b"attempts", b"0")) + 1,
+                )
+            )
+
+        results = await asyncio.gather(
+            *(_deliver(event, json.loads(payload)) for _, event, payload, _ in entries),
+            return_exceptions=True,
+        )
+
+        # Each entry's follow-up and its XACK commit together
+        async with redis_client.pipeline(transaction=True) as pipe:
+            for (message_id, event, payload, attempts), result in zip(entries, results):
+                if not isinstance(result, BaseException):
+                    _outbox_stats["delivered"] += 1
+                elif attempts >= settings.outbox_max_attempts:
+                    _outbox_stats["dead_lettered"] += 1
+                    logger.error(f"Outbox event {event} dead-lettered after {attempts} attempts: {result}")
+                    pipe.xadd(
+                        DEAD_LETTER_STREAM,
+                        {
+                            "event": event,
+                            "payload": payload,
+                            "attempts": attempts,
+                            "error": str(result)[:500],
+                        },
+                        maxlen=settings.outbox_maxlen,
+                        approximate=True,
+                    )
+                else:
+                    _outbox_stats["failed_attempts"] += 1
+                    logger.warning(f"Outbox event {event} failed (attempt {attempts}): {result}")
+                    pipe.zadd(
+                        RETRY_QUEUE,
+                        {
+                            json.dumps(
+                                {
+                                    "id": message_id.decode(),
+                                    "event": event,
+                                    "payload": payload,
+                                    "attempts": attempts,
+                                }
+                            ): int((time.time() + self._backoff(attempts)) * 1000)
+                        },
+                    )
+                pipe.xack(OUTBOX_STREAM, OUTBOX_GROUP, message_id)
+                pipe.xdel(OUTBOX_STREAM, message_id)
+            await pipe.execute()
+
+    @staticmethod
+    def _backoff(attempts: int) -> float:
+        """Exponential backoff with full jitter on the upper half"""
+        delay = min(settings.outbox_backoff_max, settings.outbox_backoff_base * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+# Singleton dispatcher, started from the app lifespan
+outbox_dispatcher: Optional[OutboxDispatcher] = None
+
+
+def start_outbox_dispatcher():
+    """Start delivering outbox events from this worker"""
+    global outbox_dispatcher
+    if outbox_dispatcher is None:
+        outbox_dispatcher = OutboxDispatcher()
+    outbox_dispatcher.start()
+
+
+async def stop_outbox_dispatcher():
+    """Stop the dispatcher; undelivered entries stay pending for another worker"""
+    if outbox_dispatcher is not None:
+        await outbox_dispatcher.stop()
@@ -1,21 +1,28 @@
 """Project service layer"""
 from firebase_admin import firestore
-from typing import List, Optional
-from datetime import datetime
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from typing import List, Optional, Tuple
+from datetime import datetime, timezone
+from api.lib.firestore import get_async_db
+from api.lib.pagination import fetch_page
 from api.models.project import ProjectCreate, ProjectUpdate, ProjectResponse
-from api.middleware.cache import invalidate_project_cache, invalidate_user_cache
+from api.middleware.cache import invalidate_cache_tags, project_tag, user_tag
+from api.services.stats_service import project_counter
 
 
-def get_db():
-    """Get Firestore client (lazy initialization)"""
-    import os
-    # Configure Firestore emulator if environment variable is set
-    emulator_host = os.getenv("FIRESTORE_EMULATOR_HOST")
-    if emulator_host:
-        # Firestore emulator is automatically used when FIRESTORE_EMULATOR_HOST is set
-        # Format: host:port (e.g., firebase-emulators:8080)
-        pass
-    return firestore.client()
+MAX_WRITE_ATTEMPTS = 3  # Read-then-write attempts when the project changes between the two
+
+
+class ProjectConflictError(Exception):
+    """The project kept changing while an update or delete was being applied"""
+
+
+async def _owned_snapshot(doc_ref, user_id: str):
+    """The project's snapshot, or None if it does not exist or is not the user's"""
+    project_doc = await doc_ref.get()
+    if not project_doc.exists or project_doc.to_dict().get("userId") != user_id:
+        return None
+    return project_doc
 
 
 class ProjectService:
@@ -23,33 +30,32 @@ class ProjectService:
 
     @staticmethod
     async def create_project(user_id: str, project_data: ProjectCreate) -> ProjectResponse:
-        """Create a new project"""
-        db = get_db()
+        """Create a new project (one commit; the response is built from the written fields)"""
+        db = get_async_db()
         project_dict = project_data.model_dump()
         project_dict["userId"] = user_id
-        project_dict["createdAt"] = datetime.utcnow()
-        project_dict["updatedAt"] = datetime.utcnow()
-
-        # Add to Firestore
-        doc_ref = db.collection("projects").add(project_dict)
-        project_id = doc_ref[1].id
-
-        # Retrieve created project
-        project_doc = db.collection("projects").document(project_id).get()
-        project_dict = project_doc.to_dict()
-        project_dict["id"] = project_id
+        project_dict["createdAt"] = datetime.now(timezone.utc)
+        project_dict["updatedAt"] = project_dict["createdAt"]
+
+        # The ID is generated client-side, so create() needs no read back;
+        # the dashboard counter commits in the same batch
+        doc_ref = db.collection("projects").document()
+        batch = db.batch()
+        batch.create(doc_ref, project_dict)
+        project_counter.stage_increment(db, batch)
+        await batch.commit()
+        project_id = doc_ref.id
 
         # Invalidate cache
-        invalidate_user_cache(user_id)
-        invalidate_project_cache(project_id)
+        await invalidate_cache_tags(user_tag(user_id), project_tag(project_id))
 
-        return ProjectResponse(**project_dict)
+        return ProjectResponse(**project_dict, id=project_id)
 
     @staticmethod
     async def get_project(project_id: str, user_id: str) -> Optional[ProjectResponse]:
         """Get a project by ID"""
-        db = get_db()
-        project_doc = db.collection("projects").document(project_id).get()
+        db = get_async_db()
+        project_doc = await db.collection("projects").document(project_id).get()
 
         if not project_doc.exists:
             return None
@@ -62,70 +68,78 @@ class ProjectService:
         return ProjectResponse(**project_dict)
 
     @staticmethod
-    async def list_projects(user_id: str, limit: int = 50) -> List[ProjectResponse]:
-        """List all projects for a user"""
-        db = get_db()
-        projects_ref = db.collection("projects")
-        query = projects_ref.where("userId", "==", user_id).limit(limit).order_by("createdAt", direction=firestore.Query.DESCENDING)
-
-        projects = []
-        for doc in query.stream():
-            project_dict = doc.to_dict()
-            project_dict["id"] = doc.id
-            projects.append(ProjectResponse(**project_dict))
-
-        return projects
+    async def list_projects(
+        user_id: str, limit: int = 50, cursor: Optional[str] = None
+    ) -> Tuple[List[ProjectResponse], Optional[str]]:
+        """List a user's projects, newest first; returns the page and the next cursor"""
+        db = get_async_db()
+        query = db.collection("projects").where("userId", "==", user_id)
+        projects, next_cursor = await fetch_page(
+            query, limit, cursor, order_by=[("createdAt", firestore.Query.DESCENDING)]
+        )
+        return [ProjectResponse(**project_dict) for project_dict in projects], next_cursor
 
     @staticmethod
     async def update_project(
         project_id: str, user_id: str, project_data: ProjectUpdate
     ) -> Optional[ProjectResponse]:
-        """Update a project"""
-        db = get_db()
-        project_doc = db.collection("projects").document(project_id).get()
-
-        if not project_doc.exists:
-            return None
-
-        project_dict = project_doc.to_dict()
-        if project_dict.get("userId") != user_id:
-            return None
-
-        # Update fields
+        """
+        Update a project.
+
+        Ownership is checked with one read, and the write is conditioned on that
+        read's update time, so the project cannot change hands or be deleted in
+        between. A failed precondition means a concurrent write; the read is
+        retried. The response merges the update into the read, with no read back.
+        """
+        db = get_async_db()
+        doc_ref = db.collection("projects").document(project_id)
         update_data = project_data.model_dump(exclude_unset=True)
-        update_data["updatedAt"] = datetime.utcnow()
+        update_data["updatedAt"] = datetime.now(timezone.utc)
 
-        db.collection("projects").document(project_id).update(update_data)
+        for _ in range(MAX_WRITE_ATTEMPTS):
+            project_doc = await _owned_snapshot(doc_ref, user_id)
+            if project_doc is None:
+                return None
+            try:
+                await doc_ref.update(
+                    update_data,
+                    option=db.write_option(last_update_time=project_doc.update_time),
+                )
+            except FailedPrecondition:
+                continue
+            except NotFound:
+                return None
 
-        # Retrieve updated project
-        updated_doc = db.collection("projects").document(project_id).get()
-        updated_dict = updated_doc.to_dict()
-        updated_dict["id"] = project_id
+            # Invalidate cache
+            await invalidate_cache_tags(user_tag(user_id), project_tag(project_id))
 
-        # Invalidate cache
-        invalidate_user_cache(user_id)
-        invalidate_project_cache(project_id)
+            return ProjectResponse(**{**project_doc.to_dict(), **update_data, "id": project_id})
 
-        return ProjectResponse(**updated_dict)
+        raise ProjectConflictError(project_id)
 
     @staticmethod
     async def delete_project(project_id: str, user_id: str) -> bool:
-        """Delete a project"""
-        db = get_db()
-        project_doc = db.collection("projects").document(project_id).get()
-
-        if not project_doc.exists:
-            return False
-
-        project_dict = project_doc.to_dict()
-        if project_dict.get("userId") != user_id:
-            return False
-
-        db.collection("projects").document(project_id).delete()
-
-        # Invalidate cache
-        invalidate_user_cache(user_id)
-        invalidate_project_cache(project_id)
-
-        return True
-
+        """Delete a project (ownership read, then a delete conditioned on it)"""
+        db = get_async_db()
+        doc_ref = db.collection("projects").document(project_id)
+
+        for _ in range(MAX_WRITE_ATTEMPTS):
+            project_doc = await _owned_snapshot(doc_ref, user_id)
+            if project_doc is None:
+                return False
+            batch = db.batch()
+            batch.delete(doc_ref, option=db.write_option(last_update_time=project_doc.update_time))
+            project_counter.stage_increment(db, batch, -1)
+            try:
+                await batch.commit()
+            except FailedPrecondition:
+                continue
+            except NotFound:
+                return False
+
+            # Invalidate cache
+            await invalidate_cache_tags(user_tag(user_id), project_tag(project_id))
+
+            return True
+
+        raise ProjectConflictError(project_id)
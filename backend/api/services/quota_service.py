@@ -0,0 +1,318 @@
+"""Monthly quota enforcement with Redis counters reconciled against Firestore"""
+import asyncio
+import logging
+from typing import Any, Dict, NamedTuple, Optional, Set, Tuple
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+
+from api.config import settings
+from api.lib.firestore import get_async_db
+from api.lib.redis import get_async_redis
+from api.services.usage_service import DEFAULT_QUOTA_LIMITS, current_period, quota_period, quota_ref
+
+logger = logging.getLogger(__name__)
+
+QUOTA_KEY_PREFIX = "quota:"
+QUOTA_KEY_TTL = 40 * 24 * 3600  # Outlives the month it counts
+LIMIT_PREFIX = "limit:"
+UNLIMITED = -1
+MAX_ROLLOVER_ATTEMPTS = 3  # Read-then-reset attempts when usage lands in between
+
+# Check-and-increment: refuses when usage + amount would pass the limit.
+# Returns {status, used, limit}; status -1 means the period has not been seeded.
+_RESERVE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {-1, 0, 0}
+end
+local used = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+local limit = tonumber(redis.call('HGET', KEYS[1], 'limit:' .. ARGV[1]) or '-1')
+local amount = tonumber(ARGV[2])
+if limit >= 0 and used + amount > limit then
+    return {0, used, limit}
+end
+return {1, redis.call('HINCRBY', KEYS[1], ARGV[1], amount), limit}
+"""
+
+# Returns reserved units (a missing key is not recreated without its limits)
+_RELEASE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+return redis.call('HINCRBY', KEYS[1], ARGV[1], -tonumber(ARGV[2]))
+"""
+
+# Seeds a period's counters and limits unless another request already has
+_SEED_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# Applies Firestore's limits, and its usage where Firestore has counted more
+# (usage recorded by other paths); ARGV is (field, usage, limit) triples
+_RECONCILE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for i = 1, #ARGV, 3 do
+    redis.call('HSET', KEYS[1], 'limit:' .. ARGV[i], ARGV[i + 2])
+    local used = tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0')
+    if tonumber(ARGV[i + 1]) > used then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+return 1
+"""
+
+
+def quota_key(user_id: str, period: str) -> str:
+    return f"{QUOTA_KEY_PREFIX}{user_id}:{period}"
+
+
+class QuotaResult(NamedTuple):
+    """Outcome of a quota check"""
+
+    allowed: bool
+    used: int
+    limit: int  # UNLIMITED when the field has no limit
+    reserved: bool  # True when units are held in Redis and must be released on failure
+
+    @property
+    def remaining(self) -> Optional[int]:
+        return None if self.limit == UNLIMITED else max(0, self.limit - self.used)
+
+
+class QuotaUnavailableError(Exception):
+    """Neither Redis nor Firestore could check a quota (and quota_fail_open is off)"""
+
+
+def _period_usage(quota: Dict[str, Any], period: str) -> Dict[str, int]:
+    """Usage counted for `period`"""
+    if quota_period(quota) != period:
+        return {}
+    return quota.get("usage") or {}
+
+
+def _limits(quota: Dict[str, Any]) -> Dict[str, int]:
+    return {**DEFAULT_QUOTA_LIMITS, **(quota.get("limits") or {})}
+
+
+class QuotaService:
+    """
+    Pre-flight monthly quota checks.
+
+    Each user's usage and limits for the month live in the Redis hash
+    quota:{uid}:{YYYYMM}, and a check increments the usage atomically only if it
+    stays within the limit. The hash is seeded from users/{uid}/quotas/current on
+    first use in a period; the first seed of a new month also rolls the Firestore
+    document over (usage reset, periodKey set). Failed calls release their units.
+    Firestore usage is written by the usage buffer; a background task pushes
+    Firestore's limits and any higher usage into Redis for users active in this
+    worker. Without Redis, checks read the Firestore document instead (not atomic
+    across concurrent requests); when that fails too, checks raise
+    QuotaUnavailableError unless settings.quota_fail_open lets the call through.
+    """
+
+    def __init__(self, reconcile_interval: float):
+        self.reconcile_interval = reconcile_interval
+        self._active: Set[Tuple[str, str]] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._scripts: Dict[str, Any] = {}
+        self._stats = {
+            "allowed": 0,
+            "rejected": 0,
+            "released": 0,
+            "seeds": 0,
+            "rollovers": 0,
+            "fallback_checks": 0,
+            "unavailable": 0,
+            "reconciled": 0,
+        }
+
+    def _script(self, redis_client, source: str):
+        script = self._scripts.get(source)
+        if script is None or script.registered_client is not redis_client:
+            script = self._scripts[source] = redis_client.register_script(source)
+        return script
+
+    async def reserve(self, user_id: str, field: str, amount: int = 1) -> QuotaResult:
+        """Hold `amount` units of a quota field for this month, if within the limit"""
+        period = current_period()
+        redis_client = get_async_redis()
+        result = None
+        if redis_client:
+            try:
+                result = await self._reserve_redis(redis_client, user_id, field, amount, period)
+            except Exception as e:
+                logger.warning(f"Quota check error: {e}. Checking Firestore instead.")
+        if result is None:
+            result = await self._check_firestore(user_id, field, amount, period)
+
+        self._stats["allowed" if result.allowed else "rejected"] += 1
+        return result
+
+    async def release(self, user_id: str, field: str, amount: int = 1):
+        """Return units held by reserve() for a call that did not complete"""
+        redis_client = get_async_redis()
+        if not redis_client:
+            return
+        try:
+            release = self._script(redis_client, _RELEASE_SCRIPT)
+            await release(keys=[quota_key(user_id, current_period())], args=[field, amount])
+            self._stats["released"] += 1
+        except Exception as e:
+            logger.warning(f"Quota release error for {user_id}: {e}")
+
+    async def _reserve_redis(
+        self, redis_client, user_id: str, field: str, amount: int, period: str
+    ) -> QuotaResult:
+        key = quota_key(user_id, period)
+        reserve = self._script(redis_client, _RESERVE_SCRIPT)
+        status, used, limit = await reserve(keys=[key], args=[field, amount])
+        if status == -1:
+            await self._seed(redis_client, user_id, period)
+            status, used, limit = await reserve(keys=[key], args=[field, amount])
+            if status == -1:
+                raise RuntimeError(f"Quota counters for {user_id} were not seeded")
+
+        self._active.add((user_id, period))
+        return QuotaResult(status == 1, int(used), int(limit), status == 1)
+
+    async def _seed(self, redis_client, user_id: str, period: str):
+        """Load the period's usage and limits from Firestore into Redis"""
+        quota = await self._load_quota(user_id, period)
+        usage = _period_usage(quota, period)
+        values = []
+        for field, limit in _limits(quota).items():
+            values += [field, int(usage.get(field, 0)), f"{LIMIT_PREFIX}{field}", int(limit)]
+
+        seed = self._script(redis_client, _SEED_SCRIPT)
+        if await seed(keys=[quota_key(user_id, period)], args=[QUOTA_KEY_TTL, *values]):
+            self._stats["seeds"] += 1
+
+    async def _load_quota(self, user_id: str, period: str) -> Dict[str, Any]:
+        """The user's quota document, rolled over to `period` if it belongs to an earlier one"""
+        db = get_async_db()
+        ref = quota_ref(db, user_id)
+        for _ in range(MAX_ROLLOVER_ATTEMPTS):
+            snapshot = await ref.get()
+            if not snapshot.exists:
+                quota = {"period": "monthly", "periodKey": period}
+                try:
+                    await ref.create(quota)
+                except AlreadyExists:
+                    # Created by the usage buffer or another worker in between
+                    continue
+                return quota
+
+            quota = snapshot.to_dict()
+            # Documents from before rollover have no periodKey; quota_period dates
+            # them by their last write, and undated ones are rolled over
+            quota_period_key = quota_period(quota)
+            option = db.write_option(last_update_time=snapshot.update_time)
+            if quota_period_key is not None and quota_period_key >= period:
+                if "periodKey" in quota:
+                    return quota
+                update = {"period": "monthly", "periodKey": quota_period_key}
+                result = {**quota, **update}
+            else:
+                previous = {"usage": quota.get("usage") or {}}
+                if quota_period_key is not None:
+                    previous["periodKey"] = quota_period_key
+                update = {
+                    "period": "monthly",
+                    "periodKey": period,
+                    "startDate": firestore.SERVER_TIMESTAMP,
+                    "usage": {},
+                    "previousPeriod": previous,
+                }
+                result = {**quota, "periodKey": period, "usage": {}}
+            try:
+                # Conditioned on the read, so only one worker stamps or resets the document
+                await ref.update(update, option=option)
+            except FailedPrecondition:
+                # Rolled over or counted by someone else in between; read again
+                continue
+            if "previousPeriod" in update:
+                self._stats["rollovers"] += 1
+            return result
+
+        raise RuntimeError(f"Quota document for {user_id} kept changing during rollover")
+
+    async def _check_firestore(
+        self, user_id: str, field: str, amount: int, period: str
+    ) -> QuotaResult:
+        self._stats["fallback_checks"] += 1
+        try:
+            quota = await self._load_quota(user_id, period)
+        except Exception as e:
+            self._stats["unavailable"] += 1
+            if settings.quota_fail_open:
+                logger.error(f"Quota fallback error for {user_id}: {e}. Allowing the call.")
+                return QuotaResult(True, 0, UNLIMITED, False)
+            logger.error(f"Quota fallback error for {user_id}: {e}")
+            raise QuotaUnavailableError(f"Quota for {user_id} could not be checked") from e
+
+        used = int(_period_usage(quota, period).get(field, 0))
+        limit = int(_limits(quota).get(field, UNLIMITED))
+        allowed = limit == UNLIMITED or used + amount <= limit
+        return QuotaResult(allowed, used + amount if allowed else used, limit, False)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._reconcile_loop())
+
+    async def stop(self):
+        """Cancel the reconcile loop (called from the application lifespan)"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._task = None
+
+    async def _reconcile_loop(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.warning(f"Quota reconcile error: {e}")
+
+    async def reconcile(self):
+        """Push Firestore limits and usage into Redis for users active in this worker"""
+        redis_client = get_async_redis()
+        period = current_period()
+        active = [user_id for user_id, active_period in self._active if active_period == period]
+        self._active = {(user_id, period) for user_id in active}
+        if not redis_client or not active:
+            return
+
+        db = get_async_db()
+        script = self._script(redis_client, _RECONCILE_SCRIPT)
+        refs = [quota_ref(db, user_id) for user_id in active]
+        async for snapshot in db.get_all(refs):
+            if not snapshot.exists:
+                continue
+            quota = snapshot.to_dict()
+            if quota_period(quota) != period:
+                continue
+            user_id = snapshot.reference.parent.parent.id
+            usage = _period_usage(quota, period)
+            args = []
+            for field, limit in _limits(quota).items():
+                args += [field, int(usage.get(field, 0)), int(limit)]
+            await script(keys=[quota_key(user_id, period)], args=args)
+            self._stats["reconciled"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "active_users": len(self._active)}
+
+
+quota_service = QuotaService(reconcile_interval=settings.quota_reconcile_interval)
@@ -0,0 +1,27 @@
+"""Admin dashboard totals"""
+import asyncio
+from typing import Dict
+
+from api.config import settings
+from api.lib.counters import ShardedCounter
+from api.lib.firestore import count, get_async_db
+
+# Maintained by ProjectService and usage tracking in the same batch as the writes they count
+project_counter = ShardedCounter("projects", settings.stats_counter_shards)
+api_call_counter = ShardedCounter("api_calls", settings.stats_counter_shards)
+
+
+async def get_totals() -> Dict[str, int]:
+    """
+    User, project and API call totals, read concurrently.
+
+    Users are created outside this service, so they are counted with a count()
+    aggregation; projects and API calls come from their sharded counters.
+    """
+    db = get_async_db()
+    users, projects, api_calls = await asyncio.gather(
+        count(db.collection("users")),
+        project_counter.total(lambda: count(db.collection("projects"))),
+        api_call_counter.total(lambda: count(db.collection_group("usage"))),
+    )
+    return {"users": users, "projects": projects, "api_calls": api_calls}
@@ -0,0 +1,298 @@
+"""Usage accounting: buffered usage records and monthly quota counters"""
+import asyncio
+import logging
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+from google.cloud.firestore_v1 import Increment
+
+from api.config import settings
+from api.lib.firestore import get_async_db
+from api.services.stats_service import api_call_counter
+
+logger = logging.getLogger(__name__)
+
+# Events per commit: one usage record each, plus one quota write per user and the
+# API call counter, stays under Firestore's 500 writes per batch
+FLUSH_CHUNK_SIZE = 200
+MAX_COMMIT_ATTEMPTS = 3  # Re-reads when a quota document changes between read and commit
+
+# Quota usage field counted for each tracked action
+QUOTA_FIELDS = {
+    "ai_generation": "aiGenerations",
+    "drive_import": "driveImports",
+}
+
+# Limits applied when a user's quota document does not set its own (Basic plan)
+DEFAULT_QUOTA_LIMITS = {
+    "aiGenerations": 10,
+    "storageBytes": 5 * 1024 * 1024 * 1024,  # 5GB
+    "driveImports": 10,
+}
+
+
+def quota_ref(db, user_id: str):
+    """users/{userId}/quotas/current"""
+    return db.collection("users").document(user_id).collection("quotas").document("current")
+
+
+def current_period(now: Optional[datetime] = None) -> str:
+    """Quota period key, e.g. "202610" (UTC calendar month)"""
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is not None:
+        now = now.astimezone(timezone.utc)
+    return now.strftime("%Y%m")
+
+
+def quota_period(quota: Dict[str, Any]) -> Optional[str]:
+    """
+    Period a quota document's usage belongs to. Documents from before rollover
+    have no periodKey; their usage belongs to the month they were last written.
+    """
+    if quota.get("periodKey"):
+        return quota["periodKey"]
+    written = quota.get("updatedAt") or quota.get("startDate")
+    return current_period(written) if isinstance(written, datetime) else None
+
+
+class UsageEvent(NamedTuple):
+    """One tracked call"""
+
+    user_id: str
+    action: str
+    resource_type: Optional[str]
+    duration_ms: int
+    endpoint: str
+    timestamp: datetime
+    event_id: str = ""  # Assigned by UsageBuffer.record(); the usage document ID
+
+
+class UsageBuffer:
+    """
+    Buffers usage events in memory and writes them in the background.
+
+    Requests only append to a bounded buffer; when it is full new events are
+    dropped (and counted) rather than slowing the request. Every flush interval,
+    or as soon as a chunk's worth is waiting, the buffer is drained into batch
+    commits holding the usage records, the users' quota counts and the API call
+    counter. A failed chunk is retried as-is. Usage records are created under
+    the event's ID, so a retry of a chunk whose commit did land (e.g. after a
+    deadline) fails on them and is recognised as applied instead of counted
+    twice. Quota counts are written only to the quota document of the event's
+    month, conditioned on the document not having changed since it was read.
+    """
+
+    def __init__(self, max_events: int, flush_interval_ms: int):
+        self.max_events = max_events
+        self.flush_interval = flush_interval_ms / 1000
+        self._events: Deque[UsageEvent] = deque()
+        self._retry: Optional[List[UsageEvent]] = None  # Chunk whose commit failed
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._stats = {
+            "recorded": 0,
+            "dropped": 0,
+            "written": 0,
+            "commits": 0,
+            "commit_failures": 0,
+            "replayed": 0,
+            "uncounted": 0,
+        }
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything buffered, then stop (called from the application lifespan)"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    def record(self, event: UsageEvent) -> bool:
+        """Buffer an event; False when the buffer is full"""
+        if len(self._events) + len(self._retry or ()) >= self.max_events:
+            self._stats["dropped"] += 1
+            return False
+        if not event.event_id:
+            event = event._replace(event_id=uuid.uuid4().hex)
+        self._events.append(event)
+        self._stats["recorded"] += 1
+        if self._wakeup is not None and len(self._events) >= FLUSH_CHUNK_SIZE:
+            self._wakeup.set()
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            closing = self._closing
+            await self.flush()
+            if closing:
+                return
+
+    async def flush(self):
+        """Write out everything currently buffered"""
+        while self._retry or self._events:
+            if self._retry:
+                chunk, self._retry = self._retry, None
+            else:
+                chunk = [self._events.popleft() for _ in range(min(FLUSH_CHUNK_SIZE, len(self._events)))]
+            try:
+                await self._commit(chunk)
+            except Exception as e:
+                self._stats["commit_failures"] += 1
+                if self._closing:
+                    lost = len(chunk) + len(self._events)
+                    self._events.clear()
+                    self._stats["dropped"] += lost
+                    logger.error(f"Usage flush failed during shutdown ({e}); dropped {lost} events")
+                else:
+                    # Retried unchanged on the next interval, so the replay check holds
+                    logger.warning(f"Usage flush of {len(chunk)} events failed: {e}")
+                    self._retry = chunk
+                return
+            self._stats["written"] += len(chunk)
+            self._stats["commits"] += 1
+
+    async def _commit(self, events: List[UsageEvent]):
+        db = get_async_db()
+        for attempt in range(MAX_COMMIT_ATTEMPTS):
+            batch, uncounted = await self._stage(db, events)
+            try:
+                await batch.commit()
+                self._stats["uncounted"] += uncounted
+                return
+            except AlreadyExists:
+                # Either this chunk already landed, or a quota document was created meanwhile
+                first = events[0]
+                if (await _usage_collection(db, first.user_id).document(first.event_id).get()).exists:
+                    self._stats["replayed"] += 1
+                    return
+            except FailedPrecondition:
+                # A quota document changed (counted or rolled over) since it was read
+                pass
+        raise RuntimeError(f"Quota documents kept changing over {MAX_COMMIT_ATTEMPTS} attempts")
+
+    async def _stage(self, db, events: List[UsageEvent]):
+        """
+        Batch of usage records, quota counts and the API call counter for a chunk,
+        and the number of events left out of the quota counts
+        """
+        batch = db.batch()
+        counts: Dict[str, Dict[str, Dict[str, int]]] = defaultdict(
+            lambda: defaultdict(lambda: defaultdict(int))
+        )
+        for event in events:
+            batch.create(
+                _usage_collection(db, event.user_id).document(event.event_id),
+                {
+                    "userId": event.user_id,
+                    "timestamp": event.timestamp,
+                    "action": event.action,
+                    "resourceType": event.resource_type,
+                    "duration": event.duration_ms,
+                    "metadata": {
+                        "endpoint": event.endpoint,
+                    },
+                },
+            )
+            field = QUOTA_FIELDS.get(event.action)
+            if field:
+                counts[event.user_id][current_period(event.timestamp)][field] += 1
+
+        uncounted = 0
+        if counts:
+            refs = {quota_ref(db, user_id).path: user_id for user_id in counts}
+            async for snapshot in db.get_all([quota_ref(db, user_id) for user_id in counts]):
+                user_id = refs[snapshot.reference.path]
+                uncounted += _stage_quota(db, batch, snapshot, counts[user_id])
+        api_call_counter.stage_increment(db, batch, len(events))
+        return batch, uncounted
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "buffered": len(self._events) + len(self._retry or ())}
+
+
+def _usage_collection(db, user_id: str):
+    return db.collection("users").document(user_id).collection("usage")
+
+
+def _stage_quota(db, batch, snapshot, counts: Dict[str, Dict[str, int]]) -> int:
+    """
+    Count a user's events (period -> field -> amount) in their quota document.
+    Events of the document's month are incremented; events of a later month
+    roll the document over first; events of an earlier month are left out
+    (their usage records are still written). Returns how many were left out.
+    """
+    period = max(counts)
+    counted = set()
+    if not snapshot.exists:
+        batch.create(
+            snapshot.reference,
+            {
+                "period": "monthly",
+                "periodKey": period,
+                "startDate": firestore.SERVER_TIMESTAMP,
+                "usage": dict(counts[period]),
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+            },
+        )
+    else:
+        quota = snapshot.to_dict()
+        current = quota_period(quota)
+        option = db.write_option(last_update_time=snapshot.update_time)
+        if current is not None and current >= period:
+            period = current
+            if counts.get(period):
+                updates = {
+                    f"usage.{field}": Increment(amount) for field, amount in counts[period].items()
+                }
+                batch.update(
+                    snapshot.reference,
+                    {**updates, "periodKey": period, "updatedAt": firestore.SERVER_TIMESTAMP},
+                    option=option,
+                )
+        else:
+            # Same reset as QuotaService's rollover, with this chunk's counts for each month
+            counted.add(current)
+            previous_usage = dict(quota.get("usage") or {})
+            for field, amount in counts.get(current, {}).items():
+                previous_usage[field] = previous_usage.get(field, 0) + amount
+            batch.update(
+                snapshot.reference,
+                {
+                    "period": "monthly",
+                    "periodKey": period,
+                    "startDate": firestore.SERVER_TIMESTAMP,
+                    "usage": dict(counts[period]),
+                    "previousPeriod": {"periodKey": current, "usage": previous_usage},
+                    "updatedAt": firestore.SERVER_TIMESTAMP,
+                },
+                option=option,
+            )
+
+    counted.add(period)
+    return sum(
+        sum(fields.values()) for event_period, fields in counts.items() if event_period not in counted
+    )
+
+
+usage_buffer = UsageBuffer(
+    max_events=settings.usage_buffer_size,
+    flush_interval_ms=settings.usage_flush_interval_ms,
+)
@@ -0,0 +1,444 @@
+"""n8n webhook processing: event-to-write mapping and the batched ingest writer"""
+import asyncio
+import json
+import logging
+import os
+import socket
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from firebase_admin import firestore
+from redis.exceptions import ResponseError
+
+from api.config import settings
+from api.lib.dedup import Deduplicator
+from api.lib.firestore import get_async_db
+from api.lib.redis import get_async_redis
+from api.services.workflow_status import publish_status
+
+logger = logging.getLogger(__name__)
+
+FIRESTORE_BATCH_LIMIT = 500  # Maximum writes in one Firestore batch commit
+INGEST_STREAM = "webhooks:ingest"
+INGEST_GROUP = "webhook-writers"
+IDLE_SLEEP_SECONDS = 1.0  # Wait between polls when Redis is unavailable
+
+# Appends a webhook unless the stream already holds ARGV[1] entries (returns nil then).
+# Entries are deleted once written, so the length counts webhooks not yet applied.
+_ENQUEUE_SCRIPT = """
+if redis.call('XLEN', KEYS[1]) >= tonumber(ARGV[1]) then
+    return false
+end
+return redis.call('XADD', KEYS[1], '*', 'record', ARGV[2])
+"""
+
+
+class StatusUpdate(NamedTuple):
+    """Status published to streaming clients once the write has committed"""
+
+    status: Dict[str, Any]
+    project_id: Optional[str] = None
+    execution_id: Optional[str] = None
+
+
+class WebhookWrite(NamedTuple):
+    """One Firestore write derived from a webhook"""
+
+    kind: str  # "set", "update", or "add" (new document with a generated ID)
+    path: str  # Document path, or the collection path for "add"
+    data: Dict[str, Any]
+    merge: bool = False
+    status: Optional[StatusUpdate] = None
+
+
+def build_event_writes(event_type: str, data: Dict[str, Any]) -> List[WebhookWrite]:
+    """Map an n8n callback event to the writes it causes"""
+    writes: List[WebhookWrite] = []
+
+    if event_type in ("workflow_completed", "workflow_failed"):
+        workflow_id = data.get("workflow_id")
+        execution_id = data.get("execution_id")
+        project_id = data.get("project_id")
+        if not (workflow_id and execution_id):
+            return writes
+
+        completed = event_type == "workflow_completed"
+        execution = {
+            "workflow_id": workflow_id,
+            "execution_id": execution_id,
+            "status": "completed" if completed else "failed",
+        }
+        if completed:
+            execution["result"] = data.get("result")
+            execution["completed_at"] = firestore.SERVER_TIMESTAMP
+        else:
+            execution["error"] = data.get("error")
+            execution["failed_at"] = firestore.SERVER_TIMESTAMP
+        if project_id:
+            execution["project_id"] = project_id
+
+        status = {
+            "type": "execution",
+            "project_id": project_id,
+            "execution_id": execution_id,
+            "workflow_id": workflow_id,
+            "status": execution["status"],
+        }
+        if not completed:
+            status["error"] = execution["error"]
+        writes.append(
+            WebhookWrite(
+                "set",
+                f"workflow_executions/{execution_id}",
+                execution,
+                merge=not completed,
+                status=StatusUpdate(status, project_id, execution_id),
+            )
+        )
+
+    elif event_type == "project_created":
+        # Handle project creation workflow completion
+        project_id = data.get("project_id")
+        if project_id and data.get("user_id"):
+            writes.append(
+                WebhookWrite(
+                    "update",
+                    f"projects/{project_id}",
+                    {
+                        "workflow_status": "completed",
+                        "workflow_completed_at": firestore.SERVER_TIMESTAMP,
+                    },
+                    status=StatusUpdate(
+                        {"type": "project", "project_id": project_id, "workflow_status": "completed"},
+                        project_id,
+                    ),
+                )
+            )
+
+    elif event_type == "asset_processed":
+        # Handle asset processing workflow completion
+        project_id = data.get("project_id")
+        asset_id = data.get("asset_id")
+        processed_url = data.get("processed_url")
+        if project_id and asset_id:
+            writes.append(
+                WebhookWrite(
+                    "update",
+                    f"projects/{project_id}/assets/{asset_id}",
+                    {
+                        "processed_url": processed_url,
+                        "processing_status": "completed",
+                        "processed_at": firestore.SERVER_TIMESTAMP,
+                    },
+                    status=StatusUpdate(
+                        {
+                            "type": "asset",
+                            "project_id": project_id,
+                            "asset_id": asset_id,
+                            "processing_status": "completed",
+                            "processed_url": processed_url,
+                        },
+                        project_id,
+                    ),
+                )
+            )
+
+    return writes
+
+
+def build_log_write(workflow_id: str, body: Dict[str, Any]) -> WebhookWrite:
+    """Raw payload log for the per-workflow webhook endpoint"""
+    return WebhookWrite(
+        "add",
+        "webhook_logs",
+        {
+            "workflow_id": workflow_id,
+            "data": body,
+            "received_at": firestore.SERVER_TIMESTAMP,
+        },
+    )
+
+
+def _stage(db, batch, write: WebhookWrite):
+    if write.kind == "add":
+        batch.set(db.collection(write.path).document(), write.data)
+    elif write.kind == "update":
+        batch.update(db.document(write.path), write.data)
+    else:
+        batch.set(db.document(write.path), write.data, merge=write.merge)
+
+
+def build_record_writes(record: Dict[str, Any]) -> List[WebhookWrite]:
+    """
+    Writes for a webhook record: {"event_type", "data"} for /n8n callbacks or
+    {"workflow_id", "body"} for per-workflow payloads
+    """
+    if "workflow_id" in record:
+        return [build_log_write(record["workflow_id"], record["body"])]
+    return build_event_writes(record["event_type"], record["data"])
+
+
+async def commit_writes(writes: List[WebhookWrite]):
+    """Commit writes in one batch"""
+    db = get_async_db()
+    batch = db.batch()
+    for write in writes:
+        _stage(db, batch, write)
+    await batch.commit()
+
+
+async def publish_committed(writes: List[WebhookWrite]):
+    """Notify streaming clients about committed writes"""
+    for write in writes:
+        if write.status is not None:
+            await publish_status(write.status.status, write.status.project_id, write.status.execution_id)
+
+
+class WebhookQueueFullError(Exception):
+    """The ingest stream holds as many webhooks as it may"""
+
+
+class WebhookWriter:
+    """
+    Durable background writer for accepted webhooks.
+
+    Requests append the webhook (its event, not the derived writes) to a Redis
+    Stream before answering 202, so an accepted webhook survives a crash or
+    redeploy; when the stream holds queue_size entries new ones are refused so
+    n8n backs off and retries. Each worker reads the stream through a consumer
+    group and commits up to 500 writes per Firestore batch, then acks and
+    deletes the entries. If a batch fails (e.g. an update of a missing
+    document), its webhooks are retried one by one so only the bad ones are
+    lost; their idempotency claims are released so n8n's retries are applied.
+    Entries left pending by a worker that died mid-batch are reclaimed with
+    XAUTOCLAIM and applied again (at-least-once). Status updates are published
+    after the commit.
+    """
+
+    def __init__(
+        self, queue_size: int, flush_interval_ms: int, claim_idle_ms: int, stop_timeout: float
+    ):
+        self.queue_size = queue_size
+        self.block_ms = max(1, flush_interval_ms)
+        self.claim_idle_ms = claim_idle_ms
+        self.stop_timeout = stop_timeout
+        self.consumer = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._closing = False
+        self._group_ready = False
+        self._enqueue_script = None
+        self._stats = {
+            "accepted": 0,
+            "rejected": 0,
+            "inline": 0,
+            "written": 0,
+            "batches": 0,
+            "batch_failures": 0,
+            "write_failures": 0,
+            "reclaimed": 0,
+        }
+
+    def start(self):
+        if self._tasks:
+            return
+        self._closing = False
+        self._tasks = [
+            asyncio.create_task(self._consume_loop()),
+            asyncio.create_task(self._reclaim_loop()),
+        ]
+
+    async def stop(self):
+        """
+        Finish the batch in progress, waiting at most stop_timeout (called from
+        the application lifespan). Anything not yet acked stays in the stream.
+        """
+        if not self._tasks:
+            return
+        self._closing = True
+        consume, reclaim = self._tasks
+        reclaim.cancel()
+        await asyncio.wait([consume], timeout=self.stop_timeout)
+        consume.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, record: Dict[str, Any]) -> bool:
+        """
+        Append one webhook record (see build_record_writes) to the ingest stream.
+        Returns False when Redis is unavailable, so the caller writes inline;
+        raises WebhookQueueFullError when the stream is at queue_size.
+        """
+        redis_client = get_async_redis()
+        if not redis_client:
+            self._stats["inline"] += 1
+            return False
+        try:
+            if self._enqueue_script is None or self._enqueue_script.registered_client is not redis_client:
+                self._enqueue_script = redis_client.register_script(_ENQUEUE_SCRIPT)
+            message_id = await self._enqueue_script(
+                keys=[INGEST_STREAM], args=[self.queue_size, json.dumps(record, default=str)]
+            )
+        except Exception as e:
+            logger.warning(f"Webhook enqueue error: {e}. Writing inline.")
+            self._stats["inline"] += 1
+            return False
+        if message_id is None:
+            self._stats["rejected"] += 1
+            raise WebhookQueueFullError(f"{INGEST_STREAM} holds {self.queue_size} webhooks")
+        self._stats["accepted"] += 1
+        return True
+
+    async def _ensure_group(self, redis_client):
+        if self._group_ready:
+            return
+        try:
+            await redis_client.xgroup_create(INGEST_STREAM, INGEST_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def _consume_loop(self):
+        while not self._closing:
+            redis_client = get_async_redis()
+            if not redis_client:
+                await asyncio.sleep(IDLE_SLEEP_SECONDS)
+                continue
+            try:
+                await self._ensure_group(redis_client)
+                response = await redis_client.xreadgroup(
+                    INGEST_GROUP,
+                    self.consumer,
+                    {INGEST_STREAM: ">"},
+                    count=FIRESTORE_BATCH_LIMIT,
+                    block=self.block_ms,
+                )
+                for _, messages in response or []:
+                    await self._process(redis_client, messages)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The group disappears if the stream key is deleted; recreate it next round
+                self._group_ready = False
+                logger.warning(f"Webhook ingest read error: {e}")
+                await asyncio.sleep(IDLE_SLEEP_SECONDS)
+
+    async def _reclaim_loop(self):
+        while True:
+            await asyncio.sleep(self.claim_idle_ms / 1000)
+            redis_client = get_async_redis()
+            if not redis_client or not self._group_ready:
+                continue
+            try:
+                start_id = "0-0"
+                while True:
+                    next_id, messages, *_ = await redis_client.xautoclaim(
+                        INGEST_STREAM,
+                        INGEST_GROUP,
+                        self.consumer,
+                        min_idle_time=self.claim_idle_ms,
+                        start_id=start_id,
+                        count=FIRESTORE_BATCH_LIMIT,
+                    )
+                    messages = [m for m in messages if m and m[1]]
+                    if messages:
+                        self._stats["reclaimed"] += len(messages)
+                        await self._process(redis_client, messages)
+                    start_id = next_id.decode() if isinstance(next_id, bytes) else next_id
+                    if start_id == "0-0":
+                        break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Webhook ingest reclaim error: {e}")
+
+    async def _process(self, redis_client, messages: List[Tuple[bytes, Dict[bytes, bytes]]]):
+        """Commit a read batch, release the claims of webhooks that failed, then ack all"""
+        entries: List[Tuple[Dict[str, Any], List[WebhookWrite]]] = []
+        for message_id, fields in messages:
+            try:
+                record = json.loads(fields[b"record"])
+                entries.append((record, build_record_writes(record)))
+            except Exception as e:
+                self._stats["write_failures"] += 1
+                logger.error(f"Unreadable webhook entry {message_id!r} dropped: {e}")
+
+        committed: List[WebhookWrite] = []
+        for chunk in _chunks(entries):
+            committed += await self._flush(chunk)
+
+        ids = [message_id for message_id, _ in messages]
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.xack(INGEST_STREAM, INGEST_GROUP, *ids)
+            pipe.xdel(INGEST_STREAM, *ids)
+            await pipe.execute()
+
+        self._stats["written"] += len(committed)
+        await publish_committed(committed)
+
+    async def _flush(
+        self, entries: List[Tuple[Dict[str, Any], List[WebhookWrite]]]
+    ) -> List[WebhookWrite]:
+        """Commit webhooks in one batch, falling back to one commit per webhook"""
+        writes = [write for _, entry_writes in entries for write in entry_writes]
+        if not writes:
+            return []
+        try:
+            await commit_writes(writes)
+            self._stats["batches"] += 1
+            return writes
+        except Exception as e:
+            self._stats["batch_failures"] += 1
+            logger.warning(f"Webhook batch of {len(writes)} writes failed ({e}); retrying individually")
+
+        committed: List[WebhookWrite] = []
+        for record, entry_writes in entries:
+            if not entry_writes:
+                continue
+            try:
+                await commit_writes(entry_writes)
+                committed += entry_writes
+            except Exception as write_error:
+                self._stats["write_failures"] += 1
+                logger.error(f"Webhook write to {entry_writes[0].path} failed: {write_error}")
+                if record.get("idempotency_key"):
+                    await webhook_deduplicator.release(record["idempotency_key"])
+        return committed
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+
+def _chunks(entries):
+    """Split entries into batches of at most 500 writes; a webhook is never split"""
+    chunk, size = [], 0
+    for entry in entries:
+        if chunk and size + len(entry[1]) > FIRESTORE_BATCH_LIMIT:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(entry)
+        size += len(entry[1])
+    if chunk:
+        yield chunk
+
+
+webhook_writer = WebhookWriter(
+    queue_size=settings.webhook_queue_size,
+    flush_interval_ms=settings.webhook_flush_interval_ms,
+    claim_idle_ms=settings.webhook_claim_idle_ms,
+    stop_timeout=settings.webhook_stop_timeout,
+)
+
+# Idempotency for n8n retries, keyed by (event_type, execution_id)
+webhook_deduplicator = Deduplicator(
+    prefix="dedup:",
+    ttl=settings.webhook_dedup_ttl,
+    bloom_capacity=settings.webhook_dedup_bloom_capacity,
+    bloom_error_rate=settings.webhook_dedup_bloom_error_rate,
+)
+
+
+def dedup_key(event_type: str, execution_id: Any) -> Optional[str]:
+    """Idempotency key for a delivery, or None when n8n sent no execution ID"""
+    if not execution_id:
+        return None
+    return f"{event_type}:{execution_id}"
@@ -0,0 +1,121 @@
+"""Cached event-to-workflow index for n8n fallback dispatch"""
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from api.lib.n8n import get_n8n_client
+
+logger = logging.getLogger(__name__)
+
+EVENT_TAG_PREFIX = "event:"  # n8n tag naming the event a workflow handles, e.g. "event:project_created"
+MISS_REFRESH_INTERVAL = 30.0  # Minimum seconds between refreshes triggered by unknown events
+_NAME_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _name_tokens(name: str) -> set:
+    return set(_NAME_TOKEN_RE.findall(name.lower()))
+
+
+class WorkflowIndex:
+    """
+    Maps workflow events to n8n workflow IDs.
+
+    Sources, in priority order: the N8N_EVENT_WORKFLOWS mapping, an
+    "event:<name>" tag on the workflow, and a workflow name containing every word
+    of the event (e.g. "Project Created" for project_created). Active workflows
+    win over inactive ones. The index is rebuilt when older than its TTL, when an
+    unknown event is looked up (rate limited), and whenever the admin workflows
+    listing fetches a fresh copy.
+    """
+
+    def __init__(self, events: List[str], ttl: float, explicit: Dict[str, str]):
+        """
+        Args:
+            events: Event names to index
+            ttl: Seconds before the index is rebuilt on the next lookup
+            explicit: Event-to-workflow-ID overrides
+        """
+        self.events = events
+        self.ttl = ttl
+        self.explicit = explicit
+        self._index: Dict[str, str] = {}
+        self._built_at = 0.0
+        self._last_miss_refresh = 0.0
+        self._lock = asyncio.Lock()
+        self._stats = {"hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def rebuild(self, workflows: Union[List[Dict[str, Any]], Dict[str, Any]]):
+        """Rebuild from a workflow listing (a list, or the n8n API's {"data": [...]} page)"""
+        if isinstance(workflows, dict):
+            workflows = workflows.get("data", [])
+
+        ranked: Dict[str, tuple] = {}
+        event_tokens = {event: set(event.split("_")) for event in self.events}
+        for workflow in sorted(workflows, key=lambda w: not w.get("active", False)):
+            workflow_id = str(workflow.get("id", ""))
+            if not workflow_id:
+                continue
+            tags = {
+                (tag.get("name", "") if isinstance(tag, dict) else str(tag)).lower()
+                for tag in workflow.get("tags") or []
+            }
+            name_tokens = _name_tokens(workflow.get("name", ""))
+            for event, tokens in event_tokens.items():
+                if EVENT_TAG_PREFIX + event in tags:
+                    rank = 0
+                elif tokens <= name_tokens:
+                    rank = 1
+                else:
+                    continue
+                # Sorted active-first, so the first workflow at the best rank is kept
+                if event not in ranked or rank < ranked[event][0]:
+                    ranked[event] = (rank, workflow_id)
+
+        index = {event: workflow_id for event, (_, workflow_id) in ranked.items()}
+        index.update(self.explicit)
+
+        self._index = index
+        self._built_at = time.monotonic()
+        self._stats["refreshes"] += 1
+
+    async def refresh(self):
+        """Fetch the workflow listing from n8n and rebuild"""
+        requested_at = time.monotonic()
+        async with self._lock:
+            # Another lookup rebuilt the index while this one waited
+            if self._built_at >= requested_at:
+                return
+            try:
+                workflows = await get_n8n_client().get_workflows()
+            except Exception:
+                self._stats["refresh_errors"] += 1
+                raise
+            self.rebuild(workflows)
+
+    async def resolve(self, event: str) -> Optional[str]:
+        """Workflow ID for an event, refreshing the index if it is stale or misses"""
+        if event in self.explicit:
+            self._stats["hits"] += 1
+            return self.explicit[event]
+
+        now = time.monotonic()
+        if now - self._built_at > self.ttl:
+            await self.refresh()
+        elif event not in self._index and now - self._last_miss_refresh > MISS_REFRESH_INTERVAL:
+            self._last_miss_refresh = now
+            await self.refresh()
+
+        workflow_id = self._index.get(event)
+        self._stats["hits" if workflow_id else "misses"] += 1
+        return workflow_id
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "events": dict(self._index)}
+
+
+def parse_event_workflows(mapping: str) -> Dict[str, str]:
+    """Parse "event=workflow_id,..." into a dict"""
+    pairs = (item.split("=", 1) for item in mapping.split(",") if "=" in item)
+    return {event.strip(): workflow_id.strip() for event, workflow_id in pairs}
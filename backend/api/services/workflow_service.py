@@ -1,19 +1,72 @@
 """Workflow orchestration service"""
 from typing import Optional, Dict, Any
 import logging
+from api.config import settings
 from api.lib.n8n import get_n8n_client
+from api.services.workflow_index import WorkflowIndex, parse_event_workflows
+from api.services.outbox_service import enqueue_event
 from api.models.workflow import WorkflowExecutionRequest, WorkflowExecutionResponse
 
 logger = logging.getLogger(__name__)
 
 
+# Webhook path each event is posted to
+EVENT_WEBHOOKS: Dict[str, str] = {
+    "project_created": "project-created",
+    "asset_uploaded": "asset-uploaded",
+    "ai_generation": "ai-generation",
+}
+
+# Fallback when the webhook is not registered: execute the workflow indexed for the event
+workflow_index = WorkflowIndex(
+    events=list(EVENT_WEBHOOKS),
+    ttl=settings.n8n_workflow_index_ttl,
+    explicit=parse_event_workflows(settings.n8n_event_workflows),
+)
+
+
 class WorkflowService:
     """Service for orchestrating n8n workflows"""
 
+    @staticmethod
+    async def deliver(event: str, payload: Dict[str, Any]) -> Optional[str]:
+        """
+        Deliver an event to n8n. Used by the outbox dispatcher.
+
+        Args:
+            event: Event name (a key of EVENT_WEBHOOKS)
+            payload: Webhook payload
+
+        Returns:
+            Execution ID reported by n8n, if any
+
+        Raises:
+            Exception: if neither the webhook nor a matching workflow accepted the event
+        """
+        n8n_client = get_n8n_client()
+
+        # Try webhook path first (more common in n8n). Only a failed request falls
+        # back: once n8n has accepted the webhook, running the workflow again
+        # would duplicate it
+        try:
+            result = await n8n_client.trigger_webhook(EVENT_WEBHOOKS[event], payload)
+        except Exception as webhook_error:
+            # Fallback: execute the workflow indexed for this event
+            workflow_id = await workflow_index.resolve(event)
+            if not workflow_id:
+                raise webhook_error
+            result = await n8n_client.execute_workflow(workflow_id, payload)
+            logger.info(f"Executed workflow {workflow_id} for {event}")
+        else:
+            logger.info(f"Triggered {EVENT_WEBHOOKS[event]} webhook for {event}")
+
+        # "Respond to Webhook" nodes can answer with text or a list
+        return result.get("execution_id") if isinstance(result, dict) else None
+
     @staticmethod
     async def trigger_project_created_workflow(
         project_id: str, user_id: str, project_data: Dict[str, Any]
-    ) -> Optional[str]:
+    ) -> bool:
         """
         Trigger workflow when a project is created.
 
@@ -23,46 +76,22 @@ class WorkflowService:
             project_data: Project data
 
         Returns:
-            Execution ID if workflow was triggered
+            True if the event was durably queued for delivery
         """
-        try:
-            n8n_client = get_n8n_client()
-
-            # Try to trigger webhook workflow
-            webhook_data = {
+        return await enqueue_event(
+            "project_created",
+            {
                 "project_id": project_id,
                 "user_id": user_id,
                 "project": project_data,
                 "event": "project_created",
-            }
-
-            # Try webhook path first (more common in n8n)
-            try:
-                result = await n8n_client.trigger_webhook("project-created", webhook_data)
-                logger.info(f"Triggered project-created webhook for project {project_id}")
-                return result.get("execution_id")
-            except Exception:
-                # Fallback: try to find and execute workflow by name
-                workflows = await n8n_client.get_workflows()
-                workflow = next(
-                    (w for w in workflows if "project" in w.get("name", "").lower() and "created" in w.get("name", "").lower()),
-                    None
-                )
-                if workflow:
-                    result = await n8n_client.execute_workflow(workflow["id"], webhook_data)
-                    logger.info(f"Executed project-created workflow for project {project_id}")
-                    return result.get("execution_id")
-
-        except Exception as e:
-            logger.warning(f"Failed to trigger project-created workflow: {e}")
-            # Don't fail the request if workflow trigger fails
-
-        return None
+            },
+        )
 
     @staticmethod
     async def trigger_asset_upload_workflow(
         project_id: str, asset_id: str, asset_data: Dict[str, Any]
-    ) -> Optional[str]:
+    ) -> bool:
         """
         Trigger workflow when an asset is uploaded.
 
@@ -72,42 +101,22 @@ class WorkflowService:
             asset_data: Asset data
 
         Returns:
-            Execution ID if workflow was triggered
+            True if the event was durably queued for delivery
         """
-        try:
-            n8n_client = get_n8n_client()
-
-            webhook_data = {
+        return await enqueue_event(
+            "asset_uploaded",
+            {
                 "project_id": project_id,
                 "asset_id": asset_id,
                 "asset": asset_data,
                 "event": "asset_uploaded",
-            }
-
-            try:
-                result = await n8n_client.trigger_webhook("asset-uploaded", webhook_data)
-                logger.info(f"Triggered asset-uploaded webhook for asset {asset_id}")
-                return result.get("execution_id")
-            except Exception:
-                workflows = await n8n_client.get_workflows()
-                workflow = next(
-                    (w for w in workflows if "asset" in w.get("name", "").lower() and "upload" in w.get("name", "").lower()),
-                    None
-                )
-                if workflow:
-                    result = await n8n_client.execute_workflow(workflow["id"], webhook_data)
-                    logger.info(f"Executed asset-uploaded workflow for asset {asset_id}")
-                    return result.get("execution_id")
-
-        except Exception as e:
-            logger.warning(f"Failed to trigger asset-uploaded workflow: {e}")
-
-        return None
+            },
+        )
 
     @staticmethod
     async def trigger_ai_generation_workflow(
         project_id: str, user_id: str, generation_data: Dict[str, Any]
-    ) -> Optional[str]:
+    ) -> bool:
         """
         Trigger workflow for AI generation tasks.
 
@@ -117,37 +126,17 @@ class WorkflowService:
             generation_data: Generation request data
 
         Returns:
-            Execution ID if workflow was triggered
+            True if the event was durably queued for delivery
         """
-        try:
-            n8n_client = get_n8n_client()
-
-            webhook_data = {
+        return await enqueue_event(
+            "ai_generation",
+            {
                 "project_id": project_id,
                 "user_id": user_id,
                 "generation": generation_data,
                 "event": "ai_generation",
-            }
-
-            try:
-                result = await n8n_client.trigger_webhook("ai-generation", webhook_data)
-                logger.info(f"Triggered ai-generation webhook for project {project_id}")
-                return result.get("execution_id")
-            except Exception:
-                workflows = await n8n_client.get_workflows()
-                workflow = next(
-                    (w for w in workflows if "ai" in w.get("name", "").lower() or "generation" in w.get("name", "").lower()),
-                    None
-                )
-                if workflow:
-                    result = await n8n_client.execute_workflow(workflow["id"], webhook_data)
-                    logger.info(f"Executed ai-generation workflow for project {project_id}")
-                    return result.get("execution_id")
-
-        except Exception as e:
-            logger.warning(f"Failed to trigger ai-generation workflow: {e}")
-
-        return None
+            },
+        )
 
     @staticmethod
     async def execute_workflow(
@@ -173,4 +162,3 @@ class WorkflowService:
             workflow_id=request.workflow_id,
             data=result,
         )
-
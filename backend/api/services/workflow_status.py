@@ -0,0 +1,151 @@
+"""Workflow status fan-out over Redis pub/sub"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Set
+
+from api.lib.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+STATUS_CHANNEL_PREFIX = "workflow_status:"
+SUBSCRIBER_QUEUE_SIZE = 100  # Updates buffered per client before the oldest are dropped
+LISTENER_RETRY_SECONDS = 5
+LISTENER_START_TIMEOUT = 2.0  # Longest startup wait for the pattern subscription
+
+
+def project_channel(project_id: str) -> str:
+    return f"{STATUS_CHANNEL_PREFIX}project:{project_id}"
+
+
+def execution_channel(execution_id: str) -> str:
+    return f"{STATUS_CHANNEL_PREFIX}execution:{execution_id}"
+
+
+async def publish_status(
+    status: Dict[str, Any],
+    project_id: Optional[str] = None,
+    execution_id: Optional[str] = None,
+):
+    """Publish a status transition to the project and/or execution channels"""
+    channels = []
+    if project_id:
+        channels.append(project_channel(project_id))
+    if execution_id:
+        channels.append(execution_channel(execution_id))
+    redis_client = get_async_redis()
+    if not channels or not redis_client:
+        return
+
+    message = json.dumps(status, default=str)
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for channel in channels:
+                pipe.publish(channel, message)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Workflow status publish error: {e}")
+
+
+class StatusHub:
+    """
+    Fans workflow status messages out to SSE clients in this worker.
+
+    The worker holds a single pattern subscription on workflow_status:* rather
+    than one pub/sub connection per client, and routes each message to the
+    queues of the clients watching its channel. The subscription is opened at
+    startup, so a client's queue receives every transition published after
+    subscribe() returns.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+        self._subscribed = asyncio.Event()
+        self.connected = False
+        self.dropped = 0
+
+    async def start(self):
+        """Open the pattern subscription (called from the application lifespan)"""
+        self._ensure_listener()
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout=LISTENER_START_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Workflow status listener not subscribed yet; retrying in the background")
+
+    def _ensure_listener(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    def subscribe(self, channels: Iterable[str]) -> asyncio.Queue:
+        """Register a client queue that receives (channel, data) tuples"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        for channel in channels:
+            self._subscribers[channel].add(queue)
+        self._ensure_listener()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, channels: Iterable[str]):
+        for channel in channels:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is None:
+                continue
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[channel]
+
+    def _dispatch(self, channel: str, data: bytes):
+        for queue in list(self._subscribers.get(channel, ())):
+            if queue.full():
+                # Slow client: keep the newest status rather than blocking the fan-out
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait((channel, data))
+
+    async def _listen(self):
+        while True:
+            redis_client = get_async_redis()
+            if redis_client is not None:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                try:
+                    await pubsub.psubscribe(f"{STATUS_CHANNEL_PREFIX}*")
+                    self.connected = True
+                    self._subscribed.set()
+                    async for message in pubsub.listen():
+                        self._dispatch(message["channel"].decode(), message["data"])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Workflow status listener stopped: {e}")
+                finally:
+                    self.connected = False
+                    self._subscribed.clear()
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+            await asyncio.sleep(LISTENER_RETRY_SECONDS)
+
+    async def stop(self):
+        """Cancel the listener (called from the application lifespan)"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "channels": len(self._subscribers),
+            "clients": len({id(q) for qs in self._subscribers.values() for q in qs}),
+            "dropped": self.dropped,
+        }
+
+
+status_hub = StatusHub()
@@ -0,0 +1,64 @@
+"""Backfill: copy each project's userId onto its agent sessions
+
+Sessions are listed per user with one collection group query on userId, so
+sessions written before they carried the field do not show up until this
+has run. Sessions that already have a userId are left alone.
+
+Usage (uses Application Default Credentials, or FIRESTORE_EMULATOR_HOST):
+    uv run python scripts/backfill_session_user_ids.py --project cinefilm-platform [--dry-run]
+"""
+import argparse
+from typing import Dict, Optional
+
+from google.cloud import firestore
+
+BATCH_SIZE = 400  # Under Firestore's 500 writes per batch
+
+
+def backfill(db: firestore.Client, dry_run: bool) -> int:
+    """Set userId on sessions that lack it; returns the number updated"""
+    owners: Dict[str, Optional[str]] = {}
+    batch = db.batch()
+    pending = 0
+    updated = 0
+
+    for session in db.collection_group("agent_sessions").stream():
+        if session.to_dict().get("userId"):
+            continue
+        project_ref = session.reference.parent.parent
+        if project_ref.id not in owners:
+            project = project_ref.get()
+            owners[project_ref.id] = project.to_dict().get("userId") if project.exists else None
+        user_id = owners[project_ref.id]
+        if not user_id:
+            print(f"Skipping {session.reference.path}: project has no owner")
+            continue
+
+        updated += 1
+        if dry_run:
+            continue
+        batch.update(session.reference, {"userId": user_id})
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--project", default=None, help="Google Cloud project ID")
+    parser.add_argument("--dry-run", action="store_true", help="Count sessions without writing")
+    args = parser.parse_args()
+
+    updated = backfill(firestore.Client(project=args.project), args.dry_run)
+    verb = "Would update" if args.dry_run else "Updated"
+    print(f"{verb} {updated} sessions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark: blocking vs asyncio Firestore reads inside async handlers
+
+Serves the same endpoint (a project read followed by a small query, like the
+projects and agents routers do) once with the synchronous Firestore client and
+once with the AsyncClient, under concurrent load, and reports throughput and
+latency percentiles for each. A TCP proxy in front of the emulator adds
+per-packet delay so that each RPC costs a realistic round trip.
+
+Usage (needs the Firestore emulator):
+    uv run python scripts/bench_firestore.py --emulator-host localhost:8080 --latency-ms 5
+"""
+import argparse
+import asyncio
+import os
+import time
+from urllib.parse import urlparse
+
+from fastapi import FastAPI
+from google.cloud import firestore
+
+from bench_redis import DelayProxy, report, run
+
+PROJECT = "cinefilm-bench"
+USER_ID = "bench-user"
+
+
+def seed(projects: int):
+    """Create a user's projects for the endpoint to read"""
+    db = firestore.Client(project=PROJECT)
+    batch = db.batch()
+    for i in range(projects):
+        batch.set(
+            db.collection("projects").document(f"bench-{i}"),
+            {"userId": USER_ID, "title": f"Bench {i}", "createdAt": firestore.SERVER_TIMESTAMP},
+        )
+    batch.commit()
+
+
+def build_app(mode: str) -> FastAPI:
+    """App whose handler does one document read and one query per request"""
+    app = FastAPI()
+    clients = {}
+
+    def client():
+        # Created on first use so the AsyncClient binds to the running loop
+        if mode not in clients:
+            clients[mode] = (firestore.Client if mode == "sync" else firestore.AsyncClient)(project=PROJECT)
+        return clients[mode]
+
+    if mode == "sync":
+
+        @app.get("/bench")
+        async def bench_sync():
+            db = client()
+            project = db.collection("projects").document("bench-0").get()
+            query = db.collection("projects").where("userId", "==", USER_ID).limit(10)
+            return {"exists": project.exists, "count": len(list(query.stream()))}
+
+    else:
+
+        @app.get("/bench")
+        async def bench_async():
+            db = client()
+            project = await db.collection("projects").document("bench-0").get()
+            query = db.collection("projects").where("userId", "==", USER_ID).limit(10)
+            return {"exists": project.exists, "count": len([doc async for doc in query.stream()])}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emulator-host", default=os.getenv("FIRESTORE_EMULATOR_HOST", "localhost:8080"))
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    parsed = urlparse(f"//{args.emulator_host}")
+    os.environ["FIRESTORE_EMULATOR_HOST"] = args.emulator_host
+    seed(10)
+
+    if args.latency_ms > 0:
+        proxy = DelayProxy(parsed.hostname or "localhost", parsed.port or 8080, args.latency_ms)
+        proxy.start()
+        os.environ["FIRESTORE_EMULATOR_HOST"] = f"127.0.0.1:{proxy.port}"
+
+    for mode in ("sync", "async"):
+        app = build_app(mode)
+        start = time.perf_counter()
+        latencies = asyncio.run(run(app, args.requests, args.concurrency))
+        report(mode, latencies, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Benchmark: blocking vs asyncio Redis calls inside async middleware
+
+Runs the same per-request Redis work (a rate-limit pipeline plus a cache
+lookup) through a synchronous client and through redis.asyncio, under
+concurrent load, and reports latency percentiles for each. A TCP proxy adds
+per-packet delay so the effect of a slow Redis on the event loop is visible.
+
+Usage (needs a reachable Redis):
+    uv run python scripts/bench_redis.py --redis-url redis://localhost:6379/0 --latency-ms 2
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from urllib.parse import urlparse
+
+import httpx
+import redis
+import redis.asyncio as aioredis
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+
+class DelayProxy:
+    """TCP proxy that delays every forwarded chunk, run on its own thread and loop"""
+
+    def __init__(self, target_host: str, target_port: int, latency_ms: float):
+        self.target_host = target_host
+        self.target_port = target_port
+        self.delay = latency_ms / 1000
+        self.port = None
+        self._ready = threading.Event()
+
+    def start(self):
+        threading.Thread(target=lambda: asyncio.run(self._serve()), daemon=True).start()
+        self._ready.wait()
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, client_reader, client_writer):
+        upstream_reader, upstream_writer = await asyncio.open_connection(
+            self.target_host, self.target_port
+        )
+
+        async def pipe(reader, writer):
+            try:
+                while data := await reader.read(65536):
+                    await asyncio.sleep(self.delay)
+                    writer.write(data)
+                    await writer.drain()
+            finally:
+                writer.close()
+
+        await asyncio.gather(
+            pipe(client_reader, upstream_writer),
+            pipe(upstream_reader, client_writer),
+            return_exceptions=True,
+        )
+
+
+def build_app(mode: str, url: str) -> FastAPI:
+    """App whose middleware does cache + rate-limit style Redis work per request"""
+    app = FastAPI()
+    sync_client = redis.Redis.from_url(url, max_connections=200)
+    async_client = aioredis.Redis.from_url(url, max_connections=200)
+
+    class SyncRedisMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            pipe = sync_client.pipeline()
+            pipe.incr("bench:rate")
+            pipe.expire("bench:rate", 60)
+            pipe.execute()
+            sync_client.get("bench:cache")
+            return await call_next(request)
+
+    class AsyncRedisMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            pipe = async_client.pipeline()
+            pipe.incr("bench:rate")
+            pipe.expire("bench:rate", 60)
+            await pipe.execute()
+            await async_client.get("bench:cache")
+            return await call_next(request)
+
+    @app.get("/bench")
+    async def bench():
+        return {"ok": True}
+
+    app.add_middleware(SyncRedisMiddleware if mode == "sync" else AsyncRedisMiddleware)
+    return app
+
+
+async def run(app: FastAPI, requests: int, concurrency: int) -> list:
+    """Fire requests with bounded concurrency and collect per-request latency"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    ) as client:
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                await client.get("/bench")
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        await asyncio.gather(*(one() for _ in range(requests)))
+
+    return latencies
+
+
+def report(mode: str, latencies: list, elapsed: float):
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{mode:>5}: {len(latencies) / elapsed:8.0f} req/s  "
+        f"p50 {quantiles[49]:7.2f} ms  p95 {quantiles[94]:7.2f} ms  p99 {quantiles[98]:7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    url = args.redis_url
+    if args.latency_ms > 0:
+        parsed = urlparse(url)
+        proxy = DelayProxy(parsed.hostname or "localhost", parsed.port or 6379, args.latency_ms)
+        proxy.start()
+        url = parsed._replace(netloc=f"127.0.0.1:{proxy.port}").geturl()
+
+    for mode in ("sync", "async"):
+        app = build_app(mode, url)
+        start = time.perf_counter()
+        latencies = asyncio.run(run(app, args.requests, args.concurrency))
+        report(mode, latencies, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
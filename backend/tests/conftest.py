@@ -0,0 +1,186 @@
+"""Shared fixtures: an in-memory stand-in for the Firestore AsyncClient"""
+import itertools
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+import pytest
+from google.api_core.exceptions import AlreadyExists, DeadlineExceeded, FailedPrecondition, NotFound
+from google.cloud.firestore_v1.transforms import SERVER_TIMESTAMP, Increment
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data: Optional[Dict[str, Any]], update_time):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self.update_time = update_time
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db, path: str):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str):
+        return FakeCollection(self._db, f"{self.path}/{name}")
+
+    async def get(self):
+        self._db.calls["get"] += 1
+        return self._db.snapshot(self)
+
+    async def create(self, data):
+        self._db.calls["commit"] += 1
+        self._db.apply([("create", self, data, None)])
+
+    async def update(self, data, option=None):
+        self._db.calls["commit"] += 1
+        self._db.apply([("update", self, data, option)])
+
+
+class FakeCollection:
+    def __init__(self, db, path: str):
+        self._db = db
+        self.path = path
+
+    def document(self, document_id: Optional[str] = None):
+        return FakeDocument(self._db, f"{self.path}/{document_id or self._db.new_id()}")
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def create(self, ref, data):
+        self._writes.append(("create", ref, data, None))
+
+    def set(self, ref, data, merge=False):
+        self._writes.append(("merge" if merge else "set", ref, data, None))
+
+    def update(self, ref, data, option=None):
+        self._writes.append(("update", ref, data, option))
+
+    def delete(self, ref, option=None):
+        self._writes.append(("delete", ref, None, option))
+
+    async def commit(self):
+        self._db.calls["commit"] += 1
+        self._db.apply(self._writes)
+
+
+class FakeAsyncClient:
+    """
+    Records get/commit round trips and enforces create and last_update_time
+    preconditions; Increment and SERVER_TIMESTAMP are applied like the server
+    does. Set `conflicts` to make that many precondition checks fail, as if
+    another writer had changed the document in between, and `ambiguous` to make
+    that many commits apply and then raise DeadlineExceeded.
+    """
+
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.update_times: Dict[str, datetime] = {}
+        self.calls: Counter = Counter()
+        self.conflicts = 0
+        self.ambiguous = 0
+        self._ids = itertools.count(1)
+        self._clock = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def new_id(self) -> str:
+        return f"doc{next(self._ids)}"
+
+    def collection(self, name: str):
+        return FakeCollection(self, name)
+
+    def document(self, path: str):
+        return FakeDocument(self, path)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    async def get_all(self, refs):
+        for ref in refs:
+            self.calls["get"] += 1
+            yield self.snapshot(ref)
+
+    def write_option(self, last_update_time):
+        return last_update_time
+
+    def snapshot(self, ref) -> FakeSnapshot:
+        return FakeSnapshot(ref, self.docs.get(ref.path), self.update_times.get(ref.path))
+
+    def seed(self, path: str, data: Dict[str, Any]):
+        self.apply([("set", self.document(path), data, None)])
+        self.calls.clear()
+
+    def apply(self, writes):
+        # All-or-nothing, like a batch commit
+        for kind, ref, _, option in writes:
+            if option is not None:
+                if self.conflicts:
+                    self.conflicts -= 1
+                    raise FailedPrecondition("document changed")
+                if self.update_times.get(ref.path) != option:
+                    raise FailedPrecondition("document changed")
+            if kind == "update" and ref.path not in self.docs:
+                raise NotFound(ref.path)
+            if kind == "create" and ref.path in self.docs:
+                raise AlreadyExists(ref.path)
+        for kind, ref, data, _ in writes:
+            self._clock += timedelta(seconds=1)
+            if kind == "delete":
+                self.docs.pop(ref.path, None)
+                self.update_times.pop(ref.path, None)
+                continue
+            if kind == "update":
+                doc = dict(self.docs[ref.path])
+                for key, value in data.items():
+                    *parents, leaf = key.split(".")
+                    target = doc
+                    for parent in parents:
+                        target = target.setdefault(parent, {})
+                    target[leaf] = self._resolve(target.get(leaf), value, merge=False)
+            elif kind == "merge":
+                doc = self._resolve(self.docs.get(ref.path), data, merge=True)
+            else:
+                doc = self._resolve(None, data, merge=False)
+            self.docs[ref.path] = doc
+            self.update_times[ref.path] = self._clock
+        if self.ambiguous:
+            self.ambiguous -= 1
+            raise DeadlineExceeded("commit applied, response lost")
+
+    def _resolve(self, current, value, merge: bool):
+        if isinstance(value, Increment):
+            return (current or 0) + value.value
+        if value is SERVER_TIMESTAMP:
+            return self._clock
+        if isinstance(value, dict):
+            base = dict(current) if merge and isinstance(current, dict) else {}
+            for key, item in value.items():
+                base[key] = self._resolve(base.get(key), item, merge)
+            return base
+        return value
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """FakeAsyncClient wired into the project service, with cache invalidation stubbed"""
+    from api.services import project_service
+
+    db = FakeAsyncClient()
+    invalidated = []
+
+    async def invalidate_cache_tags(*tags):
+        invalidated.extend(tags)
+
+    monkeypatch.setattr(project_service, "get_async_db", lambda: db)
+    monkeypatch.setattr(project_service, "invalidate_cache_tags", invalidate_cache_tags)
+    db.invalidated = invalidated
+    return db
@@ -0,0 +1,109 @@
+"""Round trips and conflict handling in the project service"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.middleware.auth import get_current_user
+from api.models.project import ProjectCreate, ProjectUpdate
+from api.routers import projects
+from api.services.project_service import (
+    MAX_WRITE_ATTEMPTS,
+    ProjectConflictError,
+    ProjectService,
+)
+
+USER_ID = "user-1"
+PROJECT_PATH = "projects/p1"
+
+
+@pytest.fixture
+def project(fake_db):
+    fake_db.seed(
+        PROJECT_PATH,
+        {
+            "userId": USER_ID,
+            "title": "Old title",
+            "logline": "A logline",
+            "target_length_minutes": 90,
+            "status": "draft",
+            "createdAt": fake_db._clock,
+        },
+    )
+    return fake_db
+
+
+async def test_create_is_one_commit_and_no_reads(fake_db):
+    created = await ProjectService.create_project(
+        USER_ID, ProjectCreate(title="Film", logline="A logline", target_length_minutes=90)
+    )
+
+    assert fake_db.calls == {"commit": 1}
+    assert fake_db.docs[f"projects/{created.id}"]["userId"] == USER_ID
+    assert created.createdAt.tzinfo is not None
+
+
+async def test_update_is_one_read_and_one_commit(project):
+    updated = await ProjectService.update_project("p1", USER_ID, ProjectUpdate(title="New title"))
+
+    assert project.calls == {"get": 1, "commit": 1}
+    assert updated.title == "New title"
+    assert updated.logline == "A logline"
+    assert updated.updatedAt.tzinfo is not None
+    assert project.docs[PROJECT_PATH]["title"] == "New title"
+
+
+async def test_update_retries_after_a_concurrent_write(project):
+    project.conflicts = 1
+
+    updated = await ProjectService.update_project("p1", USER_ID, ProjectUpdate(title="New title"))
+
+    assert project.calls == {"get": 2, "commit": 2}
+    assert updated.title == "New title"
+
+
+async def test_update_of_another_users_project_does_not_write(project):
+    assert await ProjectService.update_project("p1", "someone-else", ProjectUpdate(title="x")) is None
+    assert project.calls == {"get": 1}
+
+
+async def test_update_gives_up_after_repeated_conflicts(project):
+    project.conflicts = MAX_WRITE_ATTEMPTS
+
+    with pytest.raises(ProjectConflictError):
+        await ProjectService.update_project("p1", USER_ID, ProjectUpdate(title="New title"))
+
+    assert project.calls == {"get": MAX_WRITE_ATTEMPTS, "commit": MAX_WRITE_ATTEMPTS}
+    assert project.docs[PROJECT_PATH]["title"] == "Old title"
+
+
+async def test_delete_is_one_read_and_one_commit(project):
+    assert await ProjectService.delete_project("p1", USER_ID) is True
+
+    assert project.calls == {"get": 1, "commit": 1}
+    assert PROJECT_PATH not in project.docs
+
+
+async def test_delete_gives_up_after_repeated_conflicts(project):
+    project.conflicts = MAX_WRITE_ATTEMPTS
+
+    with pytest.raises(ProjectConflictError):
+        await ProjectService.delete_project("p1", USER_ID)
+
+    assert project.calls == {"get": MAX_WRITE_ATTEMPTS, "commit": MAX_WRITE_ATTEMPTS}
+    assert PROJECT_PATH in project.docs
+
+
+@pytest.fixture
+def client(project):
+    app = FastAPI()
+    app.include_router(projects.router)
+    app.dependency_overrides[get_current_user] = lambda: {"uid": USER_ID}
+    return TestClient(app)
+
+
+def test_conflicting_update_and_delete_return_409(client, project):
+    project.conflicts = MAX_WRITE_ATTEMPTS
+    assert client.put("/api/projects/p1", json={"title": "New title"}).status_code == 409
+
+    project.conflicts = MAX_WRITE_ATTEMPTS
+    assert client.delete("/api/projects/p1").status_code == 409
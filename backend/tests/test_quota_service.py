@@ -0,0 +1,89 @@
+"""Quota checks without Redis: legacy documents and unavailable stores"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from api.middleware.quota import require_quota
+from api.services import quota_service as quota_module
+from api.services.quota_service import QuotaService, QuotaUnavailableError
+from api.services.usage_service import current_period
+
+USER_ID = "user-1"
+QUOTA_PATH = f"users/{USER_ID}/quotas/current"
+NOW = datetime.now(timezone.utc)
+LAST_MONTH = NOW.replace(day=1) - timedelta(days=1)
+
+
+@pytest.fixture
+def service(fake_db, monkeypatch):
+    monkeypatch.setattr(quota_module, "get_async_redis", lambda: None)
+    monkeypatch.setattr(quota_module, "get_async_db", lambda: fake_db)
+    return QuotaService(reconcile_interval=300)
+
+
+async def test_legacy_document_from_a_past_month_is_rolled_over(service, fake_db):
+    fake_db.seed(QUOTA_PATH, {"usage": {"aiGenerations": 10}, "updatedAt": LAST_MONTH})
+
+    result = await service.reserve(USER_ID, "aiGenerations")
+
+    assert result.allowed and result.used == 1
+    quota = fake_db.docs[QUOTA_PATH]
+    assert quota["periodKey"] == current_period()
+    assert quota["usage"] == {}
+    assert quota["previousPeriod"] == {
+        "periodKey": current_period(LAST_MONTH),
+        "usage": {"aiGenerations": 10},
+    }
+
+
+async def test_legacy_document_from_this_month_keeps_its_usage(service, fake_db):
+    fake_db.seed(QUOTA_PATH, {"usage": {"aiGenerations": 10}, "updatedAt": NOW})
+
+    result = await service.reserve(USER_ID, "aiGenerations")
+
+    assert not result.allowed and result.used == 10
+    assert fake_db.docs[QUOTA_PATH]["periodKey"] == current_period()
+    assert "previousPeriod" not in fake_db.docs[QUOTA_PATH]
+
+
+async def test_undated_legacy_document_is_rolled_over(service, fake_db):
+    fake_db.seed(QUOTA_PATH, {"usage": {"aiGenerations": 10}})
+
+    result = await service.reserve(USER_ID, "aiGenerations")
+
+    assert result.allowed
+    assert fake_db.docs[QUOTA_PATH]["previousPeriod"] == {"usage": {"aiGenerations": 10}}
+
+
+@pytest.fixture
+def unavailable(service, monkeypatch):
+    class UnavailableDb:
+        def collection(self, name):
+            raise RuntimeError("Firestore unavailable")
+
+    monkeypatch.setattr(quota_module, "get_async_db", lambda: UnavailableDb())
+    return service
+
+
+async def test_check_fails_closed_when_no_store_is_available(unavailable):
+    with pytest.raises(QuotaUnavailableError):
+        await unavailable.reserve(USER_ID, "aiGenerations")
+    assert unavailable.stats()["unavailable"] == 1
+
+
+async def test_check_fails_open_when_configured(unavailable, monkeypatch):
+    monkeypatch.setattr(quota_module.settings, "quota_fail_open", True)
+
+    result = await unavailable.reserve(USER_ID, "aiGenerations")
+
+    assert result.allowed and not result.reserved
+
+
+async def test_metered_endpoint_answers_503_when_the_check_fails_closed(unavailable, monkeypatch):
+    monkeypatch.setattr("api.middleware.quota.quota_service", unavailable)
+    dependency = require_quota("ai_generation")(request=None, current_user={"uid": USER_ID})
+
+    with pytest.raises(HTTPException) as error:
+        await dependency.__anext__()
+    assert error.value.status_code == 503
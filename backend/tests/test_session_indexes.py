@@ -0,0 +1,123 @@
+"""Session listings only issue queries that firestore.indexes.json can serve"""
+import json
+from pathlib import Path
+
+import pytest
+
+from api.routers import admin, agents
+
+INDEXES = json.loads((Path(__file__).parents[2] / "firestore.indexes.json").read_text())
+
+
+class RecordedQuery:
+    """Stands in for a Firestore reference or query and records its shape"""
+
+    def __init__(self, collection: str, scope: str, equalities=()):
+        self.collection = collection
+        self.scope = scope
+        self.equalities = tuple(equalities)
+
+    def where(self, field, op, value):
+        assert op == "=="
+        return RecordedQuery(self.collection, self.scope, self.equalities + (field,))
+
+
+class RecordingProject:
+    def __init__(self, path: str):
+        self.path = path
+
+    def collection(self, name: str):
+        return RecordedQuery(name, "COLLECTION")
+
+    async def get(self):
+        return ProjectSnapshot()
+
+
+class ProjectSnapshot:
+    exists = True
+
+    def to_dict(self):
+        return {"userId": "user-1"}
+
+
+class RecordingDb:
+    def collection(self, name: str):
+        return self
+
+    def document(self, document_id: str):
+        return RecordingProject(document_id)
+
+    def collection_group(self, name: str):
+        return RecordedQuery(name, "COLLECTION_GROUP")
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """Captures (query, order_by) for every fetch_page call in the session routers"""
+    calls = []
+
+    async def fetch_page(query, limit, cursor=None, order_by=()):
+        calls.append((query, list(order_by)))
+        return [], None
+
+    for router in (agents, admin):
+        monkeypatch.setattr(router, "get_async_db", lambda: RecordingDb())
+        monkeypatch.setattr(router, "fetch_page", fetch_page)
+    return calls
+
+
+def _single_field_index(collection: str, scope: str, field: str, order: str) -> bool:
+    for override in INDEXES["fieldOverrides"]:
+        if override["collectionGroup"] == collection and override["fieldPath"] == field:
+            return any(
+                index.get("order") == order and index["queryScope"] == scope
+                for index in override["indexes"]
+            )
+    # Without an override Firestore indexes each field for collection queries only
+    return scope == "COLLECTION"
+
+
+def assert_indexed(query: RecordedQuery, order_by):
+    orders = [(field, direction.upper()) for field, direction in order_by]
+    if not query.equalities and len(orders) == 1:
+        field, order = orders[0]
+        assert _single_field_index(query.collection, query.scope, field, order), (
+            f"No {query.scope} index on {query.collection}.{field} {order}"
+        )
+        return
+
+    for index in INDEXES["indexes"]:
+        if index["collectionGroup"] != query.collection or index["queryScope"] != query.scope:
+            continue
+        fields = [(f["fieldPath"], f["order"]) for f in index["fields"]]
+        equalities, ordered = fields[: len(query.equalities)], fields[len(query.equalities):]
+        if {field for field, _ in equalities} == set(query.equalities) and ordered == orders:
+            return
+    pytest.fail(
+        f"No {query.scope} composite index on {query.collection} for "
+        f"{list(query.equalities)} ordered by {orders}"
+    )
+
+
+@pytest.mark.parametrize("project_id", [None, "p1"])
+@pytest.mark.parametrize("stage", [None, "concept"])
+async def test_user_session_listing_is_indexed(pages, project_id, stage):
+    await agents.list_agent_sessions(
+        stage=stage, project_id=project_id, limit=50, cursor=None, current_user={"uid": "user-1"}
+    )
+
+    [(query, order_by)] = pages
+    if project_id is None:
+        assert query.scope == "COLLECTION_GROUP" and "userId" in query.equalities
+    assert_indexed(query, order_by)
+
+
+@pytest.mark.parametrize("project_id", [None, "p1"])
+@pytest.mark.parametrize("stage", [None, "concept"])
+async def test_admin_session_listing_is_indexed(pages, project_id, stage):
+    await admin.list_agent_sessions(
+        project_id=project_id, stage=stage, limit=100, cursor=None, admin_user={"uid": "admin"}
+    )
+
+    [(query, order_by)] = pages
+    assert_indexed(query, order_by)
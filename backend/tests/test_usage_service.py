@@ -0,0 +1,116 @@
+"""Usage buffer commits: replays, month boundaries and shutdown"""
+import logging
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api.services import usage_service
+from api.services.usage_service import UsageBuffer, UsageEvent, current_period
+
+USER_ID = "user-1"
+QUOTA_PATH = f"users/{USER_ID}/quotas/current"
+NOW = datetime.now(timezone.utc)
+LAST_MONTH = NOW.replace(day=1) - timedelta(days=1)
+
+
+@pytest.fixture
+def buffer(fake_db, monkeypatch):
+    monkeypatch.setattr(usage_service, "get_async_db", lambda: fake_db)
+    return UsageBuffer(max_events=100, flush_interval_ms=1000)
+
+
+def generation(timestamp: datetime = NOW) -> UsageEvent:
+    return UsageEvent(
+        user_id=USER_ID,
+        action="ai_generation",
+        resource_type="concept",
+        duration_ms=10,
+        endpoint="/api/agents/concept/chat",
+        timestamp=timestamp,
+    )
+
+
+def usage_docs(db):
+    return [path for path in db.docs if path.startswith(f"users/{USER_ID}/usage/")]
+
+
+async def test_flush_writes_records_under_event_ids_and_counts_quota(buffer, fake_db):
+    buffer.record(generation())
+    buffer.record(generation())
+    await buffer.flush()
+
+    assert len(usage_docs(fake_db)) == 2
+    quota = fake_db.docs[QUOTA_PATH]
+    assert quota["periodKey"] == current_period()
+    assert quota["usage"] == {"aiGenerations": 2}
+
+
+async def test_replay_after_an_ambiguous_commit_is_not_counted_twice(buffer, fake_db):
+    fake_db.seed(QUOTA_PATH, {"periodKey": current_period(), "usage": {"aiGenerations": 3}})
+    buffer.record(generation())
+    fake_db.ambiguous = 1
+
+    await buffer.flush()  # Applied, but reported as failed
+    assert buffer.stats()["buffered"] == 1
+    await buffer.flush()
+
+    assert fake_db.docs[QUOTA_PATH]["usage"] == {"aiGenerations": 4}
+    assert len(usage_docs(fake_db)) == 1
+    assert buffer.stats()["replayed"] == 1
+    assert buffer.stats()["buffered"] == 0
+
+
+async def test_events_of_a_past_month_do_not_count_toward_the_current_one(buffer, fake_db):
+    fake_db.seed(QUOTA_PATH, {"periodKey": current_period(), "usage": {"aiGenerations": 1}})
+    buffer.record(generation(LAST_MONTH))
+    await buffer.flush()
+
+    assert fake_db.docs[QUOTA_PATH]["usage"] == {"aiGenerations": 1}
+    assert len(usage_docs(fake_db)) == 1
+    assert buffer.stats()["uncounted"] == 1
+
+
+async def test_first_event_of_a_month_rolls_the_quota_document_over(buffer, fake_db):
+    fake_db.seed(
+        QUOTA_PATH, {"periodKey": current_period(LAST_MONTH), "usage": {"aiGenerations": 7}}
+    )
+    buffer.record(generation(LAST_MONTH))
+    buffer.record(generation())
+    await buffer.flush()
+
+    quota = fake_db.docs[QUOTA_PATH]
+    assert quota["periodKey"] == current_period()
+    assert quota["usage"] == {"aiGenerations": 1}
+    assert quota["previousPeriod"] == {
+        "periodKey": current_period(LAST_MONTH),
+        "usage": {"aiGenerations": 8},
+    }
+
+
+async def test_concurrent_quota_write_is_retried(buffer, fake_db):
+    fake_db.seed(QUOTA_PATH, {"periodKey": current_period(), "usage": {"aiGenerations": 1}})
+    fake_db.conflicts = 1
+    buffer.record(generation())
+    await buffer.flush()
+
+    assert fake_db.docs[QUOTA_PATH]["usage"] == {"aiGenerations": 2}
+    assert buffer.stats()["commit_failures"] == 0
+
+
+async def test_failed_flush_at_shutdown_counts_and_logs_dropped_events(
+    buffer, fake_db, monkeypatch, caplog
+):
+    async def failing_commit(events):
+        raise RuntimeError("Firestore unavailable")
+
+    monkeypatch.setattr(buffer, "_commit", failing_commit)
+    buffer.start()
+    for _ in range(3):
+        buffer.record(generation())
+
+    with caplog.at_level(logging.ERROR, logger=usage_service.__name__):
+        await buffer.stop()
+
+    assert buffer.stats()["dropped"] == 3
+    assert buffer.stats()["buffered"] == 0
+    assert "dropped 3 events" in caplog.text
@@ -0,0 +1,83 @@
+"""Idempotency claims taken while Redis is unavailable"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.config import settings
+from api.lib import dedup
+from api.lib.dedup import Deduplicator
+from api.routers import webhooks
+from api.services import webhook_service
+
+EVENT = {
+    "event_type": "workflow_completed",
+    "data": {"workflow_id": "wf1", "execution_id": "exec1", "result": {"ok": True}},
+}
+
+
+@pytest.fixture
+def no_redis(monkeypatch):
+    monkeypatch.setattr(dedup, "get_async_redis", lambda: None)
+    monkeypatch.setattr(webhook_service, "get_async_redis", lambda: None)
+
+
+def make_deduplicator() -> Deduplicator:
+    return Deduplicator(prefix="dedup:", ttl=3600, bloom_capacity=1000, bloom_error_rate=0.001)
+
+
+async def test_local_claim_can_be_released(no_redis):
+    deduplicator = make_deduplicator()
+
+    assert await deduplicator.claim("k") is True
+    assert await deduplicator.claim("k") is False  # In progress
+    await deduplicator.release("k")
+    assert await deduplicator.claim("k") is True
+
+
+async def test_completed_local_claim_drops_later_deliveries(no_redis):
+    deduplicator = make_deduplicator()
+
+    assert await deduplicator.claim("k") is True
+    deduplicator.complete("k")
+    assert await deduplicator.claim("k") is False
+    await deduplicator.release("other")  # Unrelated release leaves the filter alone
+    assert await deduplicator.claim("k") is False
+
+
+@pytest.fixture
+def client(no_redis, fake_db, monkeypatch):
+    """Webhook router with Redis down, so writes happen inline and claims are local"""
+    async def publish_status(*args):
+        pass
+
+    monkeypatch.setattr(webhook_service, "get_async_db", lambda: fake_db)
+    monkeypatch.setattr(webhook_service, "publish_status", publish_status)
+    monkeypatch.setattr(webhook_service, "webhook_deduplicator", make_deduplicator())
+    monkeypatch.setattr(webhooks, "webhook_deduplicator", webhook_service.webhook_deduplicator)
+    monkeypatch.setattr(settings, "webhook_ingest_mode", "queue")
+
+    app = FastAPI()
+    app.include_router(webhooks.router)
+    return TestClient(app)
+
+
+def test_retry_of_a_failed_write_is_applied_during_an_outage(client, fake_db, monkeypatch):
+    commit_writes = webhooks.commit_writes
+    failures = [RuntimeError("Firestore unavailable")]
+
+    async def flaky_commit(writes):
+        if failures:
+            raise failures.pop()
+        await commit_writes(writes)
+
+    monkeypatch.setattr(webhooks, "commit_writes", flaky_commit)
+
+    assert client.post("/api/webhooks/n8n", json=EVENT).status_code == 500
+    assert "workflow_executions/exec1" not in fake_db.docs
+
+    retry = client.post("/api/webhooks/n8n", json=EVENT)
+    assert retry.status_code == 200
+    assert retry.json()["status"] == "ok"
+    assert fake_db.docs["workflow_executions/exec1"]["status"] == "completed"
+
+    assert client.post("/api/webhooks/n8n", json=EVENT).json()["status"] == "duplicate"